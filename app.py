@@ -4,24 +4,29 @@ import os
 import html
 import json
 import inspect
-import base64
 from io import BytesIO
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sentence_transformers import util
-from PIL import Image
 
 from ui_utils import inject_custom_css, apply_custom_css, render_product_card, set_background_image
-from config import CATALOG_PKL
-from embedding import get_embedder
+from config import CATALOG_PKL, CATALOG_STORE_DIR
+import catalog_store
+import image_store
+from embedding import get_lazy_embedder, encode_text
 
 # Auth + Supabase
 from auth_ui import require_login, clear_auth_state
 from profiles_manager import get_profile
-from supabase_client import get_supabase
+from supabase_client import (
+    QUERY_LOG_ENABLED,
+    begin_query_run,
+    current_query_log,
+    get_supabase,
+    query_log_to_jsonl,
+)
 from user_template_manager import (
     default_user_template,
     load_user_template_from_profile,
@@ -31,7 +36,7 @@ from user_template_manager import (
 )
 
 # Supabase-backed managers
-from materials_manager import list_materials, add_private_material, search_materials_semantic
+from materials_manager import list_materials, add_private_material, add_private_materials_bulk, search_materials_semantic
 from link_scraper import extract_material_payload_from_url
 import project_manager as _project_manager
 import project_items_manager as _project_items_manager
@@ -58,6 +63,10 @@ def _missing_project_items_manager_fn(name: str):
 
 
 load_projects = getattr(_project_manager, "load_projects", _missing_project_manager_fn("load_projects"))
+load_project_summaries = getattr(
+    _project_manager, "load_project_summaries", _missing_project_manager_fn("load_project_summaries")
+)
+load_project = getattr(_project_manager, "load_project", _missing_project_manager_fn("load_project"))
 create_project = getattr(_project_manager, "create_project", _missing_project_manager_fn("create_project"))
 update_project_name = getattr(
     _project_manager, "update_project_name", _missing_project_manager_fn("update_project_name")
@@ -111,6 +120,16 @@ get_object_approval_history_from_row = getattr(
 append_object_comment = getattr(
     _project_manager, "append_object_comment", _missing_project_manager_fn("append_object_comment")
 )
+patch_project_cart = getattr(_project_manager, "patch_project_cart", _missing_project_manager_fn("patch_project_cart"))
+cart_set = getattr(_project_manager, "cart_set", _missing_project_manager_fn("cart_set"))
+cart_delete = getattr(_project_manager, "cart_delete", _missing_project_manager_fn("cart_delete"))
+
+
+class _CartRevisionConflictUnavailable(RuntimeError):
+    """Stand-in when project_manager predates the cart patch API; nothing raises it."""
+
+
+CartRevisionConflict = getattr(_project_manager, "CartRevisionConflict", _CartRevisionConflictUnavailable)
 get_shared_project_by_token = getattr(
     _project_manager, "get_shared_project_by_token", _missing_project_manager_fn("get_shared_project_by_token")
 )
@@ -156,6 +175,43 @@ build_project_items_excel_bytes_relational = getattr(
     _missing_project_items_manager_fn("build_project_items_excel_bytes"),
 )
 
+QUERY_LOG_REPEAT_WARNING = 3
+
+
+def _render_query_log_panel():
+    """Sidebar debug view of the Supabase requests made by the last complete rerun."""
+    if not QUERY_LOG_ENABLED:
+        return
+    log = current_query_log()
+    runs = list(log.runs)
+    # The current run is still in progress while the sidebar renders; show the one before it.
+    run = runs[-2] if len(runs) > 1 else runs[-1]
+    summary = log.summary(run)
+    with st.sidebar.expander("Supabase requests (debug)", expanded=False):
+        st.caption(f"Session {log.session_id} · rerun #{summary['run']}")
+        cols = st.columns(2)
+        cols[0].metric("Requests", summary["requests"])
+        cols[1].metric("Time (ms)", summary["ms"])
+        cols = st.columns(2)
+        cols[0].metric("Rows", summary["rows"])
+        cols[1].metric("KB", round(summary["bytes"] / 1024, 1))
+        repeated = [group for group in summary["groups"] if group["count"] >= QUERY_LOG_REPEAT_WARNING]
+        for group in repeated:
+            st.warning(
+                f"{group['count']}x {group['verb']} {group['table']} ({group['filters'] or 'no filters'}) "
+                "- possible N+1."
+            )
+        if summary["groups"]:
+            st.dataframe(pd.DataFrame(summary["groups"]), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download session log (JSONL)",
+            data=query_log_to_jsonl(log),
+            file_name=f"supabase_queries_{log.session_id}.jsonl",
+            mime="application/x-ndjson",
+            key="supabase_query_log_download",
+        )
+
+
 # -----------------------------
 # Page setup
 # -----------------------------
@@ -164,6 +220,7 @@ _page_config = {"page_title": "Materia", "layout": "wide"}
 if os.path.exists(LOGO_PNG_PATH):
     _page_config["page_icon"] = LOGO_PNG_PATH
 st.set_page_config(**_page_config)
+begin_query_run("app")
 st.markdown(
     """
     <link rel="shortcut icon" href="assets/favicon.ico">
@@ -232,22 +289,19 @@ def _normalize_mood_image_refs(values, limit: int = 6) -> list[str]:
         text = str(value or "").strip()
         if not text:
             continue
-        if text.startswith("http://") or text.startswith("https://") or text.startswith("data:image/"):
+        if (
+            text.startswith("http://")
+            or text.startswith("https://")
+            or text.startswith("data:image/")
+            or image_store.is_ref(text)
+        ):
             refs.append(text)
     return refs[:limit]
 
 
-def _uploaded_mood_file_to_data_url(uploaded_file) -> str | None:
-    try:
-        image = Image.open(uploaded_file)
-        image = image.convert("RGB")
-        image.thumbnail((1600, 1600))
-        buffer = BytesIO()
-        image.save(buffer, format="JPEG", quality=85, optimize=True)
-        encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
-        return f"data:image/jpeg;base64,{encoded}"
-    except Exception:
-        return None
+def _uploaded_mood_file_to_ref(uploaded_file) -> str | None:
+    # Stored once by content hash; the cart only keeps the short reference.
+    return image_store.put_upload(uploaded_file)
 
 
 def _create_project_compat(name: str, rooms=None, template_map: dict | None = None):
@@ -324,29 +378,33 @@ def _object_assignment_notes_from_row(project_row: dict | None):
     return {str(k): str(v or "") for k, v in notes.items()}
 
 
-def _save_project_cart_fields(access_token: str | None, project_id: str, fields: dict):
+def _save_project_cart_ops(access_token: str | None, project_id: str, ops, expected_revision: int | None = None):
     if not access_token:
         return False, "Session token missing."
     try:
-        sb = get_supabase(access_token)
-        rows = (
-            sb.table("projects")
-            .select("cart")
-            .eq("id", project_id)
-            .limit(1)
-            .execute()
-            .data
-            or []
-        )
-        existing_payload = _cart_payload_from_row({"cart": rows[0].get("cart")} if rows else {})
-        for key, value in (fields or {}).items():
-            existing_payload[key] = value
-        sb.table("projects").update({"cart": existing_payload, "updated_at": "now()"}).eq("id", project_id).execute()
+        patch_project_cart(project_id, ops, expected_revision=expected_revision, access_token=access_token)
         return True, None
+    except CartRevisionConflict:
+        return False, "This project was changed by someone else. Reload the page and try again."
     except Exception as e:
         return False, str(e)
 
 
+def _save_project_cart_fields(
+    access_token: str | None,
+    project_id: str,
+    fields: dict,
+    expected_revision: int | None = None,
+):
+    # Whole blocks are edited from the page-load copy, so they carry its revision.
+    return _save_project_cart_ops(
+        access_token,
+        project_id,
+        [cart_set([key], value) for key, value in (fields or {}).items()],
+        expected_revision=expected_revision,
+    )
+
+
 def _infer_tactile_tags(material_row: dict):
     tags = material_row.get("tags") or []
     if isinstance(tags, str):
@@ -413,6 +471,10 @@ def _render_mood_strip(image_urls: list[str]):
 
     cells = []
     for url in clean_urls:
+        if image_store.is_ref(url):
+            url = image_store.display_src(url, thumbnail=True)
+            if not url:
+                continue
         safe_url = html.escape(url.strip(), quote=True)
         cells.append(f'<div class="mood-strip-item"><img src="{safe_url}" alt="Mood reference"/></div>')
     st.markdown(f'<div class="mood-strip-wrap">{"".join(cells)}</div>', unsafe_allow_html=True)
@@ -509,6 +571,8 @@ def render_client_portal(share_token: str):
         st.info("No rooms were found for this project.")
         return
 
+    # One comments / approvals read per render, shared by every object card below.
+    object_activity = {}
     for room in rooms:
         rid = str(room["id"])
         room_name = room.get("name") or "Room"
@@ -639,7 +703,7 @@ def render_client_portal(share_token: str):
                             if ok:
                                 st.rerun()
 
-                    approvals = get_object_approval_history_from_row(project, oid)
+                    approvals = get_object_approval_history_from_row(project, oid, object_activity)
                     if approvals:
                         latest = approvals[-1]
                         st.caption(
@@ -656,7 +720,7 @@ def render_client_portal(share_token: str):
                                     f"{row.get('action') or '-'}"
                                 )
 
-                    comments = get_object_comments_from_row(project, oid)
+                    comments = get_object_comments_from_row(project, oid, object_activity)
                     if comments:
                         st.caption("Comments")
                         for row in comments[-5:]:
@@ -754,6 +818,8 @@ with st.sidebar.expander("Profile", expanded=False):
         except Exception:
             st.error("Could not save profile name. Check profiles table permissions/schema.")
 
+_render_query_log_panel()
+
 # -----------------------------
 # Main: welcome message
 # -----------------------------
@@ -814,23 +880,37 @@ if page == "Projects Workspace":
 # -----------------------------
 # Shared: Load embedding model + catalog
 # -----------------------------
-model = get_embedder()
+# The model loads on first encode, not on every rerun of pages that never search.
+model = get_lazy_embedder()
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_catalog_store(store_dir: str, version: str | None):
+    # cache_resource hands every session the same memmap; cache_data would copy it.
+    # One entry only: each version holds its own replayed embedding matrix, and the
+    # version changes on every log append.
+    _ = version
+    return catalog_store.read_store(store_dir)
+
 
 @st.cache_data
-def load_data():
+def _load_catalog_pickle():
     if os.path.exists(CATALOG_PKL):
         df_ = pd.read_pickle(CATALOG_PKL)
     else:
         df_ = pd.DataFrame()
-    if not df_.empty and "embedding" in df_.columns:
-        df_["embedding"] = df_["embedding"].apply(np.array)
-    return df_
+    return df_.drop(columns=["embedding"], errors="ignore"), catalog_store.embedding_matrix(df_)
 
-df = load_data()
-if df.empty or "embedding" not in df.columns or df["embedding"].isna().all():
-    embeddings = None
-else:
-    embeddings = np.vstack(df["embedding"].values)
+
+def load_data():
+    if catalog_store.is_current(CATALOG_STORE_DIR, CATALOG_PKL):
+        try:
+            return _load_catalog_store(CATALOG_STORE_DIR, catalog_store.store_version(CATALOG_STORE_DIR))
+        except Exception:
+            pass
+    # No store yet, or the pickle was rewritten after it: use the legacy file.
+    return _load_catalog_pickle()
+
+df, embeddings = load_data()
 
 
 @st.cache_data(ttl=60, show_spinner=False)
@@ -1111,8 +1191,7 @@ def _procurement_from_row(project_row: dict | None):
     }
 
 
-def _update_procurement_for_object(
-    procurement_block: dict,
+def _procurement_patch_ops_for_object(
     object_id: str,
     note: str,
     quote_status: str,
@@ -1120,47 +1199,22 @@ def _update_procurement_for_object(
     target_price: float | None,
     order_stage: str,
 ):
-    next_block = {
-        "notes": dict(procurement_block.get("notes") or {}),
-        "quote_status": dict(procurement_block.get("quote_status") or {}),
-        "priority": dict(procurement_block.get("priority") or {}),
-        "target_price": dict(procurement_block.get("target_price") or {}),
-        "order_stage": dict(procurement_block.get("order_stage") or {}),
-    }
+    """Cart patch ops that set (or clear) one object's entries in every procurement block."""
     key = str(object_id)
-
-    clean_note = str(note or "").strip()
-    clean_quote = str(quote_status or "").strip().lower()
-    clean_priority = str(priority or "").strip().lower()
-    clean_target = _safe_float(target_price)
-    clean_stage = _normalize_procurement_stage(order_stage)
-
-    if clean_note:
-        next_block["notes"][key] = clean_note
-    else:
-        next_block["notes"].pop(key, None)
-
-    if clean_quote:
-        next_block["quote_status"][key] = clean_quote
-    else:
-        next_block["quote_status"].pop(key, None)
-
-    if clean_priority:
-        next_block["priority"][key] = clean_priority
-    else:
-        next_block["priority"].pop(key, None)
-
-    if clean_target is not None:
-        next_block["target_price"][key] = clean_target
-    else:
-        next_block["target_price"].pop(key, None)
-
-    if clean_stage:
-        next_block["order_stage"][key] = clean_stage
-    else:
-        next_block["order_stage"].pop(key, None)
-
-    return next_block
+    values = {
+        "notes": str(note or "").strip(),
+        "quote_status": str(quote_status or "").strip().lower(),
+        "priority": str(priority or "").strip().lower(),
+        "target_price": _safe_float(target_price),
+        "order_stage": _normalize_procurement_stage(order_stage),
+    }
+    ops = []
+    for block, value in values.items():
+        if value is None or value == "":
+            ops.append(cart_delete(["procurement", block, key]))
+        else:
+            ops.append(cart_set(["procurement", block, key], value))
+    return ops
 
 
 def _procurement_metrics(room_objects_map, material_lookup, procurement_block):
@@ -1508,7 +1562,8 @@ if page == "Projects Workspace":
 
     _render_editorial_title("Projects Workspace", "Projects")
 
-    projects = load_projects()
+    # Summaries only; the selected project's full row (cart included) is loaded below.
+    projects = load_project_summaries()
     project_statuses = load_projects_statuses([p["id"] for p in projects]) if projects else {}
 
     # Sidebar: Create project (simple + works)
@@ -1660,7 +1715,8 @@ if page == "Projects Workspace":
                 unsafe_allow_html=True,
             )
         else:
-            proj = next((x for x in projects if str(x["id"]) == str(pid)), None)
+            in_library = any(str(x["id"]) == str(pid) for x in projects)
+            proj = load_project(pid) if in_library else None
             if not proj:
                 st.error("Project could not be loaded.")
                 st.stop()
@@ -1774,9 +1830,9 @@ if page == "Projects Workspace":
                             converted_mood_images = []
                             failed_uploads = 0
                             for uploaded_file in uploaded_mood_files[:6]:
-                                data_url = _uploaded_mood_file_to_data_url(uploaded_file)
-                                if data_url:
-                                    converted_mood_images.append(data_url)
+                                image_ref = _uploaded_mood_file_to_ref(uploaded_file)
+                                if image_ref:
+                                    converted_mood_images.append(image_ref)
                                 else:
                                     failed_uploads += 1
                             if failed_uploads:
@@ -1795,7 +1851,12 @@ if page == "Projects Workspace":
                                 "mood_images": mood_images_for_save[:6],
                                 "hero_material_ids": selected_hero_ids[:6],
                             }
-                            ok, err = _save_project_cart_fields(access_token, str(pid), {"design_brief": next_brief})
+                            ok, err = _save_project_cart_fields(
+                                access_token,
+                                str(pid),
+                                {"design_brief": next_brief},
+                                expected_revision=(proj or {}).get("cart_revision"),
+                            )
                             if ok:
                                 st.success("Mood direction saved.")
                                 st.rerun()
@@ -2097,12 +2158,17 @@ if page == "Projects Workspace":
                                 f"Room budgets: {total_room_budget:,.0f} THB, "
                                 f"Project budget: {next_project_budget:,.0f} THB."
                             )
-                        elif save_project_budget(pid, next_project_budget, edited_room_budgets):
+                        elif save_project_budget(
+                            pid,
+                            next_project_budget,
+                            edited_room_budgets,
+                            expected_revision=(proj or {}).get("cart_revision"),
+                        ):
                             st.success("Budgets saved.")
                             st.rerun()
                 with clear_col:
                     if st.button("Clear all budgets", key=f"clear_budgets_{pid}"):
-                        if save_project_budget(pid, None, {}):
+                        if save_project_budget(pid, None, {}, expected_revision=(proj or {}).get("cart_revision")):
                             st.success("All budgets cleared.")
                             st.rerun()
 
@@ -2697,12 +2763,11 @@ if page == "Projects Workspace":
                                 next_status = "selected"
                             sb.table("room_objects").update({"material_id": material_id_value, "status": next_status}).eq("id", oid).execute()
 
-                            next_notes = dict(assignment_notes)
                             clean_why = str(st.session_state.get(note_key) or "").strip()
                             if clean_why:
-                                next_notes[str(oid)] = clean_why
+                                note_op = cart_set(["assignment_notes", str(oid)], clean_why)
                             else:
-                                next_notes.pop(str(oid), None)
+                                note_op = cart_delete(["assignment_notes", str(oid)])
 
                             raw_quote = str(st.session_state.get(quote_key) or "not_started").strip().lower()
                             raw_priority = str(st.session_state.get(priority_key) or "routine").strip().lower()
@@ -2712,8 +2777,7 @@ if page == "Projects Workspace":
                             use_target_value = bool(st.session_state.get(target_toggle_key))
                             target_price_value = raw_target_value if use_target_value else None
 
-                            next_procurement = _update_procurement_for_object(
-                                procurement_meta,
+                            procurement_ops = _procurement_patch_ops_for_object(
                                 str(oid),
                                 raw_proc_note,
                                 raw_quote if raw_quote != "not_started" else "",
@@ -2721,11 +2785,7 @@ if page == "Projects Workspace":
                                 target_price_value,
                                 raw_stage_value or "",
                             )
-                            return _save_project_cart_fields(
-                                access_token,
-                                str(pid),
-                                {"assignment_notes": next_notes, "procurement": next_procurement},
-                            )
+                            return _save_project_cart_ops(access_token, str(pid), [note_op, *procurement_ops])
 
                         action_cols = st.columns([2, 1, 1])
                         with action_cols[0]:
@@ -2745,21 +2805,13 @@ if page == "Projects Workspace":
                                 sb = get_supabase(access_token)
                                 sb.table("room_objects").update({"material_id": None, "status": "unassigned"}).eq("id", oid).execute()
 
-                                next_notes = dict(assignment_notes)
-                                next_notes.pop(str(oid), None)
-                                next_procurement = _update_procurement_for_object(
-                                    procurement_meta,
-                                    str(oid),
-                                    "",
-                                    "",
-                                    "",
-                                    None,
-                                    "",
-                                )
-                                _save_project_cart_fields(
+                                _save_project_cart_ops(
                                     access_token,
                                     str(pid),
-                                    {"assignment_notes": next_notes, "procurement": next_procurement},
+                                    [
+                                        cart_delete(["assignment_notes", str(oid)]),
+                                        *_procurement_patch_ops_for_object(str(oid), "", "", "", None, ""),
+                                    ],
                                 )
                                 st.success("Material, status, and notes reset.")
                                 st.rerun()
@@ -2859,8 +2911,9 @@ elif page == "Materials Gallery":
     else:
         query = st.text_input("What material or item are you looking for?", placeholder="e.g. light wood bench for outdoor")
         if query:
-            query_vec = model.encode(query, convert_to_numpy=True)
-            scores = util.cos_sim(query_vec, embeddings)[0]
+            query_vec = encode_text(query, model=model)
+            norms = np.linalg.norm(embeddings, axis=1) * max(float(np.linalg.norm(query_vec)), 1e-12)
+            scores = (embeddings @ query_vec) / np.maximum(norms, 1e-12)
             top_k_idx = np.argsort(-scores)[:10]
             results = df.iloc[top_k_idx]
 
@@ -3002,6 +3055,32 @@ elif page == "My Materials":
             if not (access_token and user_id):
                 st.caption("Login is required to save fetched materials.")
 
+    with st.expander("Import several product links", expanded=False):
+        bulk_urls_text = st.text_area(
+            "Product URLs (one per line)",
+            key="mat_bulk_urls",
+            placeholder="https://example.com/product/123\nhttps://example.com/product/456",
+        )
+        bulk_urls = list(dict.fromkeys(u.strip() for u in bulk_urls_text.splitlines() if u.strip()))
+        if st.button(
+            "Import all",
+            key="mat_bulk_import_btn",
+            disabled=not bulk_urls or not (access_token and user_id),
+        ):
+            bulk_payloads = []
+            for bulk_url in bulk_urls:
+                payload = extract_material_payload_from_url(bulk_url)
+                if "error" in payload:
+                    st.warning(f"{bulk_url}: {payload['error']}")
+                else:
+                    bulk_payloads.append(payload)
+            # One insert for every fetched row; embeddings are encoded in worker batches.
+            created = add_private_materials_bulk(access_token, user_id, bulk_payloads)
+            if created:
+                load_materials_cached.clear()
+                search_materials_cached.clear()
+                st.success(f"Imported {len(created)} of {len(bulk_urls)} links into your private library.")
+
     q = st.text_input("Search my library", placeholder="type to filter by name/description/tags")
 
     rows = load_materials_cached(access_token)
@@ -6,7 +6,7 @@ import json
 import base64
 import secrets
 from urllib.parse import unquote_plus
-from supabase_client import get_supabase
+from supabase_client import get_auth_client, get_supabase
 from data_utils import APP_DATA_DIR
 
 AUTH_SESSION_FILE = os.path.join(APP_DATA_DIR, "auth_session.json")
@@ -109,7 +109,7 @@ def _refresh_session_if_needed(force: bool = False) -> bool:
         return False
 
     try:
-        sb = get_supabase()
+        sb = get_auth_client()
         res = sb.auth.refresh_session(refresh_token)
         session = res.session
         user = res.user
@@ -285,7 +285,7 @@ def _capture_pkce_code_verifier(sb) -> None:
 
 
 def _begin_google_oauth() -> str:
-    sb = get_supabase()
+    sb = get_auth_client()
     credentials = {"provider": "google"}
 
     redirect_to = _auth_redirect_url()
@@ -330,7 +330,7 @@ def _complete_google_oauth_callback() -> bool:
 
     if access_token:
         try:
-            sb = get_supabase()
+            sb = get_auth_client()
             if refresh_token:
                 res = sb.auth.set_session(access_token, refresh_token)
                 session = res.session
@@ -371,7 +371,7 @@ def _complete_google_oauth_callback() -> bool:
         return False
 
     try:
-        sb = get_supabase()
+        sb = get_auth_client()
         exchange_params = {"auth_code": code}
 
         code_verifier = st.session_state.get("sb_oauth_code_verifier")
@@ -463,7 +463,7 @@ def _try_restore_login_from_disk() -> bool:
         return False
 
     try:
-        sb = get_supabase()
+        sb = get_auth_client()
         res = sb.auth.refresh_session(saved["refresh_token"])
         session = res.session
         user = res.user
@@ -578,7 +578,7 @@ def require_login():
                 st.error("Please enter a valid email address (for example: name@company.com).")
                 st.stop()
             try:
-                sb = get_supabase()
+                sb = get_auth_client()
                 sb.auth.sign_in_with_otp({
                     "email": email_clean,
                     "options": {"should_create_user": True}
@@ -610,7 +610,7 @@ def require_login():
 
         if st.button("Verify and continue", type="primary", disabled=not otp.strip()):
             try:
-                sb = get_supabase()
+                sb = get_auth_client()
                 em = _normalize_email(pending_email or email_clean)
                 token = _normalize_otp_token(otp)
                 if not em:
@@ -0,0 +1,433 @@
+# catalog_store.py — memory-mapped product catalog (Parquet metadata + float32 .npy embeddings)
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only.
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from embedding_codec import pack_vector, unpack_vector
+
+
+# Store layout: one directory holding the catalog without its embedding column,
+# the embeddings as a (rows, dim) float32 matrix, and a manifest written last.
+# New products are appended to log.jsonl (one JSON line per row, embedding packed
+# inline) and folded into the base files by compact().
+METADATA_FILE = "metadata.parquet"
+EMBEDDINGS_FILE = "embeddings.npy"
+MANIFEST_FILE = "manifest.json"
+LOG_FILE = "log.jsonl"
+LOCK_FILE = ".lock"
+EMBEDDING_COLUMN = "embedding"
+
+# Later rows replace earlier ones with the same key, as the old drop_duplicates did.
+KEY_COLUMNS = ("product_name", "Supplier")
+
+# load_frame marks its frame with the base and the last log entry it includes, so
+# save_frame can replay only the rows appended after the frame was read.
+BASE_SEQ_ATTR = "catalog_store_base_seq"
+LOG_SEQ_ATTR = "catalog_store_log_seq"
+
+# Compact once the log holds this many entries or this share of the base rows,
+# whichever is larger, so the amortised cost of an add stays constant.
+COMPACT_MIN_ENTRIES = 32
+COMPACT_RATIO = 0.05
+
+
+def _path(store_dir: str, name: str) -> str:
+    return os.path.join(store_dir, name)
+
+
+def embedding_matrix(df: pd.DataFrame) -> np.ndarray | None:
+    """
+    Float32 (rows, dim) matrix from a legacy `embedding` column of arrays/lists.
+    Rows without a usable vector become zero rows. Returns None when no row has one.
+    """
+    if df is None or df.empty or EMBEDDING_COLUMN not in df.columns:
+        return None
+    vectors = []
+    for value in df[EMBEDDING_COLUMN].tolist():
+        try:
+            vec = None if value is None else np.asarray(value, dtype=np.float32).reshape(-1)
+        except Exception:
+            vec = None
+        vectors.append(vec if vec is not None and vec.size and np.isfinite(vec).all() else None)
+    dims = [vec.size for vec in vectors if vec is not None]
+    if not dims:
+        return None
+    dim = max(set(dims), key=dims.count)
+    matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+    for idx, vec in enumerate(vectors):
+        if vec is not None and vec.size == dim:
+            matrix[idx] = vec
+    return matrix
+
+
+def _metadata_frame(df: pd.DataFrame) -> pd.DataFrame:
+    meta = df.drop(columns=[EMBEDDING_COLUMN], errors="ignore").reset_index(drop=True)
+    for col in meta.columns:
+        # Parquet needs one type per column; legacy CSV imports mix ints and strings.
+        if meta[col].dtype == object:
+            meta[col] = meta[col].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    return meta
+
+
+@contextmanager
+def _store_lock(store_dir: str):
+    """
+    Exclusive flock on the store's lock file, held by appends and compactions so
+    concurrent sessions/processes neither interleave log lines nor drop rows appended
+    while a compaction rewrites the base. Readers do not lock; every file they open is
+    swapped in atomically.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    with open(_path(store_dir, LOCK_FILE), "a+") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _replace_atomically(path: str, write):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _last_log_seq(store_dir: str) -> int | None:
+    """Sequence number of the newest log entry, read from the file tail only."""
+    path = _path(store_dir, LOG_FILE)
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            f.seek(max(0, end - 65536))
+            tail = f.read()
+    except OSError:
+        return None
+    for line in reversed(tail.splitlines()):
+        try:
+            return int(json.loads(line)["seq"])
+        except Exception:
+            continue
+    return None
+
+
+def _archive_log(store_dir: str, archive_dir: str | None):
+    path = _path(store_dir, LOG_FILE)
+    if not os.path.exists(path):
+        return None
+    if not archive_dir:
+        os.remove(path)
+        return None
+    os.makedirs(archive_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+    target = os.path.join(archive_dir, f"product_catalog_delta_{timestamp}_{os.getpid()}.jsonl")
+    os.replace(path, target)
+    return target
+
+
+def write_store(df: pd.DataFrame, store_dir: str, archive_dir: str | None = None) -> dict:
+    """
+    Write `df` (legacy catalog frame, `embedding` column optional) as the store base
+    and return its manifest. `df` must already include any logged rows; the log is
+    moved to `archive_dir` as a delta (or dropped when no archive dir is given).
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    meta = _metadata_frame(df if df is not None else pd.DataFrame())
+    matrix = embedding_matrix(df)
+    previous = read_manifest(store_dir) or {}
+    last_seq = _last_log_seq(store_dir)
+    base_seq = last_seq if last_seq is not None else int(previous.get("base_seq") or 0)
+
+    _replace_atomically(_path(store_dir, METADATA_FILE), lambda tmp: meta.to_parquet(tmp, index=False))
+    embeddings_path = _path(store_dir, EMBEDDINGS_FILE)
+    if matrix is not None:
+        # np.save appends ".npy" to names without it, so hand it an open file.
+        def _save(tmp):
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(matrix, dtype="<f4"))
+
+        _replace_atomically(embeddings_path, _save)
+    elif os.path.exists(embeddings_path):
+        os.remove(embeddings_path)
+
+    # A crash before the manifest lands leaves log rows that are also in the base;
+    # replaying them is a keyed upsert, so the catalog comes out the same.
+    _archive_log(store_dir, archive_dir)
+    manifest = {
+        "rows": int(len(meta)),
+        "dim": int(matrix.shape[1]) if matrix is not None else 0,
+        "base_seq": base_seq,
+        "written_at": time.time(),
+    }
+    _replace_atomically(
+        _path(store_dir, MANIFEST_FILE),
+        lambda tmp: open(tmp, "w", encoding="utf-8").write(json.dumps(manifest)),
+    )
+    return manifest
+
+
+def read_manifest(store_dir: str) -> dict | None:
+    try:
+        with open(_path(store_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def store_version(store_dir: str) -> str | None:
+    """Cheap cache key for the store; changes on every write_store and log append."""
+    try:
+        stat = os.stat(_path(store_dir, MANIFEST_FILE))
+    except OSError:
+        return None
+    try:
+        log_size = os.path.getsize(_path(store_dir, LOG_FILE))
+    except OSError:
+        log_size = 0
+    return f"{stat.st_mtime_ns}:{stat.st_size}:{log_size}"
+
+
+def is_current(store_dir: str, pickle_path: str | None = None) -> bool:
+    """True when the store exists and is not older than the legacy pickle (if any)."""
+    manifest = read_manifest(store_dir)
+    if not manifest:
+        return False
+    if pickle_path and os.path.exists(pickle_path):
+        return float(manifest.get("written_at") or 0) >= os.path.getmtime(pickle_path)
+    return True
+
+
+def read_log(store_dir: str) -> list[dict]:
+    """Log entries newer than the base, oldest first, as {"seq", "row", "embedding"}."""
+    base_seq = int((read_manifest(store_dir) or {}).get("base_seq") or 0)
+    entries = []
+    try:
+        with open(_path(store_dir, LOG_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except Exception:
+                    # A torn final line from an interrupted append.
+                    continue
+                if int(entry.get("seq") or 0) > base_seq and isinstance(entry.get("row"), dict):
+                    entries.append(entry)
+    except OSError:
+        return []
+    return entries
+
+
+def _apply_log(meta: pd.DataFrame, embeddings: np.ndarray | None, entries: list[dict]):
+    if not entries:
+        return meta, embeddings
+    log_vectors = [unpack_vector(entry.get("embedding")) for entry in entries]
+    if embeddings is not None:
+        dim = embeddings.shape[1]
+    else:
+        dim = next((vec.size for vec in log_vectors if vec is not None), 0)
+
+    combined = pd.concat([meta, pd.DataFrame([entry["row"] for entry in entries])], ignore_index=True)
+    keys = [col for col in KEY_COLUMNS if col in combined.columns]
+    keep = ~combined.duplicated(subset=keys, keep="last") if keys else pd.Series(True, index=combined.index)
+    keep = keep.to_numpy()
+
+    matrix = None
+    if dim:
+        log_matrix = np.zeros((len(entries), dim), dtype=np.float32)
+        for idx, vec in enumerate(log_vectors):
+            if vec is not None and vec.size == dim:
+                log_matrix[idx] = vec
+        base = embeddings if embeddings is not None else np.zeros((len(meta), dim), dtype=np.float32)
+        # Only the live base rows are copied; a compacted store is served zero-copy.
+        matrix = np.concatenate([base[keep[: len(meta)]], log_matrix[keep[len(meta) :]]])
+    return combined[keep].reset_index(drop=True), matrix
+
+
+def _read_base(store_dir: str) -> tuple[pd.DataFrame, np.ndarray | None]:
+    manifest = read_manifest(store_dir)
+    if not manifest:
+        raise FileNotFoundError(f"No catalog store in {store_dir}")
+    meta = pd.read_parquet(_path(store_dir, METADATA_FILE))
+    embeddings = None
+    if int(manifest.get("dim") or 0) > 0:
+        embeddings = np.load(_path(store_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        if embeddings.shape[0] != len(meta):
+            raise ValueError("Catalog store is inconsistent: metadata and embeddings row counts differ")
+    return meta, embeddings
+
+
+def read_store(store_dir: str) -> tuple[pd.DataFrame, np.ndarray | None]:
+    """
+    Load (metadata, embeddings). Embeddings are a read-only float32 memmap, so
+    every worker process shares the same page-cached bytes instead of a copy.
+    Rows still in the log are merged into a private copy until the next compaction.
+    """
+    meta, embeddings = _read_base(store_dir)
+    return _apply_log(meta, embeddings, read_log(store_dir))
+
+
+def _legacy_frame(meta: pd.DataFrame, embeddings: np.ndarray | None) -> pd.DataFrame:
+    frame = meta.copy()
+    if embeddings is not None:
+        frame[EMBEDDING_COLUMN] = [np.array(row) for row in embeddings]
+    return frame
+
+
+def _replay(df: pd.DataFrame, entries: list[dict]) -> pd.DataFrame:
+    meta, embeddings = _apply_log(
+        df.drop(columns=[EMBEDDING_COLUMN], errors="ignore").reset_index(drop=True),
+        embedding_matrix(df),
+        entries,
+    )
+    return _legacy_frame(meta, embeddings)
+
+
+def load_frame(store_dir: str, base_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    The catalog as a legacy frame with an `embedding` column of arrays. Logged rows
+    are replayed over `base_df` when given (e.g. a newer pickle), else over the store base.
+    """
+    base_seq = int((read_manifest(store_dir) or {}).get("base_seq") or 0)
+    entries = read_log(store_dir)
+    if base_df is None:
+        frame = _legacy_frame(*_apply_log(*_read_base(store_dir), entries))
+    else:
+        frame = _replay(base_df, entries)
+    frame.attrs[BASE_SEQ_ATTR] = base_seq
+    frame.attrs[LOG_SEQ_ATTR] = max([base_seq, *(int(entry["seq"]) for entry in entries)])
+    return frame
+
+
+class StaleFrameError(RuntimeError):
+    """The store was compacted after the frame was loaded; reload it and redo the change."""
+
+
+def save_frame(
+    store_dir: str,
+    df: pd.DataFrame,
+    pickle_path: str | None = None,
+    archive_dir: str | None = None,
+) -> pd.DataFrame:
+    """
+    Make an edited copy of the catalog (from load_frame) the store base, and the
+    legacy pickle when given, under the store lock. Rows appended to the log after
+    `df` was loaded are replayed on top so a concurrent add is not lost.
+    Returns the frame that was written; raises StaleFrameError when a compaction
+    folded the log in between.
+    """
+    with _store_lock(store_dir):
+        base_seq = int((read_manifest(store_dir) or {}).get("base_seq") or 0)
+        entries = read_log(store_dir)
+        loaded_seq = df.attrs.get(LOG_SEQ_ATTR)
+        if loaded_seq is not None:
+            if int(df.attrs.get(BASE_SEQ_ATTR) or 0) != base_seq:
+                raise StaleFrameError("The catalog store was compacted after this catalog was loaded.")
+            entries = [entry for entry in entries if int(entry["seq"]) > int(loaded_seq)]
+        frame = _replay(df, entries)
+        if pickle_path:
+            frame.to_pickle(pickle_path)
+        manifest = write_store(frame, store_dir, archive_dir=archive_dir)
+        frame.attrs[BASE_SEQ_ATTR] = frame.attrs[LOG_SEQ_ATTR] = manifest["base_seq"]
+        return frame
+
+
+def rebase_on_pickle(store_dir: str, pickle_path: str, archive_dir: str | None = None) -> bool:
+    """
+    Rebuild the store from the legacy pickle when the pickle is newer (or there is no
+    store yet), replaying every logged row on top; the merged frame is written back
+    to the pickle. Checked and done under the store lock. Returns True if it rebuilt.
+    """
+    with _store_lock(store_dir):
+        if is_current(store_dir, pickle_path):
+            return False
+        frame = pd.read_pickle(pickle_path) if os.path.exists(pickle_path) else pd.DataFrame()
+        entries = read_log(store_dir) if read_manifest(store_dir) else []
+        if entries:
+            frame = _replay(frame, entries)
+            frame.to_pickle(pickle_path)
+        write_store(frame, store_dir, archive_dir=archive_dir)
+        return True
+
+
+def append_rows(store_dir: str, rows: list[dict], embeddings=None) -> int:
+    """
+    Append products to the log in O(rows) regardless of catalog size.
+    Returns the number of log entries not yet compacted.
+    """
+    if not read_manifest(store_dir):
+        raise FileNotFoundError(f"No catalog store in {store_dir}")
+    vectors = list(embeddings) if embeddings is not None else [None] * len(rows)
+
+    with _store_lock(store_dir):
+        # Re-read under the lock: a compaction may have moved base_seq meanwhile.
+        manifest = read_manifest(store_dir) or {}
+        base_seq = int(manifest.get("base_seq") or 0)
+        seq = max(_last_log_seq(store_dir) or 0, base_seq)
+        lines = []
+        for row, vec in zip(rows, vectors):
+            seq += 1
+            entry = {"seq": seq, "row": row, "embedding": pack_vector(vec) if vec is not None else None}
+            lines.append(json.dumps(entry, default=str) + "\n")
+        with open(_path(store_dir, LOG_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+    return seq - base_seq
+
+
+def needs_compaction(store_dir: str, pending: int) -> bool:
+    rows = int((read_manifest(store_dir) or {}).get("rows") or 0)
+    return pending >= max(COMPACT_MIN_ENTRIES, int(rows * COMPACT_RATIO))
+
+
+def compact(store_dir: str, pickle_path: str | None = None, archive_dir: str | None = None) -> dict:
+    """
+    Fold the log into the base files. The legacy pickle (if given) is refreshed first
+    so it never looks newer than the store; the folded log is kept in `archive_dir`.
+    """
+    with _store_lock(store_dir):
+        return _compact_locked(store_dir, pickle_path, archive_dir)
+
+
+def _compact_locked(store_dir: str, pickle_path: str | None, archive_dir: str | None) -> dict:
+    frame = load_frame(store_dir)
+    if pickle_path:
+        frame.to_pickle(pickle_path)
+    return write_store(frame, store_dir, archive_dir=archive_dir)
+
+
+def add_product(
+    store_dir: str,
+    row: dict,
+    embedding=None,
+    pickle_path: str | None = None,
+    archive_dir: str | None = None,
+) -> bool:
+    """Append one product and compact when the log is due. Returns True if it compacted."""
+    pending = append_rows(store_dir, [row], [embedding])
+    if not needs_compaction(store_dir, pending):
+        return False
+    with _store_lock(store_dir):
+        # Another session may have folded the log since this append.
+        if not needs_compaction(store_dir, len(read_log(store_dir))):
+            return False
+        _compact_locked(store_dir, pickle_path, archive_dir)
+    return True
+
+
+def convert_pickle(pickle_path: str, store_dir: str) -> dict:
+    """One-shot conversion of product_catalog_with_embeddings.pkl into a store."""
+    with _store_lock(store_dir):
+        return write_store(pd.read_pickle(pickle_path), store_dir)
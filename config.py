@@ -18,6 +18,11 @@ MODEL_PATH = LOCAL_MODEL_PATH if os.path.exists(LOCAL_MODEL_PATH) else DEFAULT_H
 # Catalog files
 CATALOG_PKL = os.path.join(BASE_DIR, "product_catalog_with_embeddings.pkl")
 CSV_LOG = os.path.join(BASE_DIR, "submitted_products.csv")
+# Memory-mapped catalog store (see catalog_store.py); built from CATALOG_PKL by
+# scripts/convert_catalog_to_store.py.
+CATALOG_STORE_DIR = os.path.join(BASE_DIR, "product_catalog")
+# Content-addressed mood-board images (see image_store.py); IMAGE_STORE_DIR env overrides.
+IMAGE_STORE_DIR = os.path.join(BASE_DIR, "image_store")
 
 # Other constants
 ROOM_OPTIONS = [
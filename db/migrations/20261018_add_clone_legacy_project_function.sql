@@ -0,0 +1,133 @@
+-- Set-based project cloning for the Streamlit app (legacy schema).
+-- project_manager.duplicate_project / duplicate_project_bulk pick the copy names and call
+--   clone_legacy_project(p_source_project_id, p_names, p_include_materials)
+-- once for all copies. Each copy gets a project row (cart reduced to design_brief),
+-- and its rooms and room_objects are copied by a single statement whose room_map CTE
+-- pairs every source room id with a pre-generated target id.
+-- p_include_materials = false resets material_id / status to unassigned;
+-- true keeps assigned material_id with status 'selected' (same as the Python path).
+-- Everything runs in one transaction: either all copies exist afterwards or none do.
+-- Returns [{"project_id", "name", "room_count", "object_count"}] in p_names order.
+-- Only created on the legacy schema with uuid room ids. Safe to run multiple times.
+
+do $$
+begin
+  if to_regclass('public.project_rooms') is null
+     or to_regclass('public.room_objects') is null
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'owner_id'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'project_rooms' and column_name = 'id'
+         and data_type = 'uuid'
+     ) then
+    raise notice 'clone_legacy_project skipped: legacy projects/project_rooms/room_objects tables not found';
+    return;
+  end if;
+
+  execute $fn$
+    create or replace function public.clone_legacy_project(
+      p_source_project_id uuid,
+      p_names text[],
+      p_include_materials boolean default false
+    )
+    returns jsonb
+    language plpgsql
+    security invoker
+    set search_path = public
+    as $body$
+    declare
+      v_source public.projects%rowtype;
+      v_name text;
+      v_project_id public.projects.id%type;
+      v_room_count integer;
+      v_object_count integer;
+      v_result jsonb := '[]'::jsonb;
+    begin
+      if coalesce(array_length(p_names, 1), 0) = 0 then
+        raise exception 'project_names_required' using errcode = '22023';
+      end if;
+
+      select * into v_source from public.projects p where p.id = p_source_project_id;
+      if not found then
+        raise exception 'project_not_found' using errcode = 'P0002';
+      end if;
+
+      if (select count(distinct btrim(n)) from unnest(p_names) as n) <> array_length(p_names, 1)
+         or exists (
+           select 1 from public.projects p
+           where p.name in (select btrim(n) from unnest(p_names) as n)
+         ) then
+        raise exception 'project_name_exists' using errcode = '23505';
+      end if;
+
+      foreach v_name in array p_names
+      loop
+        insert into public.projects (name, owner_id, cart)
+        values (
+          btrim(v_name),
+          coalesce(v_source.owner_id, auth.uid()),
+          case
+            when jsonb_typeof(v_source.cart::jsonb -> 'design_brief') = 'object'
+              then jsonb_build_object('design_brief', v_source.cart::jsonb -> 'design_brief')
+            else '[]'::jsonb
+          end
+        )
+        returning id into v_project_id;
+
+        with room_map as materialized (
+          select
+            r.id as source_room_id,
+            gen_random_uuid() as target_room_id,
+            coalesce(nullif(btrim(r.name), ''), 'Room') as name
+          from public.project_rooms r
+          where r.project_id = p_source_project_id
+        ),
+        new_rooms as (
+          insert into public.project_rooms (id, project_id, name)
+          select m.target_room_id, v_project_id, m.name
+          from room_map m
+          returning id
+        ),
+        new_objects as (
+          insert into public.room_objects (room_id, object_key, object_name, category, qty, status, material_id)
+          select
+            m.target_room_id,
+            coalesce(
+              nullif(btrim(o.object_key), ''),
+              nullif(btrim(regexp_replace(lower(coalesce(o.object_name, '')), '[^a-z0-9]+', '_', 'g'), '_'), ''),
+              'item'
+            ),
+            coalesce(nullif(btrim(o.object_name), ''), 'Item'),
+            o.category,
+            greatest(coalesce(o.qty, 1), 1),
+            case when p_include_materials and o.material_id is not null then 'selected' else 'unassigned' end,
+            case when p_include_materials then o.material_id end
+          from public.room_objects o
+          join room_map m on m.source_room_id = o.room_id
+          returning id
+        )
+        select (select count(*) from new_rooms), (select count(*) from new_objects)
+        into v_room_count, v_object_count;
+
+        v_result := v_result || jsonb_build_array(
+          jsonb_build_object(
+            'project_id', v_project_id,
+            'name', btrim(v_name),
+            'room_count', v_room_count,
+            'object_count', v_object_count
+          )
+        );
+      end loop;
+
+      return v_result;
+    end;
+    $body$
+  $fn$;
+
+  execute 'revoke all on function public.clone_legacy_project(uuid, text[], boolean) from public';
+  execute 'grant execute on function public.clone_legacy_project(uuid, text[], boolean) to authenticated, service_role';
+end
+$$;
@@ -0,0 +1,95 @@
+-- Atomic project creation for the Streamlit app (legacy schema).
+-- project_manager.create_project expands SMALL_VILLA_TEMPLATE or the user's template
+-- in Python and sends it here in one call:
+--   create_legacy_project(p_name, p_owner_id, p_rooms)
+--   p_rooms = [{"name": "Kitchen", "objects": [{"object_key", "object_name", "category", "qty"}]}]
+-- The project, its rooms and room_objects are inserted in one transaction, so a failure
+-- leaves no orphan rows. A name the caller can already see raises 'project_name_exists'.
+-- security invoker: inserts run under the caller's RLS, like the multi-call fallback.
+-- Only created on the legacy schema (projects.owner_id + projects.cart + project_rooms).
+-- Safe to run multiple times.
+
+do $$
+begin
+  if to_regclass('public.project_rooms') is null
+     or to_regclass('public.room_objects') is null
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'cart'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'owner_id'
+     ) then
+    raise notice 'create_legacy_project skipped: legacy projects/project_rooms/room_objects tables not found';
+    return;
+  end if;
+
+  execute $fn$
+    create or replace function public.create_legacy_project(
+      p_name text,
+      p_owner_id uuid default null,
+      p_rooms jsonb default '[]'::jsonb
+    )
+    returns jsonb
+    language plpgsql
+    security invoker
+    set search_path = public
+    as $body$
+    declare
+      v_name text := btrim(coalesce(p_name, ''));
+      v_project_id public.projects.id%type;
+      v_room_id public.project_rooms.id%type;
+      v_room jsonb;
+      v_room_count integer := 0;
+      v_object_count integer := 0;
+      v_inserted integer;
+    begin
+      if v_name = '' then
+        raise exception 'project_name_required' using errcode = '22023';
+      end if;
+      if jsonb_typeof(p_rooms) is distinct from 'array' or jsonb_array_length(p_rooms) = 0 then
+        raise exception 'project_rooms_required' using errcode = '22023';
+      end if;
+      if exists (select 1 from public.projects p where p.name = v_name) then
+        raise exception 'project_name_exists' using errcode = '23505';
+      end if;
+
+      insert into public.projects (name, owner_id, cart)
+      values (v_name, coalesce(p_owner_id, auth.uid()), '[]'::jsonb)
+      returning id into v_project_id;
+
+      for v_room in select value from jsonb_array_elements(p_rooms)
+      loop
+        insert into public.project_rooms (project_id, name)
+        values (v_project_id, btrim(v_room ->> 'name'))
+        returning id into v_room_id;
+        v_room_count := v_room_count + 1;
+
+        insert into public.room_objects (room_id, object_key, object_name, category, qty, status, material_id)
+        select
+          v_room_id,
+          o ->> 'object_key',
+          coalesce(nullif(btrim(o ->> 'object_name'), ''), 'Item'),
+          o ->> 'category',
+          greatest(coalesce((o ->> 'qty')::numeric::integer, 1), 1),
+          'unassigned',
+          null
+        from jsonb_array_elements(coalesce(v_room -> 'objects', '[]'::jsonb)) as o;
+        get diagnostics v_inserted = row_count;
+        v_object_count := v_object_count + v_inserted;
+      end loop;
+
+      return jsonb_build_object(
+        'project_id', v_project_id,
+        'room_count', v_room_count,
+        'object_count', v_object_count
+      );
+    end;
+    $body$
+  $fn$;
+
+  execute 'revoke all on function public.create_legacy_project(text, uuid, jsonb) from public';
+  execute 'grant execute on function public.create_legacy_project(text, uuid, jsonb) to authenticated, service_role';
+end
+$$;
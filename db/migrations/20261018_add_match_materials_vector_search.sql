@@ -0,0 +1,250 @@
+-- Server-side semantic search for the Streamlit materials library.
+-- Adds a pgvector copy of materials.embedding, keeps it in sync with a trigger,
+-- indexes it with HNSW, and exposes match_materials(query_embedding, match_count, query_text),
+-- which returns the top-k rows with the same hybrid ranking as materials_manager:
+--   2.0 * phrase hit + 0.8 * token hits + 0.55 * max(cosine, 0) + 0.15 for general rows,
+--   ordered by score desc then created_at desc, backfilled with general rows up to match_count.
+-- The function is security invoker, so results stay scoped by the caller's RLS; it widens
+-- hnsw.ef_search (and uses iterative scans where pgvector supports them) so other tenants'
+-- rows cannot crowd the caller's out of the vector shortlist.
+-- The lexical leg reads a stored search_text column through a trigram index instead of
+-- rebuilding every row's text per search.
+-- Safe to run multiple times.
+
+create extension if not exists vector with schema extensions;
+
+alter table if exists public.materials
+    add column if not exists embedding_vector extensions.vector(384);
+
+create or replace function public.materials_embedding_to_vector(p_value text)
+returns extensions.vector
+language plpgsql
+immutable
+set search_path = public, extensions
+as $$
+declare
+  v_text text := btrim(coalesce(p_value, ''));
+begin
+  if v_text = '' then
+    return null;
+  end if;
+  -- float8[] columns render as {..}; json/jsonb and pgvector text already use [..].
+  v_text := translate(v_text, '{}', '[]');
+  return v_text::extensions.vector(384);
+exception
+  when others then
+    return null;
+end;
+$$;
+
+create or replace function public.materials_sync_embedding_vector()
+returns trigger
+language plpgsql
+set search_path = public, extensions
+as $$
+begin
+  new.embedding_vector := public.materials_embedding_to_vector(new.embedding::text);
+  return new;
+end;
+$$;
+
+drop trigger if exists trg_materials_sync_embedding_vector on public.materials;
+create trigger trg_materials_sync_embedding_vector
+before insert or update of embedding on public.materials
+for each row execute function public.materials_sync_embedding_vector();
+
+update public.materials
+set embedding_vector = public.materials_embedding_to_vector(embedding::text)
+where embedding is not null
+  and embedding_vector is null;
+
+create index if not exists idx_materials_embedding_vector_hnsw
+  on public.materials
+  using hnsw (embedding_vector extensions.vector_cosine_ops);
+
+create or replace function public.material_tag_values(p_tags jsonb)
+returns setof text
+language sql
+immutable
+as $$
+  select btrim(tag.value)
+  from jsonb_array_elements_text(
+    case when jsonb_typeof(p_tags) = 'array' then p_tags else '[]'::jsonb end
+  ) as tag(value)
+  where btrim(tag.value) <> '';
+$$;
+
+-- Mirrors materials_manager._material_text_for_embedding(...).lower().
+create or replace function public.material_search_text(
+  p_name text,
+  p_category text,
+  p_description text,
+  p_tags jsonb
+)
+returns text
+language sql
+immutable
+as $$
+  select lower(concat_ws(
+    ' ',
+    nullif(btrim(coalesce(p_name, '')), ''),
+    nullif(btrim(coalesce(p_category, '')), ''),
+    nullif(btrim(coalesce(p_description, '')), ''),
+    nullif((select string_agg(value, ' ') from public.material_tag_values(p_tags) as t(value)), '')
+  ));
+$$;
+
+-- Mirrors materials_manager._is_general_material.
+create or replace function public.material_is_general(p_category text, p_tags jsonb)
+returns boolean
+language sql
+immutable
+as $$
+  select lower(btrim(coalesce(p_category, ''))) = 'general'
+    or exists (
+      select 1
+      from public.material_tag_values(p_tags) as t(value)
+      where lower(value) in ('general', 'generic', 'baseline', 'default', 'common')
+    );
+$$;
+
+-- Stored copies of the two derived values above; a row's text is built once per write.
+create extension if not exists pg_trgm with schema extensions;
+
+alter table if exists public.materials
+    add column if not exists search_text text
+      generated always as (public.material_search_text(name, category, description, to_jsonb(tags))) stored;
+
+alter table if exists public.materials
+    add column if not exists search_is_general boolean
+      generated always as (public.material_is_general(category, to_jsonb(tags))) stored;
+
+create index if not exists idx_materials_search_text_trgm
+  on public.materials
+  using gin (search_text extensions.gin_trgm_ops);
+
+create index if not exists idx_materials_general_created
+  on public.materials (created_at desc nulls last)
+  where search_is_general;
+
+drop function if exists public.match_materials(extensions.vector, integer);
+create or replace function public.match_materials(
+  query_embedding extensions.vector,
+  match_count integer default 20,
+  query_text text default null
+)
+returns setof public.materials
+language plpgsql
+security invoker
+set search_path = public, extensions
+as $$
+declare
+  v_limit integer := greatest(coalesce(match_count, 20), 0);
+  -- hnsw.ef_search accepts at most 1000.
+  v_shortlist integer := least(greatest(v_limit * 4, 50), 1000);
+begin
+  -- RLS filters rows after the HNSW scan returns them, and the default ef_search (40)
+  -- would cap the shortlist below v_shortlist. Widen it for this transaction, and on
+  -- pgvector >= 0.8 keep scanning until enough visible rows are found.
+  perform set_config('hnsw.ef_search', v_shortlist::text, true);
+  begin
+    perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  exception
+    when others then
+      null;
+  end;
+
+  return query
+  with params as (
+    select
+      v_limit as match_limit,
+      lower(btrim(coalesce(query_text, ''))) as phrase
+  ),
+  tokens as (
+    select
+      tok.value,
+      '%' || replace(replace(replace(tok.value, '\', '\\'), '%', '\%'), '_', '\_') || '%' as pattern
+    from params p,
+      regexp_split_to_table(p.phrase, '\s+') as tok(value)
+    where tok.value <> ''
+  ),
+  semantic_candidates as (
+    -- HNSW shortlist. A row outside it scores at most 0.55 * the weakest shortlisted cosine,
+    -- so without lexical or general boosts it cannot displace the top match_count rows.
+    select m.id
+    from public.materials m
+    where query_embedding is not null
+      and m.embedding_vector is not null
+    order by m.embedding_vector <=> query_embedding
+    limit v_shortlist
+  ),
+  lexical_candidates as (
+    -- One trigram index probe per token.
+    select m.id
+    from tokens k
+    join public.materials m on m.search_text like k.pattern
+  ),
+  candidates as (
+    select id from semantic_candidates
+    union
+    select id from lexical_candidates
+    union
+    select m.id from public.materials m where m.search_is_general
+  ),
+  scored as (
+    select
+      m.id,
+      m.created_at,
+      m.search_is_general as is_general,
+      (case when p.phrase <> '' and position(p.phrase in m.search_text) > 0 then 2.0 else 0.0 end)
+        + 0.8 * (select count(*) from tokens k where position(k.value in m.search_text) > 0) as lexical_score,
+      case
+        when query_embedding is not null and m.embedding_vector is not null
+          then 1 - (m.embedding_vector <=> query_embedding)
+      end as semantic_score
+    from candidates c
+    join public.materials m on m.id = c.id
+    cross join params p
+  ),
+  ranked as (
+    select
+      s.id,
+      s.created_at,
+      s.lexical_score
+        + coalesce(greatest(s.semantic_score, 0) * 0.55, 0)
+        + case when s.is_general then 0.15 else 0 end as score
+    from scored s
+    where s.lexical_score > 0
+      or coalesce(s.semantic_score, -1) >= 0.20
+      or s.is_general
+    order by score desc, s.created_at desc nulls last
+    limit (select match_limit from params)
+  ),
+  backfill as (
+    -- Narrow searches are backfilled with general rows so users always see broad alternatives.
+    select
+      m.id,
+      m.created_at,
+      row_number() over (order by m.created_at desc nulls last) as rn
+    from public.materials m
+    where m.search_is_general
+      and exists (select 1 from ranked)
+      and m.id not in (select id from ranked)
+  ),
+  combined as (
+    select r.id, 0 as bucket, r.score, r.created_at from ranked r
+    union all
+    select b.id, 1 as bucket, null::double precision, b.created_at
+    from backfill b
+    where b.rn <= (select match_limit from params) - (select count(*) from ranked)
+  )
+  select m.*
+  from combined c
+  join public.materials m on m.id = c.id
+  order by c.bucket, c.score desc nulls last, c.created_at desc nulls last;
+end;
+$$;
+
+revoke all on function public.match_materials(extensions.vector, integer, text) from public;
+grant execute on function public.match_materials(extensions.vector, integer, text) to authenticated;
+grant execute on function public.match_materials(extensions.vector, integer, text) to service_role;
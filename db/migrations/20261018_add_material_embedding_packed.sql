@@ -0,0 +1,19 @@
+-- Compact binary embedding storage for the Streamlit materials search.
+-- Values are "<dtype>:<base64 little-endian bytes>" (dtype f32 or f16), written by
+-- materials_manager.add_private_material and backfilled by
+-- scripts/backfill_material_embedding_packed.py. The legacy `embedding` column is kept
+-- as a fallback for rows that have not been backfilled yet.
+-- Safe to run multiple times.
+
+alter table if exists public.materials
+    add column if not exists embedding_packed text;
+
+alter table if exists public.materials
+    drop constraint if exists chk_materials_embedding_packed_format;
+
+alter table if exists public.materials
+    add constraint chk_materials_embedding_packed_format
+    check (embedding_packed is null or embedding_packed ~ '^(f32|f16):[A-Za-z0-9+/=]+$');
+
+comment on column public.materials.embedding_packed is
+'Packed embedding vector ("f32:" or "f16:" + base64), decoded once per process by embedding_codec.';
@@ -0,0 +1,169 @@
+-- Append-only per-object activity for the Streamlit app (legacy schema).
+-- Comments and client approval events move out of projects.cart
+-- (cart.comments / cart.approval_history, keyed by room_objects.id) into:
+--   object_comments(project_id, object_id, author_role, author_name, comment, created_at)
+--   object_approval_events(project_id, object_id, action, actor_role, actor_name, created_at)
+-- project_manager appends with single-row inserts and reads one project's rows through
+-- the (project_id, created_at) index, instead of rewriting the whole cart per event.
+-- Rows are visible wherever the parent project is visible to the caller, so the
+-- shared-link portal keeps working under the same projects RLS; inserts must also name
+-- an object that sits in one of that project's rooms.
+-- Existing cart entries are copied once (entries for deleted or foreign objects are
+-- dropped, unparseable timestamps become now()) and the two keys are then removed from
+-- the cart. Safe to run multiple times.
+
+do $$
+begin
+  if to_regclass('public.room_objects') is null
+     or to_regclass('public.project_rooms') is null
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'cart'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'room_objects' and column_name = 'id'
+         and data_type = 'uuid'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'id'
+         and data_type = 'uuid'
+     ) then
+    raise notice 'object activity tables skipped: legacy projects.cart / project_rooms / room_objects not found';
+    return;
+  end if;
+
+  execute $ddl$
+    create table if not exists public.object_comments (
+      id bigint generated always as identity primary key,
+      project_id uuid not null references public.projects(id) on delete cascade,
+      object_id uuid not null references public.room_objects(id) on delete cascade,
+      author_role text not null default 'unknown',
+      author_name text not null default 'Unknown',
+      comment text not null check (length(btrim(comment)) > 0),
+      created_at timestamptz not null default now()
+    )
+  $ddl$;
+
+  execute $ddl$
+    create table if not exists public.object_approval_events (
+      id bigint generated always as identity primary key,
+      project_id uuid not null references public.projects(id) on delete cascade,
+      object_id uuid not null references public.room_objects(id) on delete cascade,
+      action text not null check (action in ('approved', 'unapproved')),
+      actor_role text not null default 'unknown',
+      actor_name text not null default 'Unknown',
+      created_at timestamptz not null default now()
+    )
+  $ddl$;
+
+  execute 'create index if not exists idx_object_comments_project_created on public.object_comments (project_id, created_at)';
+  execute 'create index if not exists idx_object_comments_object_created on public.object_comments (object_id, created_at)';
+  execute 'create index if not exists idx_object_approval_events_project_created on public.object_approval_events (project_id, created_at)';
+  execute 'create index if not exists idx_object_approval_events_object_created on public.object_approval_events (object_id, created_at)';
+
+  execute 'alter table public.object_comments enable row level security';
+  execute 'alter table public.object_approval_events enable row level security';
+
+  execute 'drop policy if exists object_comments_select on public.object_comments';
+  execute 'create policy object_comments_select on public.object_comments for select
+           using (exists (select 1 from public.projects p where p.id = object_comments.project_id))';
+  execute 'drop policy if exists object_comments_insert on public.object_comments';
+  execute 'create policy object_comments_insert on public.object_comments for insert
+           with check (
+             exists (select 1 from public.projects p where p.id = object_comments.project_id)
+             and exists (
+               select 1
+               from public.room_objects ro
+               join public.project_rooms pr on pr.id = ro.room_id
+               where ro.id = object_comments.object_id
+                 and pr.project_id = object_comments.project_id
+             )
+           )';
+  execute 'drop policy if exists object_approval_events_select on public.object_approval_events';
+  execute 'create policy object_approval_events_select on public.object_approval_events for select
+           using (exists (select 1 from public.projects p where p.id = object_approval_events.project_id))';
+  execute 'drop policy if exists object_approval_events_insert on public.object_approval_events';
+  execute 'create policy object_approval_events_insert on public.object_approval_events for insert
+           with check (
+             exists (select 1 from public.projects p where p.id = object_approval_events.project_id)
+             and exists (
+               select 1
+               from public.room_objects ro
+               join public.project_rooms pr on pr.id = ro.room_id
+               where ro.id = object_approval_events.object_id
+                 and pr.project_id = object_approval_events.project_id
+             )
+           )';
+
+  execute 'grant select, insert on public.object_comments to anon, authenticated, service_role';
+  execute 'grant select, insert on public.object_approval_events to anon, authenticated, service_role';
+
+  -- Cart timestamps were written by the app and may be missing or malformed;
+  -- anything that does not cast becomes now() instead of aborting the copy.
+  execute $fn$
+    create or replace function pg_temp.activity_created_at(p_value text)
+    returns timestamptz
+    language plpgsql
+    as $body$
+    begin
+      return coalesce(p_value::timestamptz, now());
+    exception when data_exception then
+      return now();
+    end
+    $body$
+  $fn$;
+
+  -- One-shot copy of the cart JSON. Keys that are not ids of this project's
+  -- room_objects are skipped.
+  execute $copy$
+    insert into public.object_comments (project_id, object_id, author_role, author_name, comment, created_at)
+    select
+      p.id,
+      ro.id,
+      coalesce(nullif(btrim(c.value ->> 'author_role'), ''), 'unknown'),
+      coalesce(nullif(btrim(c.value ->> 'author_name'), ''), 'Unknown'),
+      btrim(c.value ->> 'comment'),
+      pg_temp.activity_created_at(c.value ->> 'created_at')
+    from public.projects p
+    cross join lateral jsonb_each(
+      case when jsonb_typeof(p.cart::jsonb -> 'comments') = 'object' then p.cart::jsonb -> 'comments' else '{}'::jsonb end
+    ) as obj(key, entries)
+    join public.room_objects ro on ro.id::text = obj.key
+    join public.project_rooms pr on pr.id = ro.room_id and pr.project_id = p.id
+    cross join lateral jsonb_array_elements(
+      case when jsonb_typeof(obj.entries) = 'array' then obj.entries else '[]'::jsonb end
+    ) as c(value)
+    where length(btrim(coalesce(c.value ->> 'comment', ''))) > 0
+  $copy$;
+
+  execute $copy$
+    insert into public.object_approval_events (project_id, object_id, action, actor_role, actor_name, created_at)
+    select
+      p.id,
+      ro.id,
+      e.value ->> 'action',
+      coalesce(nullif(btrim(e.value ->> 'actor_role'), ''), 'unknown'),
+      coalesce(nullif(btrim(e.value ->> 'actor_name'), ''), 'Unknown'),
+      pg_temp.activity_created_at(e.value ->> 'created_at')
+    from public.projects p
+    cross join lateral jsonb_each(
+      case when jsonb_typeof(p.cart::jsonb -> 'approval_history') = 'object' then p.cart::jsonb -> 'approval_history' else '{}'::jsonb end
+    ) as obj(key, entries)
+    join public.room_objects ro on ro.id::text = obj.key
+    join public.project_rooms pr on pr.id = ro.room_id and pr.project_id = p.id
+    cross join lateral jsonb_array_elements(
+      case when jsonb_typeof(obj.entries) = 'array' then obj.entries else '[]'::jsonb end
+    ) as e(value)
+    where e.value ->> 'action' in ('approved', 'unapproved')
+  $copy$;
+
+  execute $strip$
+    update public.projects
+    set cart = (cart::jsonb - 'comments' - 'approval_history')
+    where jsonb_typeof(cart::jsonb) = 'object'
+      and (cart::jsonb ? 'comments' or cart::jsonb ? 'approval_history')
+  $strip$;
+end
+$$;
@@ -0,0 +1,128 @@
+-- Path-level cart mutations for the Streamlit app (legacy schema).
+-- project_manager.patch_project_cart sends a list of ops instead of rewriting the whole
+-- projects.cart blob, so two editors changing different keys no longer clobber each other:
+--   {"op": "set",    "path": ["share", "enabled"], "value": true}
+--   {"op": "delete", "path": ["procurement", "notes", "<object id>"]}
+--   {"op": "append", "path": ["comments", "<object id>"], "value": {...}}
+-- Missing parent objects are created; append onto a missing/non-array value starts a new array.
+-- projects.cart_revision is bumped on every patch. Callers that computed their ops from a
+-- cart they read pass p_expected_revision and get 'cart_revision_conflict' (40001) if the
+-- cart changed in between. security invoker keeps the caller's projects RLS.
+-- Safe to run multiple times.
+
+do $$
+begin
+  if not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'cart'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'id'
+         and data_type = 'uuid'
+     ) then
+    raise notice 'patch_project_cart skipped: legacy projects.cart not found';
+    return;
+  end if;
+
+  execute 'alter table public.projects add column if not exists cart_revision bigint not null default 0';
+
+  execute $fn$
+    create or replace function public.patch_project_cart(
+      p_project_id uuid,
+      p_ops jsonb,
+      p_expected_revision bigint default null
+    )
+    returns bigint
+    language plpgsql
+    security invoker
+    set search_path = public
+    as $body$
+    declare
+      v_cart jsonb;
+      v_revision bigint;
+      v_op jsonb;
+      v_path text[];
+      v_idx int;
+      v_current jsonb;
+    begin
+      select p.cart::jsonb, p.cart_revision
+        into v_cart, v_revision
+      from public.projects p
+      where p.id = p_project_id
+      for update;
+
+      if not found then
+        raise exception 'project_not_found' using errcode = 'P0002';
+      end if;
+
+      if p_expected_revision is not null and p_expected_revision <> v_revision then
+        raise exception 'cart_revision_conflict' using errcode = '40001',
+          detail = format('expected %s, found %s', p_expected_revision, v_revision);
+      end if;
+
+      if v_cart is null then
+        v_cart := jsonb_build_object('items', '[]'::jsonb);
+      elsif jsonb_typeof(v_cart) = 'array' then
+        v_cart := jsonb_build_object('items', v_cart);
+      elsif jsonb_typeof(v_cart) <> 'object' then
+        v_cart := jsonb_build_object('items', '[]'::jsonb);
+      end if;
+
+      for v_op in
+        select value from jsonb_array_elements(coalesce(p_ops, '[]'::jsonb))
+      loop
+        select coalesce(array_agg(t.key order by t.ord), '{}'::text[])
+          into v_path
+        from jsonb_array_elements_text(coalesce(v_op -> 'path', '[]'::jsonb)) with ordinality as t(key, ord);
+
+        if coalesce(array_length(v_path, 1), 0) = 0 then
+          raise exception 'cart patch path is required';
+        end if;
+
+        if v_op ->> 'op' = 'delete' then
+          v_cart := v_cart #- v_path;
+          continue;
+        end if;
+
+        if v_op ->> 'op' not in ('set', 'append') then
+          raise exception 'unsupported cart patch op: %', v_op ->> 'op';
+        end if;
+
+        for v_idx in 1 .. array_length(v_path, 1) - 1 loop
+          if jsonb_typeof(v_cart #> v_path[1:v_idx]) is distinct from 'object' then
+            v_cart := jsonb_set(v_cart, v_path[1:v_idx], '{}'::jsonb, true);
+          end if;
+        end loop;
+
+        if v_op ->> 'op' = 'set' then
+          v_cart := jsonb_set(v_cart, v_path, coalesce(v_op -> 'value', 'null'::jsonb), true);
+        else
+          v_current := v_cart #> v_path;
+          if jsonb_typeof(v_current) is distinct from 'array' then
+            v_current := '[]'::jsonb;
+          end if;
+          v_cart := jsonb_set(
+            v_cart,
+            v_path,
+            v_current || jsonb_build_array(coalesce(v_op -> 'value', 'null'::jsonb)),
+            true
+          );
+        end if;
+      end loop;
+
+      update public.projects
+      set cart = v_cart,
+          cart_revision = v_revision + 1,
+          updated_at = now()
+      where id = p_project_id;
+
+      return v_revision + 1;
+    end
+    $body$
+  $fn$;
+
+  execute 'revoke all on function public.patch_project_cart(uuid, jsonb, bigint) from public';
+  execute 'grant execute on function public.patch_project_cart(uuid, jsonb, bigint) to anon, authenticated, service_role';
+end
+$$;
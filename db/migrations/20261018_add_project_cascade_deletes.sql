@@ -0,0 +1,174 @@
+-- Set-based deletes for the Streamlit app (legacy schema).
+-- project_rooms.project_id and room_objects.room_id now reference their parents with
+-- on delete cascade, so deleting a project or room removes its children in the same
+-- statement instead of one room_objects delete per room from Python.
+--   delete_legacy_project(p_project_id, p_owner_id)   -> true when the project was deleted
+--   delete_legacy_project_room(p_project_id, p_room_id) -> true when the room was deleted;
+--     also strips the room's objects from projects.cart (items, assignment notes,
+--     procurement blocks and legacy comment/approval entries) and bumps cart_revision.
+-- Existing FKs on those columns are replaced. The new constraints are added NOT VALID so
+-- legacy orphan rows do not block the migration; new deletes cascade either way.
+-- Both functions are security invoker, so projects RLS still decides what can be deleted.
+-- Safe to run multiple times.
+
+do $$
+declare
+  v_constraint record;
+begin
+  if to_regclass('public.project_rooms') is null
+     or to_regclass('public.room_objects') is null
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'owner_id'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'cart_revision'
+     ) then
+    raise notice 'cascade deletes skipped: legacy tables or projects.cart_revision not found';
+    return;
+  end if;
+
+  for v_constraint in
+    select c.conname, c.conrelid::regclass as table_name
+    from pg_constraint c
+    join pg_attribute a on a.attrelid = c.conrelid and a.attnum = any(c.conkey)
+    where c.contype = 'f'
+      and (
+        (c.conrelid = 'public.project_rooms'::regclass and a.attname = 'project_id')
+        or (c.conrelid = 'public.room_objects'::regclass and a.attname = 'room_id')
+      )
+      and c.conname not in ('project_rooms_project_id_cascade_fkey', 'room_objects_room_id_cascade_fkey')
+  loop
+    execute format('alter table %s drop constraint %I', v_constraint.table_name, v_constraint.conname);
+  end loop;
+
+  if not exists (select 1 from pg_constraint where conname = 'project_rooms_project_id_cascade_fkey') then
+    execute 'alter table public.project_rooms
+             add constraint project_rooms_project_id_cascade_fkey
+             foreign key (project_id) references public.projects(id) on delete cascade not valid';
+  end if;
+
+  if not exists (select 1 from pg_constraint where conname = 'room_objects_room_id_cascade_fkey') then
+    execute 'alter table public.room_objects
+             add constraint room_objects_room_id_cascade_fkey
+             foreign key (room_id) references public.project_rooms(id) on delete cascade not valid';
+  end if;
+
+  execute 'create index if not exists idx_project_rooms_project_id on public.project_rooms (project_id)';
+  execute 'create index if not exists idx_room_objects_room_id on public.room_objects (room_id)';
+
+  execute $fn$
+    create or replace function public.delete_legacy_project(
+      p_project_id uuid,
+      p_owner_id uuid default null
+    )
+    returns boolean
+    language plpgsql
+    security invoker
+    set search_path = public
+    as $body$
+    begin
+      delete from public.projects p
+      where p.id = p_project_id
+        and (p_owner_id is null or p.owner_id = p_owner_id);
+      return found;
+    end
+    $body$
+  $fn$;
+
+  execute $fn$
+    create or replace function public.delete_legacy_project_room(
+      p_project_id uuid,
+      p_room_id uuid
+    )
+    returns boolean
+    language plpgsql
+    security invoker
+    set search_path = public
+    as $body$
+    declare
+      v_cart jsonb;
+      v_keys text[];
+      v_block text;
+    begin
+      select p.cart::jsonb
+        into v_cart
+      from public.projects p
+      where p.id = p_project_id
+      for update;
+
+      if not found then
+        return false;
+      end if;
+
+      select coalesce(array_agg(o.id::text), '{}'::text[])
+        into v_keys
+      from public.room_objects o
+      where o.room_id = p_room_id;
+
+      delete from public.project_rooms r
+      where r.id = p_room_id
+        and r.project_id = p_project_id;
+
+      if not found then
+        return false;
+      end if;
+
+      if cardinality(v_keys) = 0 then
+        return true;
+      end if;
+
+      if jsonb_typeof(v_cart) = 'array' then
+        v_cart := jsonb_build_object('items', v_cart);
+      elsif jsonb_typeof(v_cart) is distinct from 'object' then
+        return true;
+      end if;
+
+      if jsonb_typeof(v_cart -> 'items') = 'array' then
+        v_cart := jsonb_set(
+          v_cart,
+          '{items}',
+          coalesce(
+            (
+              select jsonb_agg(i.value order by i.ord)
+              from jsonb_array_elements(v_cart -> 'items') with ordinality as i(value, ord)
+              where not (
+                jsonb_typeof(i.value) = 'object'
+                and coalesce(i.value ->> 'object_id', '') = any(v_keys)
+              )
+            ),
+            '[]'::jsonb
+          )
+        );
+      end if;
+
+      foreach v_block in array array['comments', 'approval_history', 'assignment_notes'] loop
+        if jsonb_typeof(v_cart -> v_block) = 'object' then
+          v_cart := jsonb_set(v_cart, array[v_block], (v_cart -> v_block) - v_keys);
+        end if;
+      end loop;
+
+      foreach v_block in array array['notes', 'quote_status', 'priority', 'target_price', 'order_stage'] loop
+        if jsonb_typeof(v_cart #> array['procurement', v_block]) = 'object' then
+          v_cart := jsonb_set(v_cart, array['procurement', v_block], (v_cart #> array['procurement', v_block]) - v_keys);
+        end if;
+      end loop;
+
+      update public.projects
+      set cart = v_cart,
+          cart_revision = cart_revision + 1,
+          updated_at = now()
+      where id = p_project_id;
+
+      return true;
+    end
+    $body$
+  $fn$;
+
+  execute 'revoke all on function public.delete_legacy_project(uuid, uuid) from public';
+  execute 'grant execute on function public.delete_legacy_project(uuid, uuid) to authenticated, service_role';
+  execute 'revoke all on function public.delete_legacy_project_room(uuid, uuid) from public';
+  execute 'grant execute on function public.delete_legacy_project_room(uuid, uuid) to authenticated, service_role';
+end
+$$;
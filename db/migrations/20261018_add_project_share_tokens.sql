@@ -0,0 +1,75 @@
+-- Indexed share-link lookup for the Streamlit client portal (legacy schema).
+-- project_share_tokens keeps sha256(token) -> project_id next to projects.cart.share, so
+-- get_shared_project_by_token no longer runs a JSONB containment scan over every project.
+-- rotate_project_share_token / set_project_share_enabled maintain the row (one per project).
+-- Anonymous portal visitors resolve a link through get_project_by_share_token_hash, which
+-- only returns the project for an enabled token; the table itself is owner-only.
+-- Existing cart share tokens are backfilled. Safe to run multiple times.
+
+create extension if not exists pgcrypto with schema extensions;
+
+do $$
+begin
+  if not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'cart'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'id'
+         and data_type = 'uuid'
+     ) then
+    raise notice 'project_share_tokens skipped: legacy projects.cart not found';
+    return;
+  end if;
+
+  execute $ddl$
+    create table if not exists public.project_share_tokens (
+      token_hash text primary key check (token_hash ~ '^[0-9a-f]{64}$'),
+      project_id uuid not null unique references public.projects(id) on delete cascade,
+      enabled boolean not null default true,
+      created_at timestamptz not null default now()
+    )
+  $ddl$;
+
+  execute 'alter table public.project_share_tokens enable row level security';
+  execute 'drop policy if exists project_share_tokens_owner on public.project_share_tokens';
+  execute 'create policy project_share_tokens_owner on public.project_share_tokens for all
+           using (exists (select 1 from public.projects p where p.id = project_share_tokens.project_id))
+           with check (exists (select 1 from public.projects p where p.id = project_share_tokens.project_id))';
+  execute 'grant select, insert, update, delete on public.project_share_tokens to authenticated, service_role';
+
+  execute $fn$
+    create or replace function public.get_project_by_share_token_hash(p_token_hash text)
+    returns setof public.projects
+    language sql
+    stable
+    security definer
+    set search_path = public
+    as $body$
+      select p.*
+      from public.project_share_tokens t
+      join public.projects p on p.id = t.project_id
+      where t.token_hash = p_token_hash
+        and t.enabled
+      limit 1
+    $body$
+  $fn$;
+
+  execute 'revoke all on function public.get_project_by_share_token_hash(text) from public';
+  execute 'grant execute on function public.get_project_by_share_token_hash(text) to anon, authenticated, service_role';
+
+  execute $backfill$
+    insert into public.project_share_tokens (token_hash, project_id, enabled, created_at)
+    select
+      encode(extensions.digest(p.cart::jsonb #>> '{share,token}', 'sha256'), 'hex'),
+      p.id,
+      lower(coalesce(p.cart::jsonb #>> '{share,enabled}', 'false')) in ('1', 'true', 'yes', 'on', 'enabled'),
+      coalesce((p.cart::jsonb #>> '{share,created_at}')::timestamptz, now())
+    from public.projects p
+    where jsonb_typeof(p.cart::jsonb) = 'object'
+      and length(btrim(coalesce(p.cart::jsonb #>> '{share,token}', ''))) > 0
+    on conflict do nothing
+  $backfill$;
+end
+$$;
@@ -0,0 +1,61 @@
+-- Lightweight read model for the Streamlit project library.
+-- project_manager.load_project_summaries() lists projects from this view so the
+-- dashboard no longer downloads every projects.cart blob on each rerun; the full
+-- row is fetched only for the opened project.
+-- security_invoker keeps the caller's RLS on projects / project_rooms / room_objects.
+-- Only created on the legacy schema (projects.owner_id + projects.cart + project_rooms).
+-- Safe to run multiple times.
+
+do $$
+begin
+  if to_regclass('public.project_rooms') is null
+     or to_regclass('public.room_objects') is null
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'cart'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'owner_id'
+     ) then
+    raise notice 'project_summaries skipped: legacy projects/project_rooms/room_objects tables not found';
+    return;
+  end if;
+
+  execute $view$
+    create or replace view public.project_summaries
+    with (security_invoker = true)
+    as
+    select
+      p.id,
+      p.owner_id,
+      p.name,
+      p.created_at,
+      p.updated_at,
+      (
+        select count(*)::integer
+        from public.project_rooms pr
+        where pr.project_id = p.id
+      ) as room_count,
+      (
+        select count(*)::integer
+        from public.room_objects ro
+        join public.project_rooms pr on pr.id = ro.room_id
+        where pr.project_id = p.id
+      ) as object_count,
+      coalesce(
+        jsonb_array_length(
+          case
+            when jsonb_typeof(p.cart::jsonb) = 'array' then p.cart::jsonb
+            when jsonb_typeof(p.cart::jsonb -> 'items') = 'array' then p.cart::jsonb -> 'items'
+          end
+        ),
+        0
+      ) as cart_item_count
+    from public.projects p
+  $view$;
+
+  execute 'grant select on public.project_summaries to authenticated, service_role';
+  execute 'create index if not exists idx_projects_owner_updated_at on public.projects (owner_id, updated_at desc)';
+end
+$$;
@@ -0,0 +1,103 @@
+-- Keep projects.updated_at current from child-table writes (legacy schema).
+-- Room and object edits used to be followed by a separate
+--   update projects set updated_at = now() where id = ...
+-- round trip from project_manager._touch_project. These statement-level triggers bump the
+-- parent project once per statement instead, so a bulk insert of 40 template objects costs
+-- one projects update and the app only sends the write it actually needs.
+-- project_touch_triggers_enabled() lets the app detect the triggers; until it exists,
+-- project_manager keeps sending the separate touch.
+-- security definer so client-portal approvals (room_objects updates under share-link RLS)
+-- still mark the project as changed; only updated_at of the affected projects is written.
+-- Safe to run multiple times.
+
+do $$
+begin
+  if to_regclass('public.project_rooms') is null
+     or to_regclass('public.room_objects') is null
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'owner_id'
+     )
+     or not exists (
+       select 1 from information_schema.columns
+       where table_schema = 'public' and table_name = 'projects' and column_name = 'updated_at'
+     ) then
+    raise notice 'project touch triggers skipped: legacy project_rooms/room_objects tables not found';
+    return;
+  end if;
+
+  execute $fn$
+    create or replace function public.touch_projects_from_rooms()
+    returns trigger
+    language plpgsql
+    security definer
+    set search_path = public
+    as $body$
+    begin
+      update public.projects p
+      set updated_at = now()
+      where p.id in (select distinct r.project_id from changed_rows r);
+      return null;
+    end
+    $body$
+  $fn$;
+
+  execute $fn$
+    create or replace function public.touch_projects_from_room_objects()
+    returns trigger
+    language plpgsql
+    security definer
+    set search_path = public
+    as $body$
+    begin
+      update public.projects p
+      set updated_at = now()
+      where p.id in (
+        select distinct pr.project_id
+        from changed_rows o
+        join public.project_rooms pr on pr.id = o.room_id
+      );
+      return null;
+    end
+    $body$
+  $fn$;
+
+  -- Transition tables allow only one event per trigger, hence three triggers per table.
+  execute 'drop trigger if exists trg_project_rooms_touch_project_ins on public.project_rooms';
+  execute 'create trigger trg_project_rooms_touch_project_ins after insert on public.project_rooms
+           referencing new table as changed_rows
+           for each statement execute function public.touch_projects_from_rooms()';
+  execute 'drop trigger if exists trg_project_rooms_touch_project_upd on public.project_rooms';
+  execute 'create trigger trg_project_rooms_touch_project_upd after update on public.project_rooms
+           referencing new table as changed_rows
+           for each statement execute function public.touch_projects_from_rooms()';
+  execute 'drop trigger if exists trg_project_rooms_touch_project_del on public.project_rooms';
+  execute 'create trigger trg_project_rooms_touch_project_del after delete on public.project_rooms
+           referencing old table as changed_rows
+           for each statement execute function public.touch_projects_from_rooms()';
+
+  execute 'drop trigger if exists trg_room_objects_touch_project_ins on public.room_objects';
+  execute 'create trigger trg_room_objects_touch_project_ins after insert on public.room_objects
+           referencing new table as changed_rows
+           for each statement execute function public.touch_projects_from_room_objects()';
+  execute 'drop trigger if exists trg_room_objects_touch_project_upd on public.room_objects';
+  execute 'create trigger trg_room_objects_touch_project_upd after update on public.room_objects
+           referencing new table as changed_rows
+           for each statement execute function public.touch_projects_from_room_objects()';
+  execute 'drop trigger if exists trg_room_objects_touch_project_del on public.room_objects';
+  execute 'create trigger trg_room_objects_touch_project_del after delete on public.room_objects
+           referencing old table as changed_rows
+           for each statement execute function public.touch_projects_from_room_objects()';
+
+  execute $fn$
+    create or replace function public.project_touch_triggers_enabled()
+    returns boolean
+    language sql
+    stable
+    as $body$
+      select true
+    $body$
+  $fn$;
+  execute 'grant execute on function public.project_touch_triggers_enabled() to anon, authenticated, service_role';
+end
+$$;
@@ -0,0 +1,60 @@
+-- Server-side status counters for the Streamlit Projects Workspace (legacy schema).
+-- project_manager.load_room_statuses / load_projects_statuses read one row per room or
+-- project from these views instead of downloading every room_objects row:
+--   total       objects in the room / project
+--   assigned    objects with a material_id
+--   designer_ok objects with status 'designer_approved'
+--   client_ok   objects with status 'client_approved'
+-- The selects avoid Postgres-only syntax so tests can check them against the Python
+-- fallback. security_invoker keeps the caller's RLS, which is why anon (the shared-link
+-- client portal) can be granted select too.
+-- Only created on the legacy schema (project_rooms + room_objects). Safe to run multiple times.
+
+do $$
+begin
+  if to_regclass('public.projects') is null
+     or to_regclass('public.project_rooms') is null
+     or to_regclass('public.room_objects') is null then
+    raise notice 'status count views skipped: legacy projects/project_rooms/room_objects tables not found';
+    return;
+  end if;
+
+  execute $view$
+    create or replace view public.room_status_counts
+    with (security_invoker = true)
+    as
+    select
+      r.id as room_id,
+      r.project_id as project_id,
+      count(o.id) as total,
+      coalesce(sum(case when o.material_id is not null then 1 else 0 end), 0) as assigned,
+      coalesce(sum(case when o.status = 'designer_approved' then 1 else 0 end), 0) as designer_ok,
+      coalesce(sum(case when o.status = 'client_approved' then 1 else 0 end), 0) as client_ok
+    from public.project_rooms r
+    left join public.room_objects o on o.room_id = r.id
+    group by r.id, r.project_id
+  $view$;
+
+  execute $view$
+    create or replace view public.project_status_counts
+    with (security_invoker = true)
+    as
+    select
+      p.id as project_id,
+      count(distinct r.id) as rooms,
+      count(o.id) as total,
+      coalesce(sum(case when o.material_id is not null then 1 else 0 end), 0) as assigned,
+      coalesce(sum(case when o.status = 'designer_approved' then 1 else 0 end), 0) as designer_ok,
+      coalesce(sum(case when o.status = 'client_approved' then 1 else 0 end), 0) as client_ok
+    from public.projects p
+    left join public.project_rooms r on r.project_id = p.id
+    left join public.room_objects o on o.room_id = r.id
+    group by p.id
+  $view$;
+
+  execute 'grant select on public.room_status_counts to anon, authenticated, service_role';
+  execute 'grant select on public.project_status_counts to anon, authenticated, service_role';
+  execute 'create index if not exists idx_project_rooms_project_id on public.project_rooms (project_id)';
+  execute 'create index if not exists idx_room_objects_room_id on public.room_objects (room_id)';
+end
+$$;
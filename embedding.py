@@ -1,13 +1,22 @@
 # embedding.py
+import hashlib
+import importlib.util
+import logging
 import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import streamlit as st
-from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
 load_dotenv()  # <-- IMPORTANT: reads .env for local dev
 
-@st.cache_resource
-def get_embedder():
+logger = logging.getLogger(__name__)
+
+
+def _model_path() -> str:
     path = os.getenv("EMBED_MODEL_PATH")
 
     if not path:
@@ -20,5 +29,293 @@ def get_embedder():
     # If EMBED_MODEL_PATH exists, we will NOT hit huggingface
     if not path:
         path = "sentence-transformers/all-MiniLM-L6-v2"
+    return path
+
+
+# EMBED_BACKEND selects the inference runtime:
+#   torch      SentenceTransformer on CPU (default)
+#   onnx       ONNX Runtime export in EMBED_ONNX_PATH
+#   onnx-int8  dynamically quantised ONNX export in EMBED_ONNX_PATH
+# ONNX backends fall back to torch when the export or onnxruntime is missing.
+def _backend() -> str:
+    backend = os.getenv("EMBED_BACKEND", "torch").strip().lower()
+    return backend if backend in {"torch", "onnx", "onnx-int8"} else "torch"
+
+
+def _onnx_path() -> str:
+    return os.getenv("EMBED_ONNX_PATH", "").strip() or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "models", "all-MiniLM-L6-v2-onnx"
+    )
+
+
+def _load_torch_embedder():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(_model_path(), device="cpu")
+
+
+# Backend that _load_embedder actually loaded; None until a model is loaded.
+_LOADED_BACKEND = None
+
+
+def _onnx_backend_usable(backend: str) -> bool:
+    from embedding_onnx import MODEL_FILES
+
+    model_dir = _onnx_path()
+    return (
+        importlib.util.find_spec("onnxruntime") is not None
+        and importlib.util.find_spec("tokenizers") is not None
+        and os.path.exists(os.path.join(model_dir, MODEL_FILES[backend]))
+        and os.path.exists(os.path.join(model_dir, "tokenizer.json"))
+    )
+
+
+def _load_embedder(backend: str):
+    global _LOADED_BACKEND
+    if backend != "torch":
+        try:
+            from embedding_onnx import OnnxEmbedder
+
+            model = OnnxEmbedder(_onnx_path(), variant=backend)
+            _LOADED_BACKEND = backend
+            return model
+        except Exception as exc:
+            logger.warning("%s embedding backend unavailable (%s); using torch.", backend, exc)
+    model = _load_torch_embedder()
+    _LOADED_BACKEND = "torch"
+    return model
+
+
+@st.cache_resource
+def get_embedder():
+    return _load_embedder(_backend())
+
+
+class LazyEmbedder:
+    """
+    Stand-in for get_embedder() that loads the model (and imports torch) on the
+    first `encode` or attribute access, so pages that never embed don't pay for it.
+    """
+
+    def __init__(self, loader=None):
+        self._loader = loader or get_embedder
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _resolve(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._loader()
+        return self._model
+
+    def encode(self, *args, **kwargs):
+        return self._resolve().encode(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+
+_LAZY_EMBEDDER = None
+
+
+def get_lazy_embedder() -> LazyEmbedder:
+    global _LAZY_EMBEDDER
+    if _LAZY_EMBEDDER is None:
+        _LAZY_EMBEDDER = LazyEmbedder()
+    return _LAZY_EMBEDDER
+
+
+def _effective_backend() -> str:
+    """The backend that loaded, or before the first load the one that would (ONNX falls back to torch)."""
+    if _LOADED_BACKEND is not None:
+        return _LOADED_BACKEND
+    backend = _backend()
+    if backend != "torch" and not _onnx_backend_usable(backend):
+        return "torch"
+    return backend
+
+
+def cache_model_name() -> str:
+    """Model identity for the embedding cache; backends with different numerics never share entries."""
+    return f"{_model_path()}#{_effective_backend()}"
+
+
+# -----------------------------
+# Embedding result cache
+# -----------------------------
+# Vectors are keyed by (model name, sha256 of whitespace-normalised text). Recent
+# vectors stay in memory; everything is also written to a small SQLite file so
+# restarts and other worker processes skip the forward pass too.
+# Set EMBED_CACHE_PATH to "off" to keep the cache in memory only.
+CACHE_MEMORY_SIZE = 4096
+_DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmp", "embedding_cache.sqlite3")
+
+
+def normalize_text(text) -> str:
+    return " ".join(str(text or "").split())
+
+
+def text_key(text) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str | None = None, memory_size: int = CACHE_MEMORY_SIZE):
+        self.path = path
+        self.memory_size = max(1, int(memory_size))
+        self._memory: "OrderedDict[tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _connection(self):
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+                db.execute(
+                    "create table if not exists embeddings ("
+                    "model text not null, text_hash text not null, dim integer not null, "
+                    "vector blob not null, primary key (model, text_hash))"
+                )
+                db.commit()
+                self._db = db
+            except Exception:
+                # Read-only or missing disk: carry on with the memory tier only.
+                self.path = None
+        return self._db
+
+    def _remember(self, key, vec):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, hashes: list[str]) -> dict:
+        found = {}
+        missing = []
+        with self._lock:
+            for text_hash in hashes:
+                vec = self._memory.get((model, text_hash))
+                if vec is not None:
+                    self._memory.move_to_end((model, text_hash))
+                    found[text_hash] = vec
+                else:
+                    missing.append(text_hash)
+
+            db = self._connection()
+            if db is not None and missing:
+                unique = list(dict.fromkeys(missing))
+                for start in range(0, len(unique), 500):
+                    chunk = unique[start : start + 500]
+                    marks = ",".join("?" for _ in chunk)
+                    try:
+                        rows = db.execute(
+                            f"select text_hash, vector from embeddings where model = ? and text_hash in ({marks})",
+                            [model, *chunk],
+                        ).fetchall()
+                    except Exception:
+                        rows = []
+                    for text_hash, blob in rows:
+                        vec = np.frombuffer(blob, dtype="<f4").copy()
+                        vec.setflags(write=False)
+                        found[text_hash] = vec
+                        self._remember((model, text_hash), vec)
+                        self.stats["disk_hits"] += 1
+
+            for text_hash in hashes:
+                if text_hash in found:
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+        return found
+
+    def put_many(self, model: str, items: dict) -> dict:
+        stored = {}
+        with self._lock:
+            rows = []
+            for text_hash, vec in items.items():
+                arr = np.ascontiguousarray(vec, dtype="<f4").reshape(-1)
+                arr.setflags(write=False)
+                self._remember((model, text_hash), arr)
+                stored[text_hash] = arr
+                rows.append((model, text_hash, int(arr.size), arr.tobytes()))
+            db = self._connection()
+            if db is not None and rows:
+                try:
+                    db.executemany("insert or replace into embeddings values (?, ?, ?, ?)", rows)
+                    db.commit()
+                except Exception:
+                    pass
+        return stored
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+            db = self._connection()
+            if db is not None:
+                db.execute("delete from embeddings")
+                db.commit()
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            path = os.getenv("EMBED_CACHE_PATH", _DEFAULT_CACHE_PATH).strip()
+            _CACHE = EmbeddingCache(None if path.lower() in {"", "off", "none"} else path)
+        return _CACHE
+
+
+def set_embedding_cache(cache: EmbeddingCache | None):
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
+
+
+def cache_stats() -> dict:
+    return dict(get_embedding_cache().stats)
+
+
+def encode_texts(texts, model=None, model_name: str | None = None) -> np.ndarray:
+    """
+    Encode `texts` as a float32 matrix, running the model only for texts missing
+    from the embedding cache.
+    """
+    texts = [normalize_text(text) for text in (texts or [])]
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    name = model_name or cache_model_name()
+    hashes = [text_key(text) for text in texts]
+    cache = get_embedding_cache()
+    found = cache.get_many(name, hashes)
+
+    todo = {}
+    for text_hash, text in zip(hashes, texts):
+        if text_hash not in found:
+            todo.setdefault(text_hash, text)
+    if todo:
+        encoder = model if model is not None else get_embedder()
+        if model is None and model_name is None and cache_model_name() != name:
+            # The first load fell back to another backend; look up and store under its key.
+            return encode_texts(texts, model=encoder, model_name=cache_model_name())
+        vectors = np.asarray(encoder.encode(list(todo.values()), convert_to_numpy=True), dtype=np.float32)
+        found.update(cache.put_many(name, dict(zip(todo.keys(), vectors))))
+
+    return np.vstack([found[text_hash] for text_hash in hashes])
+
 
-    return SentenceTransformer(path, device="cpu")
\ No newline at end of file
+def encode_text(text, model=None, model_name: str | None = None) -> np.ndarray:
+    return encode_texts([text], model=model, model_name=model_name)[0]
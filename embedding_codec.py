@@ -0,0 +1,132 @@
+# embedding_codec.py — compact embedding storage and a per-process decode cache
+
+import ast
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Packed text format stored in materials.embedding_packed: "<dtype tag>:<base64 little-endian bytes>".
+_DTYPES = {
+    "f32": np.dtype("<f4"),
+    "f16": np.dtype("<f2"),
+}
+DEFAULT_TAG = "f16" if os.getenv("EMBED_STORAGE_DTYPE", "").strip().lower() in {"f16", "float16"} else "f32"
+
+# Decoded vectors kept per process; 50k x 384 float32 is roughly 75 MB.
+DECODE_CACHE_SIZE = 50_000
+
+
+def pack_vector(vec, tag: str = DEFAULT_TAG) -> str | None:
+    """Pack a 1-D vector into the `embedding_packed` text format."""
+    dtype = _DTYPES.get(tag)
+    if dtype is None or vec is None:
+        return None
+    try:
+        arr = np.asarray(vec, dtype=dtype).reshape(-1)
+    except Exception:
+        return None
+    if arr.size == 0:
+        return None
+    return f"{tag}:" + base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def unpack_vector(text) -> np.ndarray | None:
+    """Decode `embedding_packed` text into a contiguous float32 array, or None."""
+    if not isinstance(text, str) or ":" not in text:
+        return None
+    tag, _, payload = text.partition(":")
+    dtype = _DTYPES.get(tag.strip())
+    if dtype is None:
+        return None
+    try:
+        raw = base64.b64decode(payload.encode("ascii"), validate=True)
+    except Exception:
+        return None
+    if not raw or len(raw) % dtype.itemsize:
+        return None
+    return np.frombuffer(raw, dtype=dtype).astype(np.float32)
+
+
+def parse_vector(value) -> np.ndarray | None:
+    """
+    Parse a legacy `embedding` value: a list, an ndarray, or the text form returned
+    for json/pgvector columns ("[0.1, 0.2, ...]"). JSON is tried before literal_eval.
+    """
+    if value is None:
+        return None
+    parsed = value
+    if isinstance(parsed, str):
+        text = parsed.strip()
+        try:
+            parsed = json.loads(text)
+        except Exception:
+            try:
+                parsed = ast.literal_eval(text)
+            except Exception:
+                return None
+    if not isinstance(parsed, (list, tuple, np.ndarray)):
+        return None
+    try:
+        vec = np.ascontiguousarray(parsed, dtype=np.float32)
+    except Exception:
+        return None
+    if vec.ndim != 1 or vec.size == 0:
+        return None
+    return vec
+
+
+_CACHE: "OrderedDict[tuple[str, str], np.ndarray | None]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0}
+
+
+def decode_row_embedding(row: dict) -> np.ndarray | None:
+    """
+    Embedding of a materials row, preferring `embedding_packed` over `embedding`.
+    Results are cached by (id, updated_at), so each version of a row is parsed at
+    most once per process. Returned arrays are read-only; copy before mutating.
+    """
+    if not isinstance(row, dict):
+        return None
+    rid = row.get("id")
+    stamp = str(row.get("updated_at") or "")
+    # Without a version stamp a cached vector could go stale, so only parse.
+    key = (str(rid), stamp) if rid is not None and stamp else None
+
+    if key is not None:
+        with _CACHE_LOCK:
+            if key in _CACHE:
+                _CACHE.move_to_end(key)
+                _STATS["hits"] += 1
+                return _CACHE[key]
+
+    vec = unpack_vector(row.get("embedding_packed"))
+    if vec is None:
+        vec = parse_vector(row.get("embedding"))
+    if vec is not None:
+        vec.setflags(write=False)
+
+    if key is not None:
+        with _CACHE_LOCK:
+            _STATS["misses"] += 1
+            _CACHE[key] = vec
+            while len(_CACHE) > DECODE_CACHE_SIZE:
+                _CACHE.popitem(last=False)
+    return vec
+
+
+def cache_stats() -> dict:
+    with _CACHE_LOCK:
+        return {"hits": _STATS["hits"], "misses": _STATS["misses"], "size": len(_CACHE)}
+
+
+def clear_cache():
+    with _CACHE_LOCK:
+        _CACHE.clear()
+        _STATS["hits"] = 0
+        _STATS["misses"] = 0
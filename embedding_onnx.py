@@ -0,0 +1,77 @@
+# embedding_onnx.py — ONNX Runtime backend for the sentence embedder (no torch import)
+
+import os
+
+import numpy as np
+
+
+MODEL_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model_int8.onnx",
+}
+# all-MiniLM-L6-v2 truncates at 256 word pieces in sentence-transformers.
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxEmbedder:
+    """
+    Mean-pooled, L2-normalised sentence embeddings from an ONNX export of the
+    transformer (see scripts/export_onnx_embedder.py). `encode` follows the
+    SentenceTransformer signature used in this repo: a string returns a 1-D
+    vector, a list returns a (n, dim) matrix.
+    """
+
+    def __init__(self, model_dir: str, variant: str = "onnx", threads: int | None = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        file_name = MODEL_FILES.get(variant)
+        if file_name is None:
+            raise ValueError(f"Unknown ONNX variant: {variant}")
+        model_path = os.path.join(model_dir, file_name)
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        if not os.path.exists(model_path) or not os.path.exists(tokenizer_path):
+            raise FileNotFoundError(f"{model_path} and tokenizer.json are required; run scripts/export_onnx_embedder.py")
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.variant = variant
+
+    def _forward(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([enc.ids for enc in encodings], dtype=np.int64)
+        attention_mask = np.asarray([enc.attention_mask for enc in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.asarray([enc.type_ids for enc in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, sentences, convert_to_numpy=True, batch_size: int = 32, **_kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else [str(text) for text in sentences]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        step = max(1, int(batch_size or 32))
+        # Sort by length so each padded batch wastes little compute, then restore order.
+        order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), step):
+            chunk = order[start : start + step]
+            vectors = self._forward([texts[idx] for idx in chunk])
+            for idx, vec in zip(chunk, vectors):
+                out[idx] = vec
+        matrix = np.vstack(out)
+        return matrix[0] if single else matrix
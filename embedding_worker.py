@@ -0,0 +1,171 @@
+# embedding_worker.py — coalesces embedding requests into micro-batches
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, "") or default))
+    except Exception:
+        return default
+
+
+MAX_BATCH = _env_int("EMBED_BATCH_MAX_SIZE", 32)
+MAX_WAIT_MS = _env_int("EMBED_BATCH_MAX_WAIT_MS", 10)
+
+
+def _encode_with_model(texts: list[str]):
+    from embedding import encode_texts
+
+    # Cached texts skip the model; only misses reach the forward pass.
+    return encode_texts(texts)
+
+
+class EmbeddingBatcher:
+    """
+    Background worker that collects encode requests for up to `max_wait` seconds
+    (or until `max_batch` texts are queued) and runs one forward pass per batch.
+    Identical texts in a batch are encoded once.
+    """
+
+    def __init__(self, encode_batch=None, max_batch: int | None = None, max_wait: float | None = None):
+        self._encode_batch = encode_batch or _encode_with_model
+        self.max_batch = max(1, int(max_batch or MAX_BATCH))
+        self.max_wait = float(MAX_WAIT_MS / 1000.0 if max_wait is None else max_wait)
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "encoded": 0}
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._ensure_thread()
+        self.stats["requests"] += 1
+        self._queue.put((str(text or ""), future))
+        return future
+
+    def encode(self, text: str, timeout: float | None = None):
+        return self.submit(text).result(timeout)
+
+    def encode_many(self, texts, timeout: float | None = None) -> list:
+        futures = [self.submit(text) for text in (texts or [])]
+        return [future.result(timeout) for future in futures]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            live = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            unique = list(dict.fromkeys(text for text, _ in live))
+            try:
+                vectors = np.asarray(self._encode_batch(unique))
+                by_text = {text: vectors[idx] for idx, text in enumerate(unique)}
+            except Exception as exc:
+                for _, future in live:
+                    future.set_exception(exc)
+                continue
+            self.stats["batches"] += 1
+            self.stats["encoded"] += len(unique)
+            for text, future in live:
+                future.set_result(by_text[text])
+
+
+_BATCHER = None
+_BATCHER_LOCK = threading.Lock()
+
+# Follow-up work (e.g. writing embeddings back to Supabase) runs here so it
+# never blocks the batcher thread.
+_FOLLOW_UP = ThreadPoolExecutor(max_workers=2, thread_name_prefix="embedding-follow-up")
+_PENDING: set[Future] = set()
+_PENDING_LOCK = threading.Lock()
+
+
+def get_batcher() -> EmbeddingBatcher:
+    global _BATCHER
+    with _BATCHER_LOCK:
+        if _BATCHER is None:
+            _BATCHER = EmbeddingBatcher()
+        return _BATCHER
+
+
+def set_batcher(batcher: EmbeddingBatcher | None):
+    """Swap the process-wide batcher (tests and scripts with a custom encoder)."""
+    global _BATCHER
+    with _BATCHER_LOCK:
+        _BATCHER = batcher
+
+
+def encode_text(text: str, timeout: float | None = None):
+    return get_batcher().encode(text, timeout=timeout)
+
+
+def encode_many(texts, timeout: float | None = None) -> list:
+    return get_batcher().encode_many(texts, timeout=timeout)
+
+
+def schedule(text: str, on_vector) -> Future:
+    """
+    Encode `text` in the background and call `on_vector(vector)` off the batcher thread.
+    Returns a future for the follow-up; failures are swallowed after being recorded on it.
+    """
+    done = Future()
+    with _PENDING_LOCK:
+        _PENDING.add(done)
+
+    def _finish(encoded: Future):
+        def _follow_up():
+            try:
+                done.set_result(on_vector(encoded.result()))
+            except Exception as exc:
+                done.set_exception(exc)
+            finally:
+                with _PENDING_LOCK:
+                    _PENDING.discard(done)
+
+        _FOLLOW_UP.submit(_follow_up)
+
+    get_batcher().submit(text).add_done_callback(_finish)
+    return done
+
+
+def wait_for_pending(timeout: float | None = None) -> bool:
+    """Block until scheduled background work finishes; returns False on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        with _PENDING_LOCK:
+            pending = list(_PENDING)
+        if not pending:
+            return True
+        for future in pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.exception(timeout=remaining)
+            except Exception:
+                return False
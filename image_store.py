@@ -0,0 +1,270 @@
+# image_store.py — content-addressed store for mood-board images
+
+import base64
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from config import IMAGE_STORE_DIR
+
+# Carts keep "blob:sha256:<hex>" references; the bytes live in the store.
+REF_PREFIX = "blob:sha256:"
+_REF_RE = re.compile(r"^blob:sha256:([0-9a-f]{64})$")
+
+FULL_SIZE = 1600
+THUMB_SIZE = 480
+JPEG_QUALITY = 85
+THUMB_QUALITY = 80
+
+
+def is_ref(value) -> bool:
+    return bool(_REF_RE.match(str(value or "").strip()))
+
+
+def ref_digest(ref: str) -> str | None:
+    match = _REF_RE.match(str(ref or "").strip())
+    return match.group(1) if match else None
+
+
+def make_ref(data: bytes) -> str:
+    return REF_PREFIX + hashlib.sha256(data).hexdigest()
+
+
+def _to_jpeg(source, max_side: int, quality: int) -> bytes:
+    from PIL import Image
+
+    image = Image.open(source)
+    image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def decode_data_url(value: str) -> bytes | None:
+    text = str(value or "").strip()
+    if not text.startswith("data:image/") or ";base64," not in text:
+        return None
+    try:
+        return base64.b64decode(text.split(";base64,", 1)[1], validate=False)
+    except Exception:
+        return None
+
+
+class LocalImageStore:
+    """
+    SHA-256 keyed directory: <root>/full/ab/cd/<digest>.jpg plus a thumbnail under
+    <root>/thumb/. Writes are atomic and idempotent, so the same image uploaded twice
+    (or by two projects) is stored once.
+    """
+
+    def __init__(self, root: str = IMAGE_STORE_DIR):
+        self.root = root
+
+    def _path(self, kind: str, digest: str) -> str:
+        return os.path.join(self.root, kind, digest[:2], digest[2:4], f"{digest}.jpg")
+
+    def _write(self, path: str, data: bytes):
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def put(self, data: bytes, thumbnail: bytes | None = None) -> str:
+        ref = make_ref(data)
+        digest = ref_digest(ref)
+        self._write(self._path("full", digest), data)
+        if thumbnail is None:
+            try:
+                thumbnail = _to_jpeg(BytesIO(data), THUMB_SIZE, THUMB_QUALITY)
+            except Exception:
+                thumbnail = data
+        self._write(self._path("thumb", digest), thumbnail)
+        return ref
+
+    def get(self, ref: str, thumbnail: bool = False) -> bytes | None:
+        digest = ref_digest(ref)
+        if not digest:
+            return None
+        path = self._path("thumb" if thumbnail else "full", digest)
+        if thumbnail and not os.path.exists(path):
+            path = self._path("full", digest)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def exists(self, ref: str) -> bool:
+        digest = ref_digest(ref)
+        return bool(digest) and os.path.exists(self._path("full", digest))
+
+    def url(self, ref: str, thumbnail: bool = False) -> str | None:
+        # Files on the app host have no public URL; callers inline the bytes.
+        return None
+
+
+class BucketImageStore:
+    """
+    Same layout in a Supabase Storage bucket. `bucket` is `sb.storage.from_(name)`;
+    a public bucket serves images by URL instead of through the app.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    @staticmethod
+    def _key(kind: str, digest: str) -> str:
+        return f"{kind}/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+
+    def put(self, data: bytes, thumbnail: bytes | None = None) -> str:
+        ref = make_ref(data)
+        digest = ref_digest(ref)
+        if thumbnail is None:
+            try:
+                thumbnail = _to_jpeg(BytesIO(data), THUMB_SIZE, THUMB_QUALITY)
+            except Exception:
+                thumbnail = data
+        options = {"content-type": "image/jpeg", "upsert": "true"}
+        self.bucket.upload(self._key("full", digest), data, options)
+        self.bucket.upload(self._key("thumb", digest), thumbnail, options)
+        return ref
+
+    def get(self, ref: str, thumbnail: bool = False) -> bytes | None:
+        digest = ref_digest(ref)
+        if not digest:
+            return None
+        try:
+            return self.bucket.download(self._key("thumb" if thumbnail else "full", digest))
+        except Exception:
+            return None
+
+    def exists(self, ref: str) -> bool:
+        return self.get(ref, thumbnail=True) is not None
+
+    def url(self, ref: str, thumbnail: bool = False) -> str | None:
+        digest = ref_digest(ref)
+        if not digest:
+            return None
+        try:
+            return self.bucket.get_public_url(self._key("thumb" if thumbnail else "full", digest))
+        except Exception:
+            return None
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def _build_default_store(client=None):
+    # IMAGE_STORE_BUCKET=<name> serves images from a public Supabase Storage bucket;
+    # otherwise they live on local disk under IMAGE_STORE_DIR. Uploads need a client
+    # Storage will authorise: the one passed in, else the service-role client. A configured
+    # bucket without one is a deployment error, not a reason to write refs to local disk.
+    bucket = os.getenv("IMAGE_STORE_BUCKET", "").strip()
+    if bucket:
+        if client is None:
+            from supabase_client import get_service_client
+
+            client = get_service_client()
+        if client is None:
+            raise RuntimeError(
+                f"IMAGE_STORE_BUCKET={bucket!r} needs SUPABASE_SERVICE_ROLE_KEY to upload images."
+            )
+        return BucketImageStore(client.storage.from_(bucket))
+    return LocalImageStore(os.getenv("IMAGE_STORE_DIR", "").strip() or IMAGE_STORE_DIR)
+
+
+def get_image_store(client=None):
+    """The process-wide store; `client` only matters for the call that builds it."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = _build_default_store(client)
+        return _STORE
+
+
+def set_image_store(store):
+    """Swap the process-wide store (tests, or a BucketImageStore in deployments)."""
+    global _STORE
+    with _STORE_LOCK:
+        _STORE = store
+
+
+def put_upload(uploaded_file) -> str | None:
+    """Re-encode an upload to a 1600px JPEG, store it with its thumbnail and return its ref."""
+    try:
+        data = _to_jpeg(uploaded_file, FULL_SIZE, JPEG_QUALITY)
+        thumbnail = _to_jpeg(BytesIO(data), THUMB_SIZE, THUMB_QUALITY)
+    except Exception:
+        return None
+    return get_image_store().put(data, thumbnail)
+
+
+def put_data_url(value: str) -> str | None:
+    """Store the bytes of a legacy `data:image/...;base64,` URL and return its ref."""
+    data = decode_data_url(value)
+    if not data:
+        return None
+    return get_image_store().put(data)
+
+
+_DISPLAY_CACHE: "OrderedDict[tuple[str, bool], str]" = OrderedDict()
+_DISPLAY_CACHE_SIZE = 64
+_DISPLAY_LOCK = threading.Lock()
+
+
+def display_src(ref: str, thumbnail: bool = True) -> str | None:
+    """
+    Something an <img src> can load: the store URL when it has one, else the
+    thumbnail inlined as a data URL (kept in a small per-process cache).
+    """
+    store = get_image_store()
+    url = store.url(ref, thumbnail=thumbnail)
+    if url:
+        return url
+    key = (ref, thumbnail)
+    with _DISPLAY_LOCK:
+        cached = _DISPLAY_CACHE.get(key)
+        if cached is not None:
+            _DISPLAY_CACHE.move_to_end(key)
+            return cached
+    data = store.get(ref, thumbnail=thumbnail)
+    if not data:
+        return None
+    src = "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii")
+    with _DISPLAY_LOCK:
+        _DISPLAY_CACHE[key] = src
+        while len(_DISPLAY_CACHE) > _DISPLAY_CACHE_SIZE:
+            _DISPLAY_CACHE.popitem(last=False)
+    return src
+
+
+def migrate_mood_images(cart):
+    """
+    Return (cart, moved) with inline data URLs in design_brief.mood_images replaced
+    by store refs. Other refs and cart shapes are returned untouched.
+    """
+    if not isinstance(cart, dict):
+        return cart, 0
+    brief = cart.get("design_brief")
+    if not isinstance(brief, dict) or not isinstance(brief.get("mood_images"), list):
+        return cart, 0
+    moved = 0
+    refs = []
+    for value in brief["mood_images"]:
+        ref = put_data_url(value) if str(value or "").startswith("data:image/") else None
+        if ref:
+            moved += 1
+            refs.append(ref)
+        else:
+            refs.append(value)
+    if not moved:
+        return cart, 0
+    return {**cart, "design_brief": {**brief, "mood_images": refs}}, moved
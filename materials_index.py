@@ -0,0 +1,328 @@
+# materials_index.py — in-process vector index over the visible materials library
+
+import base64
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from embedding_codec import decode_row_embedding
+
+
+# One index per RLS visibility scope; oldest scopes are evicted first.
+MAX_SCOPES = 32
+
+
+def scope_key(access_token: str | None) -> str:
+    """
+    Cache key for the rows a token can see under RLS.
+    Uses the JWT subject when readable so token refreshes keep the same index;
+    the visible id set is always re-listed with the caller's own token, so the
+    key only selects a cache slot and never grants access by itself.
+    """
+    token = str(access_token or "").strip()
+    if not token:
+        return "anon"
+    parts = token.split(".")
+    if len(parts) == 3:
+        try:
+            payload = parts[1] + "=" * (-len(parts[1]) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload.encode("ascii")))
+            subject = str(claims.get("sub") or "").strip()
+            if subject:
+                return f"user:{subject}"
+        except Exception:
+            pass
+    return "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class MaterialIndex:
+    """
+    Visible material rows plus a pre-normalised float32 embedding matrix.
+    Row i of `matrix` belongs to `rows[i]`; rows without a usable vector keep a zero
+    row and `has_vec[i] == False`. `version` changes whenever the row set changes.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.ids: list[str] = []
+        self.rows: list[dict] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.has_vec = np.zeros(0, dtype=bool)
+        self.dim = 0
+        self.version = 0
+        self._stamps: dict[str, str] = {}
+        self._by_id: dict[str, dict] = {}
+        self._vecs: dict[str, np.ndarray | None] = {}
+        self._ranker = None
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    def stale_ids(self, listing: list[dict]) -> list[str]:
+        """Ids from an `id,updated_at` listing that are new or changed since the last sync."""
+        stale = []
+        for item in listing or []:
+            rid = str(item.get("id") or "").strip()
+            if not rid:
+                continue
+            if rid not in self._by_id or self._stamps.get(rid) != str(item.get("updated_at") or ""):
+                stale.append(rid)
+        return stale
+
+    def apply(self, listing: list[dict], fetched_rows: list[dict]):
+        """
+        Sync to `listing` (ordered `id,updated_at` rows) using `fetched_rows` for the stale ids.
+        Rows missing from the listing are dropped; unchanged rows keep their parsed vectors.
+        """
+        fetched = {str(row.get("id")): row for row in (fetched_rows or []) if row.get("id") is not None}
+        for rid, row in fetched.items():
+            self._by_id[rid] = row
+            self._vecs[rid] = decode_row_embedding(row)
+            self._stamps[rid] = str(row.get("updated_at") or "")
+
+        ordered_ids = []
+        for item in listing or []:
+            rid = str(item.get("id") or "").strip()
+            if rid and rid in self._by_id:
+                ordered_ids.append(rid)
+
+        keep = set(ordered_ids)
+        for rid in [rid for rid in self._by_id if rid not in keep]:
+            self._by_id.pop(rid, None)
+            self._vecs.pop(rid, None)
+            self._stamps.pop(rid, None)
+
+        if not fetched and ordered_ids == self.ids:
+            return
+        self._rebuild(ordered_ids)
+
+    def replace(self, rows: list[dict]):
+        """Full reload for deployments where the incremental listing is unavailable."""
+        self._by_id = {}
+        self._vecs = {}
+        self._stamps = {}
+        listing = []
+        for idx, row in enumerate(rows or []):
+            rid = str(row.get("id") or f"__row_{idx}")
+            self._by_id[rid] = row
+            self._vecs[rid] = decode_row_embedding(row)
+            self._stamps[rid] = str(row.get("updated_at") or "")
+            listing.append(rid)
+        self._rebuild(listing)
+
+    def _rebuild(self, ordered_ids: list[str]):
+        vectors = [self._vecs.get(rid) for rid in ordered_ids]
+        dims = Counter(vec.size for vec in vectors if vec is not None)
+        dim = dims.most_common(1)[0][0] if dims else 0
+
+        matrix = np.zeros((len(ordered_ids), dim), dtype=np.float32)
+        has_vec = np.zeros(len(ordered_ids), dtype=bool)
+        for idx, vec in enumerate(vectors):
+            if vec is None or vec.size != dim:
+                continue
+            norm = float(np.linalg.norm(vec))
+            if norm > 0:
+                matrix[idx] = vec / norm
+                has_vec[idx] = True
+
+        self.ids = list(ordered_ids)
+        self.rows = [self._by_id[rid] for rid in ordered_ids]
+        self.matrix = matrix
+        self.has_vec = has_vec
+        self.dim = dim
+        self.version += 1
+
+    def ranker(self, text_for_row, is_general):
+        """Hybrid ranker over the current row set; rebuilt only when `version` changes."""
+        with self.lock:
+            if self._ranker is None or self._ranker.version != self.version:
+                self._ranker = HybridRanker(self, text_for_row, is_general)
+            return self._ranker
+
+
+# Weights of the hybrid materials score.
+PHRASE_WEIGHT = 2.0
+TOKEN_WEIGHT = 0.8
+SEMANTIC_WEIGHT = 0.55
+GENERAL_BONUS = 0.15
+SEMANTIC_RELEVANCE_FLOOR = 0.20
+
+_TOKEN_CACHE_SIZE = 256
+
+
+class HybridRanker:
+    """
+    Batched lexical + semantic scoring over a snapshot of a MaterialIndex.
+    Lowercase haystacks and a word -> rows inverted index are built once per row set;
+    a query then costs a vocabulary scan per token, one matrix-vector product and a
+    handful of array ops. Ordering matches the per-row loop it replaces: score desc,
+    then `created_at` desc, then listing order.
+    """
+
+    def __init__(self, index: MaterialIndex, text_for_row, is_general):
+        self.version = index.version
+        self.rows = index.rows
+        self.matrix = index.matrix
+        self.has_vec = index.has_vec
+        self.dim = index.dim
+        self.size = len(self.rows)
+
+        self.haystacks = [str(text_for_row(row) or "").lower() for row in self.rows]
+        postings: dict[str, list[int]] = {}
+        for pos, haystack in enumerate(self.haystacks):
+            for word in set(haystack.split()):
+                postings.setdefault(word, []).append(pos)
+        self.vocabulary = list(postings)
+        self.postings = {word: np.asarray(positions, dtype=np.int64) for word, positions in postings.items()}
+
+        self.is_general = np.asarray([bool(is_general(row)) for row in self.rows], dtype=bool)
+        created = np.asarray([str(row.get("created_at") or "") for row in self.rows], dtype=str)
+        # Dense ranks of created_at strings so the tie-break can run inside lexsort.
+        if self.size:
+            _, self.created_rank = np.unique(created, return_inverse=True)
+        else:
+            self.created_rank = np.zeros(0, dtype=np.int64)
+        self.positions = np.arange(self.size)
+        self._token_masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._token_lock = threading.Lock()
+
+    def _token_mask(self, token: str) -> np.ndarray:
+        # Tokens contain no whitespace, so `token in haystack` holds exactly when the
+        # token is a substring of one of the haystack's whitespace-separated words.
+        with self._token_lock:
+            cached = self._token_masks.get(token)
+            if cached is not None:
+                self._token_masks.move_to_end(token)
+                return cached
+
+        mask = np.zeros(self.size, dtype=bool)
+        for word in self.vocabulary:
+            if token in word:
+                mask[self.postings[word]] = True
+
+        with self._token_lock:
+            self._token_masks[token] = mask
+            while len(self._token_masks) > _TOKEN_CACHE_SIZE:
+                self._token_masks.popitem(last=False)
+        return mask
+
+    def cosine(self, query_vec):
+        """
+        Cosine similarity of every row against `query_vec` as one matrix-vector product.
+        Returns a float array with NaN for rows without a comparable vector, or None.
+        """
+        if query_vec is None or not self.size or not self.dim:
+            return None
+        query = np.asarray(query_vec, dtype=np.float32).reshape(-1)
+        if query.size != self.dim:
+            return None
+        norm = float(np.linalg.norm(query))
+        if norm <= 0:
+            return None
+        sims = (self.matrix @ (query / norm)).astype(np.float64)
+        sims[~self.has_vec] = np.nan
+        return sims
+
+    def _order(self, positions, scores=None):
+        if scores is None:
+            keys = (positions, -self.created_rank[positions])
+        else:
+            keys = (positions, -self.created_rank[positions], -scores[positions])
+        return positions[np.lexsort(keys)]
+
+    def search(self, query: str, query_vec, limit: int):
+        """
+        Rows ranked for `query`, backfilled with general rows up to `limit`.
+        Returns None when no row qualifies so callers can use their own fallback.
+        """
+        q_lower = str(query or "").strip().lower()
+        tokens = [tok for tok in q_lower.split() if tok]
+
+        token_hits = np.zeros(self.size, dtype=np.int64)
+        all_tokens = np.ones(self.size, dtype=bool)
+        for tok in tokens:
+            mask = self._token_mask(tok)
+            token_hits += mask
+            all_tokens &= mask
+
+        # A phrase can only occur where every token does; check just those haystacks.
+        phrase_hit = np.zeros(self.size, dtype=np.int64)
+        if tokens:
+            for pos in np.flatnonzero(all_tokens):
+                if q_lower in self.haystacks[pos]:
+                    phrase_hit[pos] = 1
+
+        lexical = (PHRASE_WEIGHT * phrase_hit) + (TOKEN_WEIGHT * token_hits)
+        scores = lexical.astype(np.float64)
+
+        similarities = self.cosine(query_vec)
+        semantic_relevant = np.zeros(self.size, dtype=bool)
+        if similarities is not None:
+            has_sim = ~np.isnan(similarities)
+            clipped = np.where(has_sim, np.maximum(np.nan_to_num(similarities, nan=0.0), 0.0), 0.0)
+            scores = np.where(has_sim, scores + clipped * SEMANTIC_WEIGHT, scores)
+            semantic_relevant = has_sim & (np.nan_to_num(similarities, nan=-1.0) >= SEMANTIC_RELEVANCE_FLOOR)
+
+        scores = np.where(self.is_general, scores + GENERAL_BONUS, scores)
+
+        eligible = (lexical > 0) | semantic_relevant | self.is_general
+        candidates = np.flatnonzero(eligible)
+        if not candidates.size:
+            return None
+        if limit <= 0:
+            return []
+
+        shortlist = candidates[top_k_positions(scores[candidates], limit)]
+        chosen = self._order(shortlist, scores)[:limit]
+
+        # If search is narrow, backfill with "general" rows so users always see broad alternatives.
+        if chosen.size < limit:
+            taken = np.zeros(self.size, dtype=bool)
+            taken[chosen] = True
+            backfill = np.flatnonzero(self.is_general & ~taken)
+            if backfill.size:
+                backfill = self._order(backfill)[: limit - chosen.size]
+                chosen = np.concatenate([chosen, backfill])
+
+        return [self.rows[pos] for pos in chosen]
+
+
+_INDEXES: "OrderedDict[str, MaterialIndex]" = OrderedDict()
+_INDEXES_LOCK = threading.Lock()
+
+
+def index_for_scope(access_token: str | None) -> MaterialIndex:
+    key = scope_key(access_token)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = MaterialIndex()
+            _INDEXES[key] = index
+        _INDEXES.move_to_end(key)
+        while len(_INDEXES) > MAX_SCOPES:
+            _INDEXES.popitem(last=False)
+        return index
+
+
+def clear_indexes():
+    with _INDEXES_LOCK:
+        _INDEXES.clear()
+
+
+def top_k_positions(scores, k: int):
+    """
+    Positions of every score that can reach the top `k` (ties at the cut are kept),
+    selected with argpartition instead of a full sort.
+    """
+    values = np.asarray(scores, dtype=np.float64)
+    total = values.size
+    if k <= 0 or total == 0:
+        return np.zeros(0, dtype=np.int64)
+    if total <= k:
+        return np.arange(total)
+    cut = np.partition(values, total - k)[total - k]
+    return np.flatnonzero(values >= cut)
@@ -1,6 +1,9 @@
-from supabase_client import get_supabase
-from embedding import get_embedder
+from supabase_client import get_supabase, is_missing_rpc_error
+import embedding_worker
+import materials_index
+from embedding_codec import pack_vector
 import ast
+import time
 import numpy as np
 
 
@@ -50,6 +53,41 @@ def list_materials(access_token: str):
     return res.data or []
 
 
+_INDEX_FETCH_CHUNK = 200
+
+
+def _visible_material_index(access_token: str):
+    """
+    Sync and return the in-process index for the caller's RLS scope.
+    Only an `id,updated_at` listing is transferred per call; full rows are fetched
+    for new or changed ids only.
+    """
+    index = materials_index.index_for_scope(access_token)
+    sb = get_supabase(access_token)
+    with index.lock:
+        try:
+            listing = (
+                sb.table("materials")
+                .select("id,updated_at")
+                .order("created_at", desc=True)
+                .execute()
+                .data
+                or []
+            )
+        except Exception:
+            # Older schemas without materials.updated_at: reload everything.
+            index.replace(list_materials(access_token))
+            return index
+
+        stale = index.stale_ids(listing)
+        fetched = []
+        for start in range(0, len(stale), _INDEX_FETCH_CHUNK):
+            chunk = stale[start : start + _INDEX_FETCH_CHUNK]
+            fetched.extend(sb.table("materials").select("*").in_("id", chunk).execute().data or [])
+        index.apply(listing, fetched)
+    return index
+
+
 def _material_text_for_embedding(payload: dict) -> str:
     tags_text = " ".join(_normalize_tags(payload.get("tags")))
 
@@ -67,15 +105,24 @@ def _try_build_embedding(payload: dict):
     if not text:
         return None
     try:
-        model = get_embedder()
-        return model.encode(text, convert_to_numpy=True).tolist()
+        return np.asarray(embedding_worker.encode_text(text)).tolist()
     except Exception:
         return None
 
 
-def add_private_material(access_token: str, user_id: str, payload: dict):
-    sb = get_supabase(access_token)
-    embedding = _try_build_embedding(payload)
+def _embedding_columns(embedding) -> list[dict]:
+    """Embedding column payloads, richest first, for schemas that lag behind."""
+    values = [float(x) for x in np.asarray(embedding).reshape(-1)]
+    candidates = []
+    packed = pack_vector(values)
+    if packed:
+        candidates.append({"embedding": values, "embedding_packed": packed})
+    # Deployments without materials.embedding_packed still get the list column.
+    candidates.append({"embedding": values})
+    return candidates
+
+
+def _material_row(user_id: str, payload: dict) -> dict:
     lead_time_days = payload.get("lead_time_days")
     try:
         lead_time_days = int(lead_time_days) if lead_time_days is not None else None
@@ -84,7 +131,7 @@ def add_private_material(access_token: str, user_id: str, payload: dict):
     if lead_time_days is not None and lead_time_days <= 0:
         lead_time_days = None
 
-    row = {
+    return {
         "owner_id": user_id,
         "visibility": "private",
         "name": payload["name"],
@@ -98,20 +145,17 @@ def add_private_material(access_token: str, user_id: str, payload: dict):
         "image_url": payload.get("image_url"),
         "tags": payload.get("tags", []),  # jsonb list
     }
-    if embedding is not None:
-        row["embedding"] = embedding
 
-    attempts = [dict(row)]
-    without_embedding = dict(row)
-    without_embedding.pop("embedding", None)
-    attempts.append(without_embedding)
 
-    without_optional_columns = dict(without_embedding)
-    without_optional_columns.pop("supplier", None)
-    without_optional_columns.pop("supplier_name", None)
-    without_optional_columns.pop("lead_time_days", None)
-    attempts.append(without_optional_columns)
+def _without_optional_columns(row: dict) -> dict:
+    clean = dict(row)
+    clean.pop("supplier", None)
+    clean.pop("supplier_name", None)
+    clean.pop("lead_time_days", None)
+    return clean
+
 
+def _insert_material_rows(sb, attempts: list):
     last_error = None
     res = None
     for candidate in attempts:
@@ -130,102 +174,143 @@ def add_private_material(access_token: str, user_id: str, payload: dict):
         # This usually means RLS blocked it or the token isn't attached
         raise RuntimeError(f"Insert failed. Response: {res}")
 
-    return res.data[0]
+    return res.data
+
+
+def _backfill_material_embedding(access_token: str, material_id: str, embedding):
+    sb = get_supabase(access_token)
+    last_error = None
+    for columns in _embedding_columns(embedding):
+        # Bump updated_at so in-process search indexes pick up the new vector.
+        for stamp in ({"updated_at": "now()"}, {}):
+            try:
+                sb.table("materials").update({**columns, **stamp}).eq("id", material_id).execute()
+                return True
+            except Exception as exc:
+                last_error = exc
+    raise last_error
+
+
+def _schedule_embedding_backfill(access_token: str, material_row: dict, payload: dict):
+    text = _material_text_for_embedding(payload)
+    material_id = (material_row or {}).get("id")
+    if not text or material_id is None:
+        return None
+    return embedding_worker.schedule(
+        text,
+        lambda vector: _backfill_material_embedding(access_token, str(material_id), vector),
+    )
+
+
+def add_private_material(access_token: str, user_id: str, payload: dict, defer_embedding: bool = True):
+    """
+    Insert a private material. By default the row is saved without an embedding and the
+    embedding worker fills `embedding` in the background; pass defer_embedding=False to
+    encode before the insert.
+    """
+    sb = get_supabase(access_token)
+    row = _material_row(user_id, payload)
+    embedding = None if defer_embedding else _try_build_embedding(payload)
+
+    attempts = []
+    if embedding is not None:
+        attempts.extend({**row, **columns} for columns in _embedding_columns(embedding))
+    attempts.append(dict(row))
+    attempts.append(_without_optional_columns(row))
+
+    created = _insert_material_rows(sb, attempts)[0]
+    if defer_embedding:
+        _schedule_embedding_backfill(access_token, created, payload)
+    return created
+
+
+def add_private_materials_bulk(access_token: str, user_id: str, payloads: list[dict]):
+    """
+    Insert many private materials in one request and queue their embeddings, which the
+    worker encodes in micro-batches. Scripts should call
+    embedding_worker.wait_for_pending() before exiting.
+    """
+    clean_payloads = [p for p in (payloads or []) if isinstance(p, dict) and p.get("name")]
+    if not clean_payloads:
+        return []
+
+    sb = get_supabase(access_token)
+    rows = [_material_row(user_id, payload) for payload in clean_payloads]
+    created = _insert_material_rows(sb, [rows, [_without_optional_columns(row) for row in rows]])
+
+    # Inserted rows come back in payload order.
+    for material_row, payload in zip(created, clean_payloads):
+        _schedule_embedding_backfill(access_token, material_row, payload)
+    return created
+
+
+# When match_materials is not deployed, skip the RPC for this long before probing again.
+_MATCH_RPC_RETRY_SECONDS = 300.0
+_match_rpc_unavailable_until = 0.0
+
+
+def _encode_query(text: str):
+    try:
+        return np.asarray(embedding_worker.encode_text(text), dtype=float)
+    except Exception:
+        return None
+
+
+def _match_materials_rpc(access_token: str, query: str, query_vec, limit: int):
+    """
+    Top-k rows from the `match_materials` DB function (pgvector + HNSW).
+    Returns None when the function is missing or fails, so callers fall back
+    to the in-process ranker. Only a missing function pauses the RPC; other errors
+    are retried on the next search.
+    """
+    global _match_rpc_unavailable_until
+    if query_vec is None or time.monotonic() < _match_rpc_unavailable_until:
+        return None
+    try:
+        sb = get_supabase(access_token)
+        res = sb.rpc(
+            "match_materials",
+            {
+                "query_embedding": [float(x) for x in np.asarray(query_vec).reshape(-1)],
+                "match_count": int(limit),
+                "query_text": query,
+            },
+        ).execute()
+    except Exception as exc:
+        if is_missing_rpc_error(exc):
+            _match_rpc_unavailable_until = time.monotonic() + _MATCH_RPC_RETRY_SECONDS
+        return None
+    rows = res.data
+    return rows if isinstance(rows, list) else []
 
 
 def search_materials_semantic(access_token: str, query: str, limit: int = 20):
     """
     Search materials via DB-side semantic search.
     Expected DB function:
-      match_materials(query_embedding vector, match_count int)
-    Fallback:
-      DB text search with ILIKE over common fields.
+      match_materials(query_embedding vector, match_count int, query_text text)
+    Fallbacks:
+      in-process hybrid ranker over the visible rows when the function is unavailable,
+      then DB text search with ILIKE over common fields (also when the function
+      returns no rows, e.g. before embeddings are backfilled).
     """
     q = (query or "").strip()
     if not q:
         return []
 
-    # Search against the same visible rows as the app library (global + private under RLS),
-    # then rank by lexical hits and embedding similarity when embeddings exist.
-    rows = list_materials(access_token)
-    if rows:
-        q_lower = q.lower()
-        tokens = [tok for tok in q_lower.split() if tok]
-
-        query_vec = None
-        try:
-            model = get_embedder()
-            query_vec = np.asarray(model.encode(q, convert_to_numpy=True), dtype=float)
-        except Exception:
-            query_vec = None
-
-        def _coerce_vec(value):
-            if value is None:
-                return None
-            parsed = value
-            if isinstance(parsed, str):
-                try:
-                    parsed = ast.literal_eval(parsed)
-                except Exception:
-                    return None
-            if not isinstance(parsed, (list, tuple)):
-                return None
-            try:
-                vec = np.asarray(parsed, dtype=float)
-            except Exception:
-                return None
-            if vec.ndim != 1 or vec.size == 0:
-                return None
-            return vec
-
-        ranked = []
-        for row in rows:
-            text = _material_text_for_embedding(row)
-            haystack = text.lower()
-            token_hits = sum(1 for tok in tokens if tok in haystack)
-            phrase_hit = 1 if q_lower in haystack else 0
-
-            lexical_score = (2.0 * phrase_hit) + (0.8 * token_hits)
-            score = lexical_score
-
-            row_vec = _coerce_vec(row.get("embedding"))
-            semantic_score = None
-            if query_vec is not None and row_vec is not None and row_vec.shape == query_vec.shape:
-                denom = float(np.linalg.norm(query_vec) * np.linalg.norm(row_vec))
-                if denom > 0:
-                    semantic_score = float(np.dot(query_vec, row_vec) / denom)
-                    score += max(semantic_score, 0.0) * 0.55
-
-            is_general = _is_general_material(row)
-            if is_general:
-                # Keep generally tagged rows visible in object search to avoid repetitive dead-ends.
-                score += 0.15
-
-            matches_query = lexical_score > 0
-            semantically_relevant = semantic_score is not None and semantic_score >= 0.20
-            if matches_query or semantically_relevant or is_general:
-                ranked.append((score, row))
-
-        if ranked:
-            ranked.sort(key=lambda item: (item[0], str(item[1].get("created_at") or "")), reverse=True)
-            top_rows = [row for _, row in ranked[:limit]]
-            seen_ids = {str(r.get("id")) for r in top_rows if r.get("id")}
-
-            # If search is narrow, backfill with "general" rows so users always see broad alternatives.
-            if len(top_rows) < limit:
-                general_rows = [
-                    row
-                    for row in rows
-                    if _is_general_material(row) and str(row.get("id")) not in seen_ids
-                ]
-                if general_rows:
-                    general_rows.sort(key=lambda r: str(r.get("created_at") or ""), reverse=True)
-                    for row in general_rows:
-                        top_rows.append(row)
-                        if len(top_rows) >= limit:
-                            break
-
-            return top_rows[:limit]
+    query_vec = _encode_query(q)
+    rpc_rows = _match_materials_rpc(access_token, q, query_vec, limit)
+    if rpc_rows:
+        return rpc_rows
+
+    if rpc_rows is None:
+        # Search against the same visible rows as the app library (global + private under RLS),
+        # then rank by lexical hits and embedding similarity when embeddings exist.
+        ranker = _visible_material_index(access_token).ranker(_material_text_for_embedding, _is_general_material)
+        if ranker.size:
+            top_rows = ranker.search(q, query_vec, limit)
+            if top_rows is not None:
+                return top_rows
 
     sb = get_supabase(access_token)
 
@@ -3,9 +3,11 @@ import streamlit as st
 from auth_ui import require_login
 from link_scraper import extract_material_payload_from_url
 from materials_manager import add_private_material
+from supabase_client import begin_query_run
 
 
 st.set_page_config(page_title="Add Material From Link", layout="centered")
+begin_query_run("Add_From_Link")
 require_login()
 st.title("Add Material From Link")
 access_token = st.session_state.get("sb_access_token")
@@ -1,11 +1,13 @@
 import streamlit as st
 from ui_utils import render_add_product_form
-from embedding import get_embedder
+from embedding import get_lazy_embedder
 import os
 from config import MODEL_PATH
 from auth_ui import require_login
+from supabase_client import begin_query_run
 
 
+begin_query_run("Add_Product")
 require_login()
 
 
@@ -17,7 +19,7 @@ VERSION_DIR = "catalog_versions"
 os.makedirs(IMAGE_DIR, exist_ok=True)
 os.makedirs(VERSION_DIR, exist_ok=True)
 
-model = get_embedder()
+model = get_lazy_embedder()
 
 # --- Render the form ---
 render_add_product_form(model, IMAGE_DIR, PRODUCT_CSV, MAIN_CATALOG, VERSION_DIR)
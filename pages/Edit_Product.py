@@ -1,12 +1,15 @@
 import streamlit as st
 import pickle
 import os
-from embedding import get_embedder
+from embedding import get_lazy_embedder
 from ui_utils import render_edit_product_form
-from config import CATALOG_PKL, CSV_LOG, VERSION_DIR, MODEL_PATH
+from config import CATALOG_PKL, CSV_LOG, VERSION_DIR, MODEL_PATH, CATALOG_STORE_DIR
+import catalog_store
 from auth_ui import require_login
+from supabase_client import begin_query_run
 
 st.set_page_config(page_title="Edit Product")
+begin_query_run("Edit_Product")
 require_login()
 
 # Load catalog
@@ -17,8 +20,13 @@ if not os.path.exists(CATALOG_PKL):
 with open(CATALOG_PKL, "rb") as f:
     df = pickle.load(f)
 
+# Products added since the last compaction live in the catalog store's log.
+if catalog_store.read_manifest(CATALOG_STORE_DIR):
+    store_is_current = catalog_store.is_current(CATALOG_STORE_DIR, CATALOG_PKL)
+    df = catalog_store.load_frame(CATALOG_STORE_DIR, base_df=None if store_is_current else df)
+
 # Load model
-model = get_embedder()
+model = get_lazy_embedder()
 
 # Call the form function
 render_edit_product_form(df, model, CATALOG_PKL, CSV_LOG, VERSION_DIR)
@@ -7,7 +7,7 @@ from typing import Any
 
 import streamlit as st
 
-from supabase_client import get_supabase
+from supabase_client import execute_in_chunks, get_supabase
 
 
 CATEGORY_VALUES = [
@@ -328,17 +328,26 @@ def delete_project_item(project_item_id: str, access_token: str | None = None):
     return True
 
 
-def _maps_for_project(project_id: str, access_token: str | None = None):
+def _maps_for_project(project_id: str, supplier_ids=None, access_token: str | None = None):
+    """
+    Room and supplier lookups for a project's items. Only the suppliers in
+    `supplier_ids` are fetched (chunked `in_`), not the whole suppliers table.
+    """
     sb = get_supabase(_token(access_token))
     rooms = list_rooms(project_id, access_token=access_token)
-    suppliers = sb.table("suppliers").select("id,name").execute().data or []
+    supplier_ids = [str(sid) for sid in (supplier_ids or []) if sid]
+    suppliers = execute_in_chunks(
+        lambda ids: sb.table("suppliers").select("id,name").in_("id", ids),
+        supplier_ids,
+    )
     room_map = {str(r.get("id")): r for r in rooms}
     supplier_map = {str(s.get("id")): s for s in suppliers if s.get("id")}
     return room_map, supplier_map
 
 
 def _enrich_project_items(project_id: str, rows: list[dict], access_token: str | None = None):
-    room_map, supplier_map = _maps_for_project(project_id, access_token=access_token)
+    supplier_ids = [row.get("supplier_id") for row in rows or []]
+    room_map, supplier_map = _maps_for_project(project_id, supplier_ids=supplier_ids, access_token=access_token)
     out = []
     for row in rows or []:
         room = room_map.get(str(row.get("room_id")))
@@ -1,8 +1,18 @@
 # project_manager.py — Supabase projects (safe, no global client)
 
 import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 import streamlit as st
-from supabase_client import get_supabase
+from supabase_client import (
+    chunk_values,
+    execute_in_chunks,
+    get_supabase,
+    is_missing_rpc_error,
+    is_missing_table_error,
+)
 from assets.villa_template import SMALL_VILLA_TEMPLATE
 import re
 import secrets
@@ -131,6 +141,179 @@ def load_projects():
         return []
 
 
+# Columns list views need; the cart blob stays on the server until a project is opened.
+PROJECT_SUMMARY_COLUMNS = "id,name,created_at,updated_at"
+_project_summary_view_available = True
+
+
+def load_project_summaries():
+    """
+    Lightweight rows for project lists: id, name, created_at, updated_at and, when the
+    `project_summaries` view exists, room_count / object_count / cart_item_count.
+    Use load_project(project_id) for the selected project's full row.
+    """
+    global _project_summary_view_available
+    try:
+        access_token = _token()
+        user_id = str(st.session_state.get("user_id") or "").strip()
+        if not access_token or not user_id:
+            return []
+
+        sb = get_supabase(access_token)
+        if _project_summary_view_available:
+            try:
+                return (
+                    sb.table("project_summaries")
+                    .select("*")
+                    .eq("owner_id", user_id)
+                    .order("updated_at", desc=True)
+                    .execute()
+                    .data
+                    or []
+                )
+            except Exception as exc:
+                # View not migrated yet: remember for this process. Other errors only
+                # send this call to the base table.
+                if is_missing_table_error(exc):
+                    _project_summary_view_available = False
+
+        return (
+            sb.table("projects")
+            .select(PROJECT_SUMMARY_COLUMNS)
+            .eq("owner_id", user_id)
+            .order("updated_at", desc=True)
+            .execute()
+            .data
+            or []
+        )
+    except Exception as e:
+        st.error(f"Failed to load projects from Supabase: {e}")
+        return []
+
+
+def load_project(project_id: str):
+    """Full row (including cart) for one of the logged-in user's projects, or None."""
+    try:
+        access_token = _token()
+        user_id = str(st.session_state.get("user_id") or "").strip()
+        if not access_token or not user_id or not project_id:
+            return None
+
+        sb = get_supabase(access_token)
+        rows = (
+            sb.table("projects")
+            .select("*")
+            .eq("id", project_id)
+            .eq("owner_id", user_id)
+            .limit(1)
+            .execute()
+            .data
+            or []
+        )
+        return rows[0] if rows else None
+    except Exception as e:
+        st.error(f"Failed to load project from Supabase: {e}")
+        return None
+
+
+class _ProjectNameTaken(RuntimeError):
+    pass
+
+
+# Set to False once create_legacy_project is found missing, so later creates skip the RPC.
+_create_project_rpc_available = True
+
+
+def _template_room_payloads(room_names, template_source: dict):
+    """Rooms with their template objects, in the room_objects column shape."""
+    payloads = []
+    for room_name in room_names:
+        objects = []
+        for obj in _template_objects_for_room_name(template_source, room_name):
+            objects.append(
+                {
+                    "object_key": str(obj.get("key") or "").strip() or _slugify(obj.get("name") or "item"),
+                    "object_name": str(obj.get("name") or "").strip() or "Item",
+                    "category": obj.get("category"),
+                    "qty": _safe_qty(obj.get("qty", 1)),
+                }
+            )
+        payloads.append({"name": room_name, "objects": objects})
+    return payloads
+
+
+def _create_project_rpc(sb, name: str, owner_id: str | None, room_payloads) -> str:
+    """
+    One round trip: create_legacy_project inserts the project, rooms and objects in a
+    single transaction, so a failure leaves nothing behind.
+    """
+    try:
+        res = sb.rpc(
+            "create_legacy_project",
+            {"p_name": name, "p_owner_id": owner_id or None, "p_rooms": room_payloads},
+        ).execute()
+    except Exception as exc:
+        if "project_name_exists" in str(exc):
+            raise _ProjectNameTaken(name) from exc
+        raise
+    data = res.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if isinstance(data, dict):
+        data = data.get("project_id") or data.get("create_legacy_project")
+    if not data:
+        raise RuntimeError("Failed to create project (RPC returned no id).")
+    return str(data)
+
+
+def _create_project_rows(sb, name: str, owner_id: str | None, room_payloads) -> str:
+    """Multi-call create for databases without create_legacy_project; undoes the project on failure."""
+    # Prevent duplicates (best effort; RLS will scope to user)
+    existing = sb.table("projects").select("id,name").eq("name", name).execute().data or []
+    if existing:
+        raise _ProjectNameTaken(name)
+
+    project_payload = {
+        "name": name,
+        "cart": [],
+    }
+    if owner_id:
+        project_payload["owner_id"] = owner_id
+
+    proj_res = sb.table("projects").insert(project_payload).execute()
+    if not proj_res.data:
+        raise RuntimeError("Failed to create project (insert returned no data).")
+    project_id = proj_res.data[0]["id"]
+
+    try:
+        rooms_payload = [{"project_id": project_id, "name": room["name"]} for room in room_payloads]
+        created_rooms = sb.table("project_rooms").insert(rooms_payload).execute().data or []
+        if not created_rooms:
+            raise RuntimeError("Failed to create project rooms.")
+
+        objects_by_room = {room["name"]: room["objects"] for room in room_payloads}
+        objects_payload = []
+        for room_row in created_rooms:
+            for obj in objects_by_room.get(room_row["name"], []):
+                objects_payload.append(
+                    {
+                        "room_id": room_row["id"],
+                        **obj,
+                        "status": "unassigned",
+                        "material_id": None,
+                    }
+                )
+        if objects_payload:
+            sb.table("room_objects").insert(objects_payload).execute()
+    except Exception:
+        try:
+            sb.table("projects").delete().eq("id", project_id).execute()
+        except Exception:
+            pass
+        raise
+    return project_id
+
+
 def create_project(name: str, rooms=None, template: str = "small_villa", template_map: dict | None = None):
     """
     Create a project + rooms + default room_objects.
@@ -139,9 +322,11 @@ def create_project(name: str, rooms=None, template: str = "small_villa", templat
       - if None/empty: creates rooms from SMALL_VILLA_TEMPLATE keys
     template_map:
       - if provided: this template overrides SMALL_VILLA_TEMPLATE
+    Uses the create_legacy_project RPC (one atomic round trip) when it is deployed,
+    otherwise separate inserts with a best-effort rollback.
     """
+    global _create_project_rpc_available
     name_clean = (name or "").strip()
-    project_id = None
 
     if not name_clean:
         st.warning("⚠️ Project name cannot be empty.")
@@ -149,83 +334,43 @@ def create_project(name: str, rooms=None, template: str = "small_villa", templat
 
     try:
         sb = get_supabase(_token())
-
-        # Prevent duplicates (best effort; RLS will scope to user)
-        existing = sb.table("projects").select("id,name").eq("name", name_clean).execute().data or []
-        if existing:
-            st.warning(f"⚠️ Project '{name_clean}' already exists.")
-            return load_projects()
-
-        # 1) Create project
-        project_payload = {
-            "name": name_clean,
-            "cart": [],
-        }
-
-        # If you already added owner_id to projects, set it here
-        if st.session_state.get("user_id"):
-            project_payload["owner_id"] = st.session_state.user_id
-
-        proj_res = sb.table("projects").insert(project_payload).execute()
-        if not proj_res.data:
-            raise RuntimeError("Failed to create project (insert returned no data).")
-
-        project_id = proj_res.data[0]["id"]
+        owner_id = st.session_state.get("user_id") or None
 
         template_source = _normalize_template_map(template_map) or _normalize_template_map(SMALL_VILLA_TEMPLATE)
-
-        # 2) Decide room names
         rooms = rooms or []
         if rooms:
             room_names = _normalize_room_names(rooms)
         else:
             room_names = _normalize_room_names(list(template_source.keys()))
-
         if not room_names:
-            sb.table("projects").delete().eq("id", project_id).execute()
             raise RuntimeError("Failed to create project rooms.")
+        room_payloads = _template_room_payloads(room_names, template_source)
 
-        # 3) Insert rooms (bulk)
-        rooms_payload = [{"project_id": project_id, "name": rname} for rname in room_names]
-        room_res = sb.table("project_rooms").insert(rooms_payload).execute()
-        created_rooms = room_res.data or []
-        if not created_rooms:
-            sb.table("projects").delete().eq("id", project_id).execute()
-            raise RuntimeError("Failed to create project rooms.")
-
-        # 4) Insert room objects (bulk)
-        objects_payload = []
-        for room_row in created_rooms:
-            rid = room_row["id"]
-            rname = room_row["name"]
-
-            for obj in _template_objects_for_room_name(template_source, rname):
-                objects_payload.append({
-                    "room_id": rid,
-                    "object_key": str(obj.get("key") or "").strip() or _slugify(obj.get("name") or "item"),
-                    "object_name": str(obj.get("name") or "").strip() or "Item",
-                    "category": obj.get("category"),
-                    "qty": _safe_qty(obj.get("qty", 1)),
-                    "status": "unassigned",
-                    "material_id": None,
-                })
-
-        if objects_payload:
-            sb.table("room_objects").insert(objects_payload).execute()
-
-        # 5) Set current project id for UI jump
+        project_id = None
+        if _create_project_rpc_available:
+            try:
+                project_id = _create_project_rpc(sb, name_clean, owner_id, room_payloads)
+            except _ProjectNameTaken:
+                raise
+            except Exception as exc:
+                if not is_missing_rpc_error(exc):
+                    raise
+                _create_project_rpc_available = False
+
+        if project_id is None:
+            project_id = _create_project_rows(sb, name_clean, owner_id, room_payloads)
+
+        # Set current project id for UI jump
         st.session_state.current_project_id = project_id
 
         st.success(f"✅ Created new project: {name_clean}")
         return load_projects()
 
+    except _ProjectNameTaken:
+        st.warning(f"⚠️ Project '{name_clean}' already exists.")
+        return load_projects()
     except Exception as e:
-        if project_id:
-            try:
-                sb.table("projects").delete().eq("id", project_id).execute()
-            except Exception:
-                pass
-            st.session_state.pop("current_project_id", None)
+        st.session_state.pop("current_project_id", None)
         st.error(f"❌ Failed to create project: {e}")
         return load_projects()
 
@@ -238,23 +383,25 @@ def _project_name_exists(sb, project_name: str, user_id: str | None = None):
     return bool(rows)
 
 
-def _next_duplicate_project_name(sb, source_name: str, user_id: str | None = None):
+def _next_duplicate_project_names(sb, source_name: str, count: int, user_id: str | None = None):
     query = sb.table("projects").select("name")
     if user_id:
         query = query.eq("owner_id", user_id)
     rows = query.execute().data or []
     existing_names = {str(row.get("name") or "").strip().casefold() for row in rows if row.get("name")}
 
-    base = f"{source_name} (Copy)"
-    if base.casefold() not in existing_names:
-        return base
-
-    index = 2
-    while True:
-        candidate = f"{source_name} (Copy {index})"
+    names = []
+    index = 1
+    while len(names) < count:
+        candidate = f"{source_name} (Copy)" if index == 1 else f"{source_name} (Copy {index})"
         if candidate.casefold() not in existing_names:
-            return candidate
+            names.append(candidate)
         index += 1
+    return names
+
+
+def _next_duplicate_project_name(sb, source_name: str, user_id: str | None = None):
+    return _next_duplicate_project_names(sb, source_name, 1, user_id=user_id)[0]
 
 
 def _portable_duplicate_cart_payload(source_cart):
@@ -268,14 +415,32 @@ def _portable_duplicate_cart_payload(source_cart):
     return payload or []
 
 
-def _delete_project_tree(sb, project_id: str):
+# Set to False once delete_legacy_project / delete_legacy_project_room are found missing.
+_cascade_delete_rpc_available = True
+
+
+def _delete_project_rpc(sb, project_id: str, owner_id: str | None = None):
     """
-    Best-effort cleanup for project + rooms + room_objects.
+    Delete a project in one call; rooms and objects go with it through the FK cascades.
+    Returns whether a row was deleted, or None when delete_legacy_project is not deployed.
     """
-    project_key = str(project_id or "").strip()
-    if not project_key:
-        return
+    global _cascade_delete_rpc_available
+    if not _cascade_delete_rpc_available:
+        return None
+    try:
+        res = sb.rpc(
+            "delete_legacy_project",
+            {"p_project_id": project_id, "p_owner_id": owner_id or None},
+        ).execute()
+    except Exception as exc:
+        if not is_missing_rpc_error(exc):
+            raise
+        _cascade_delete_rpc_available = False
+        return None
+    return bool(res.data)
 
+
+def _delete_project_rows(sb, project_key: str, owner_id: str | None = None):
     room_rows = (
         sb.table("project_rooms")
         .select("id")
@@ -284,12 +449,74 @@ def _delete_project_tree(sb, project_id: str):
         .data
         or []
     )
-    for room_row in room_rows:
-        room_id = str(room_row.get("id") or "").strip()
-        if room_id:
-            sb.table("room_objects").delete().eq("room_id", room_id).execute()
-    sb.table("project_rooms").delete().eq("project_id", project_key).execute()
-    sb.table("projects").delete().eq("id", project_key).execute()
+    room_ids = [str(row.get("id")) for row in room_rows if row.get("id") is not None]
+    if room_ids:
+        execute_in_chunks(
+            lambda ids: sb.table("room_objects").delete().in_("room_id", ids),
+            room_ids,
+            max_workers=1,
+        )
+        sb.table("project_rooms").delete().eq("project_id", project_key).execute()
+
+    delete_query = sb.table("projects").delete().eq("id", project_key)
+    if owner_id:
+        delete_query = delete_query.eq("owner_id", owner_id)
+    delete_query.execute()
+
+
+def _delete_project_tree(sb, project_id: str):
+    """
+    Best-effort cleanup for project + rooms + room_objects.
+    """
+    project_key = str(project_id or "").strip()
+    if not project_key:
+        return
+
+    if _delete_project_rpc(sb, project_key) is None:
+        _delete_project_rows(sb, project_key)
+
+
+# Set to False once clone_legacy_project is found missing, so later duplicates skip the RPC.
+_clone_project_rpc_available = True
+
+
+def _clone_project_rpc(sb, source_project_id: str, names, include_materials: bool):
+    """
+    Copies of one project in a single call: clone_legacy_project inserts every copy's
+    project row, rooms and objects in one transaction and returns the new ids in
+    `names` order. Either all copies exist afterwards or none do.
+    """
+    try:
+        res = sb.rpc(
+            "clone_legacy_project",
+            {
+                "p_source_project_id": source_project_id,
+                "p_names": list(names),
+                "p_include_materials": bool(include_materials),
+            },
+        ).execute()
+    except Exception as exc:
+        if "project_name_exists" in str(exc):
+            raise _ProjectNameTaken(str(exc)) from exc
+        raise
+    rows = res.data if isinstance(res.data, list) else []
+    created_ids = [str(row.get("project_id") or "").strip() for row in rows if isinstance(row, dict)]
+    if len(created_ids) != len(names) or not all(created_ids):
+        raise RuntimeError(f"Incomplete duplicate: expected {len(names)} projects, got {len(created_ids)}.")
+    return created_ids
+
+
+def _load_duplicate_source(sb, source_project_id: str, user_id: str):
+    source_query = (
+        sb.table("projects")
+        .select("id, name, cart, owner_id")
+        .eq("id", source_project_id)
+        .limit(1)
+    )
+    if user_id:
+        source_query = source_query.eq("owner_id", user_id)
+    source_rows = source_query.execute().data or []
+    return source_rows[0] if source_rows else None
 
 
 def duplicate_project(
@@ -304,7 +531,10 @@ def duplicate_project(
     - include_materials=True: copy assigned material_id to each object and reset status to "selected".
     Object-level comments/share metadata are intentionally not copied.
     Returns new project id (str) on success, otherwise None.
+    Uses the clone_legacy_project RPC when deployed; otherwise copies row by row and
+    deletes the partial copy on failure.
     """
+    global _clone_project_rpc_available
     source_project_id = str(project_id or "").strip()
     if not source_project_id:
         if show_feedback:
@@ -319,20 +549,11 @@ def duplicate_project(
         sb = get_supabase(_token())
         user_id = str(st.session_state.get("user_id") or "").strip()
 
-        source_query = (
-            sb.table("projects")
-            .select("id, name, cart, owner_id")
-            .eq("id", source_project_id)
-            .limit(1)
-        )
-        if user_id:
-            source_query = source_query.eq("owner_id", user_id)
-        source_rows = source_query.execute().data or []
-        if not source_rows:
+        source_project = _load_duplicate_source(sb, source_project_id, user_id)
+        if not source_project:
             if show_feedback:
                 st.error("Project not found.")
             return None
-        source_project = source_rows[0]
 
         source_name = str(source_project.get("name") or "Project").strip() or "Project"
         target_name = str(new_name or "").strip()
@@ -344,6 +565,22 @@ def duplicate_project(
                 st.warning(f"⚠️ Project '{target_name}' already exists.")
             return None
 
+        if _clone_project_rpc_available:
+            try:
+                created_project_id = _clone_project_rpc(sb, source_project_id, [target_name], include_materials)[0]
+            except _ProjectNameTaken:
+                if show_feedback:
+                    st.warning(f"⚠️ Project '{target_name}' already exists.")
+                return None
+            except Exception as exc:
+                if not is_missing_rpc_error(exc):
+                    raise
+                _clone_project_rpc_available = False
+            else:
+                if show_feedback:
+                    st.success(f"✅ Created duplicate project: {target_name}")
+                return created_project_id
+
         project_payload = {
             "name": target_name,
             "cart": _portable_duplicate_cart_payload(source_project.get("cart")),
@@ -476,10 +713,36 @@ def duplicate_project(
         return None
 
 
+def _duplicate_project_bulk_rpc(project_id: str, count: int, include_materials: bool):
+    """All copies through one clone_legacy_project call; None when the RPC is not deployed."""
+    global _clone_project_rpc_available
+    source_project_id = str(project_id or "").strip()
+    try:
+        sb = get_supabase(_token())
+        user_id = str(st.session_state.get("user_id") or "").strip()
+        source_project = _load_duplicate_source(sb, source_project_id, user_id) if source_project_id else None
+        if not source_project:
+            st.error("Project not found.")
+            return []
+        source_name = str(source_project.get("name") or "Project").strip() or "Project"
+        names = _next_duplicate_project_names(sb, source_name, count, user_id=user_id or None)
+        created_ids = _clone_project_rpc(sb, source_project_id, names, include_materials)
+    except Exception as exc:
+        if not isinstance(exc, _ProjectNameTaken) and is_missing_rpc_error(exc):
+            _clone_project_rpc_available = False
+            return None
+        st.error(f"❌ Bulk duplication failed, no copies were created: {exc}")
+        return []
+
+    st.success(f"✅ Created {len(created_ids)} duplicate project(s).")
+    return created_ids
+
+
 def duplicate_project_bulk(project_id: str, copies_count: int, include_materials: bool = False):
     """
     Duplicate one project multiple times.
-    Returns list of new project ids.
+    Returns list of new project ids. With the clone_legacy_project RPC all copies are
+    created in one transaction; otherwise copies are made one by one.
     """
     try:
         count = int(copies_count)
@@ -490,6 +753,11 @@ def duplicate_project_bulk(project_id: str, copies_count: int, include_materials
         st.warning("Copies count must be at least 1.")
         return []
 
+    if _clone_project_rpc_available:
+        created_ids = _duplicate_project_bulk_rpc(project_id, count, include_materials)
+        if created_ids is not None:
+            return created_ids
+
     created_ids = []
     for _ in range(count):
         new_id = duplicate_project(
@@ -509,9 +777,31 @@ def duplicate_project_bulk(project_id: str, copies_count: int, include_materials
     return created_ids
 
 
-def _touch_project(project_id: str):
+# Whether the project touch triggers (20261018_add_project_touch_triggers.sql) are
+# installed: None until probed once per process through project_touch_triggers_enabled().
+# Without them, room edits bump projects.updated_at with a separate update as before.
+_project_touch_triggers_available = None
+
+
+def _project_touch_triggers_installed(sb) -> bool:
+    global _project_touch_triggers_available
+    if _project_touch_triggers_available is None:
+        try:
+            res = sb.rpc("project_touch_triggers_enabled", {}).execute()
+        except Exception as exc:
+            if not is_missing_rpc_error(exc):
+                # Unknown for now; touch this time and probe again later.
+                return False
+            _project_touch_triggers_available = False
+        else:
+            _project_touch_triggers_available = bool(res.data)
+    return _project_touch_triggers_available
+
+
+def _touch_project(sb, project_id: str):
     try:
-        sb = get_supabase(_token())
+        if _project_touch_triggers_installed(sb):
+            return
         sb.table("projects").update({"updated_at": "now()"}).eq("id", project_id).execute()
     except Exception:
         # Non-critical best-effort metadata update.
@@ -582,7 +872,7 @@ def rename_project_room(project_id: str, room_id: str, new_name: str):
             return False
 
         sb.table("project_rooms").update({"name": name_clean}).eq("id", room_id).eq("project_id", project_id).execute()
-        _touch_project(project_id)
+        _touch_project(sb, project_id)
         return True
     except Exception as e:
         st.error(f"❌ Failed to rename room: {e}")
@@ -637,7 +927,7 @@ def add_project_room(project_id: str, room_name: str, template_map: dict | None
         if objects_payload:
             sb.table("room_objects").insert(objects_payload).execute()
 
-        _touch_project(project_id)
+        _touch_project(sb, project_id)
         return True
     except Exception as e:
         st.error(f"❌ Failed to add room: {e}")
@@ -649,45 +939,62 @@ def _prune_project_cart_object_metadata(project_id: str, object_ids):
     if not object_keys:
         return
 
-    try:
-        items, cart_meta = _project_cart_items_and_meta(project_id)
+    def _prune_ops(cart_meta: dict):
+        ops = []
+        items = cart_meta.get("items")
         if isinstance(items, list):
             next_items = []
             for row in items:
-                if not isinstance(row, dict):
-                    next_items.append(row)
-                    continue
-                ref_id = row.get("object_id")
-                if ref_id is not None and str(ref_id) in object_keys:
-                    continue
+                if isinstance(row, dict):
+                    ref_id = row.get("object_id")
+                    if ref_id is not None and str(ref_id) in object_keys:
+                        continue
                 next_items.append(row)
-            cart_meta["items"] = next_items
+            if len(next_items) != len(items):
+                ops.append(cart_set(["items"], next_items))
 
         for key in ["comments", "approval_history", "assignment_notes"]:
             block = cart_meta.get(key)
             if isinstance(block, dict):
-                cart_meta[key] = {str(k): v for k, v in block.items() if str(k) not in object_keys}
+                ops.extend(cart_delete([key, k]) for k in block if str(k) in object_keys)
 
         procurement = cart_meta.get("procurement")
         if isinstance(procurement, dict):
-            clean_procurement = dict(procurement)
             for key in ["notes", "quote_status", "priority", "target_price", "order_stage"]:
-                block = clean_procurement.get(key)
+                block = procurement.get(key)
                 if isinstance(block, dict):
-                    clean_procurement[key] = {
-                        str(k): v for k, v in block.items() if str(k) not in object_keys
-                    }
-            cart_meta["procurement"] = clean_procurement
+                    ops.extend(cart_delete(["procurement", key, k]) for k in block if str(k) in object_keys)
+        return ops
 
-        _save_project_cart(project_id, cart_meta)
+    try:
+        _patch_cart_from(project_id, _prune_ops)
     except Exception:
         # Best effort cleanup to avoid surfacing unrelated failures to users.
         pass
 
 
 def delete_project_room(project_id: str, room_id: str):
+    global _cascade_delete_rpc_available
     try:
         sb = get_supabase(_token())
+        if _cascade_delete_rpc_available:
+            try:
+                # Deletes the room (objects cascade) and strips their cart metadata in one call.
+                res = sb.rpc(
+                    "delete_legacy_project_room",
+                    {"p_project_id": project_id, "p_room_id": room_id},
+                ).execute()
+            except Exception as exc:
+                if not is_missing_rpc_error(exc):
+                    raise
+                _cascade_delete_rpc_available = False
+            else:
+                if not res.data:
+                    st.error("❌ Room not found for this project.")
+                    return False
+                _touch_project(sb, project_id)
+                return True
+
         target = (
             sb.table("project_rooms")
             .select("id")
@@ -717,7 +1024,7 @@ def delete_project_room(project_id: str, room_id: str):
             _prune_project_cart_object_metadata(project_id, object_ids)
 
         sb.table("project_rooms").delete().eq("id", room_id).eq("project_id", project_id).execute()
-        _touch_project(project_id)
+        _touch_project(sb, project_id)
         return True
     except Exception as e:
         st.error(f"❌ Failed to delete room: {e}")
@@ -734,31 +1041,17 @@ def delete_project(project_id: str):
         sb = get_supabase(_token())
         user_id = str(st.session_state.get("user_id") or "").strip()
 
-        target_query = sb.table("projects").select("id").eq("id", project_key).limit(1)
-        if user_id:
-            target_query = target_query.eq("owner_id", user_id)
-        target = target_query.execute().data or []
-        if not target:
+        deleted = _delete_project_rpc(sb, project_key, user_id)
+        if deleted is None:
+            target_query = sb.table("projects").select("id").eq("id", project_key).limit(1)
+            if user_id:
+                target_query = target_query.eq("owner_id", user_id)
+            deleted = bool(target_query.execute().data)
+            if deleted:
+                _delete_project_rows(sb, project_key, user_id)
+        if not deleted:
             st.error("Project not found.")
             return False
-
-        room_rows = (
-            sb.table("project_rooms")
-            .select("id")
-            .eq("project_id", project_key)
-            .execute()
-            .data
-            or []
-        )
-        room_ids = [str(row.get("id")) for row in room_rows if row.get("id") is not None]
-        if room_ids:
-            sb.table("room_objects").delete().in_("room_id", room_ids).execute()
-            sb.table("project_rooms").delete().eq("project_id", project_key).execute()
-
-        delete_query = sb.table("projects").delete().eq("id", project_key)
-        if user_id:
-            delete_query = delete_query.eq("owner_id", user_id)
-        delete_query.execute()
         return True
     except Exception as e:
         st.error(f"Failed to delete project: {e}")
@@ -776,30 +1069,31 @@ def get_current_cart(projects, project_id: str):
     return []
 
 
-def update_current_cart(project_id: str, updated_cart):
-    """Update cart for a specific project id."""
+def update_current_cart(project_id: str, updated_cart, expected_revision: int | None = None):
+    """
+    Replace the cart items for a specific project id; other cart keys are left as they are.
+    Pass the `cart_revision` read with the items so a concurrent edit is reported instead
+    of overwritten. Returns True when saved.
+    """
     try:
-        sb = get_supabase(_token())
-        proj = (
-            sb.table("projects")
-            .select("cart")
-            .eq("id", project_id)
-            .limit(1)
-            .execute()
-            .data
-        )
-        existing_cart = (proj[0].get("cart") if proj else None) or []
+        patch_project_cart(project_id, [cart_set(["items"], updated_cart)], expected_revision=expected_revision)
+        return True
+    except CartRevisionConflict:
+        st.error("❌ This cart was changed by someone else. Reload the project and try again.")
+        return False
+    except Exception as e:
+        st.error(f"❌ Failed to update cart for project '{project_id}': {e}")
+        return False
 
-        payload_cart = updated_cart
-        if isinstance(existing_cart, dict):
-            payload_cart = {
-                "items": updated_cart,
-                "budget": existing_cart.get("budget", {"project": None, "rooms": {}}),
-            }
 
-        sb.table("projects").update({"cart": payload_cart, "updated_at": "now()"}).eq("id", project_id).execute()
+def append_cart_item(project_id: str, item: dict):
+    """Append one item to the project's cart items without rewriting the others."""
+    try:
+        patch_project_cart(project_id, [cart_append(["items"], item)])
+        return True
     except Exception as e:
         st.error(f"❌ Failed to update cart for project '{project_id}': {e}")
+        return False
 
 
 def get_project_budget_from_row(project_row: dict | None):
@@ -838,29 +1132,18 @@ def get_project_budget_from_row(project_row: dict | None):
     return {"project": project_budget, "rooms": clean_rooms}
 
 
-def save_project_budget(project_id: str, project_budget: float | None, room_budgets: dict):
+def save_project_budget(
+    project_id: str,
+    project_budget: float | None,
+    room_budgets: dict,
+    expected_revision: int | None = None,
+):
     """
     Persist budget config inside `projects.cart.budget` while preserving existing cart items.
+    `expected_revision` is the `cart_revision` of the row the budgets were edited from;
+    a newer cart is reported instead of overwritten.
     """
     try:
-        sb = get_supabase(_token())
-        proj = (
-            sb.table("projects")
-            .select("cart")
-            .eq("id", project_id)
-            .limit(1)
-            .execute()
-            .data
-        )
-        existing_cart = (proj[0].get("cart") if proj else None) or []
-
-        if isinstance(existing_cart, dict):
-            items = existing_cart.get("items", []) or []
-        elif isinstance(existing_cart, list):
-            items = existing_cart
-        else:
-            items = []
-
         clean_rooms = {}
         if isinstance(room_budgets, dict):
             for k, v in room_budgets.items():
@@ -868,16 +1151,15 @@ def save_project_budget(project_id: str, project_budget: float | None, room_budg
                     continue
                 clean_rooms[str(k)] = float(v)
 
-        payload = {
-            "items": items,
-            "budget": {
-                "project": float(project_budget) if project_budget is not None else None,
-                "rooms": clean_rooms,
-            },
+        budget = {
+            "project": float(project_budget) if project_budget is not None else None,
+            "rooms": clean_rooms,
         }
-
-        sb.table("projects").update({"cart": payload, "updated_at": "now()"}).eq("id", project_id).execute()
+        patch_project_cart(project_id, [cart_set(["budget"], budget)], expected_revision=expected_revision)
         return True
+    except CartRevisionConflict:
+        st.error("❌ Budgets were changed by someone else. Reload the project and try again.")
+        return False
     except Exception as e:
         st.error(f"❌ Failed to save budget for project '{project_id}': {e}")
         return False
@@ -915,6 +1197,157 @@ def _save_project_cart(project_id: str, cart_payload: dict):
     sb.table("projects").update({"cart": cart_payload, "updated_at": "now()"}).eq("id", project_id).execute()
 
 
+# Cart mutations are sent as path-level patches to the patch_project_cart DB function,
+# which applies them under a row lock and bumps projects.cart_revision. Writers that
+# derive their patch from the current cart pass the revision they read and retry on
+# conflict, so concurrent designers/clients no longer overwrite each other.
+CART_PATCH_ATTEMPTS = 3
+_cart_patch_rpc_available = True
+
+
+class CartRevisionConflict(RuntimeError):
+    """The cart changed since it was read (expected_revision no longer matches)."""
+
+
+def cart_set(path, value) -> dict:
+    return {"op": "set", "path": [str(key) for key in path], "value": value}
+
+
+def cart_delete(path) -> dict:
+    return {"op": "delete", "path": [str(key) for key in path]}
+
+
+def cart_append(path, value) -> dict:
+    return {"op": "append", "path": [str(key) for key in path], "value": value}
+
+
+def _normalized_cart(cart) -> dict:
+    if isinstance(cart, dict):
+        return copy.deepcopy(cart)
+    if isinstance(cart, list):
+        return {"items": copy.deepcopy(cart)}
+    return {"items": []}
+
+
+def apply_cart_patch(cart, ops) -> dict:
+    """
+    Apply set/delete/append ops to a cart payload; the Python twin of patch_project_cart.
+    List-shaped legacy carts become {"items": [...]}; missing or non-object parents of a
+    set/append path are created as objects; append onto a non-list starts a new list.
+    """
+    result = _normalized_cart(cart)
+    for op in ops or []:
+        path = [str(key) for key in op.get("path") or []]
+        if not path:
+            raise ValueError("Cart patch path is required.")
+        kind = op.get("op")
+        if kind == "delete":
+            parent = result
+            for key in path[:-1]:
+                parent = parent.get(key) if isinstance(parent, dict) else None
+            if isinstance(parent, dict):
+                parent.pop(path[-1], None)
+            continue
+        if kind not in {"set", "append"}:
+            raise ValueError(f"Unsupported cart patch op: {kind}")
+
+        parent = result
+        for key in path[:-1]:
+            if not isinstance(parent.get(key), dict):
+                parent[key] = {}
+            parent = parent[key]
+        value = copy.deepcopy(op.get("value"))
+        if kind == "set":
+            parent[path[-1]] = value
+        else:
+            current = parent.get(path[-1])
+            parent[path[-1]] = (current if isinstance(current, list) else []) + [value]
+    return result
+
+
+def patch_project_cart(
+    project_id: str,
+    ops,
+    expected_revision: int | None = None,
+    access_token: str | None = None,
+):
+    """
+    Apply cart patch ops atomically. Returns the new cart revision (None on databases
+    without patch_project_cart, where the ops are applied to a read-modify-write).
+    Raises CartRevisionConflict when expected_revision is stale.
+    `access_token` defaults to the session token.
+    """
+    global _cart_patch_rpc_available
+    ops = list(ops or [])
+    if not ops:
+        return expected_revision
+
+    if _cart_patch_rpc_available:
+        try:
+            sb = get_supabase(access_token or _token())
+            res = sb.rpc(
+                "patch_project_cart",
+                {
+                    "p_project_id": str(project_id),
+                    "p_ops": ops,
+                    "p_expected_revision": expected_revision,
+                },
+            ).execute()
+            return int(res.data) if res.data is not None else None
+        except Exception as exc:
+            if "cart_revision_conflict" in str(exc):
+                raise CartRevisionConflict(f"Cart of project '{project_id}' changed; reload and retry.") from exc
+            if not is_missing_rpc_error(exc):
+                raise
+            _cart_patch_rpc_available = False
+
+    _items, cart_meta = _project_cart_items_and_meta(project_id)
+    _save_project_cart(project_id, apply_cart_patch(cart_meta, ops))
+    return None
+
+
+def _is_missing_cart_revision_error(exc: Exception) -> bool:
+    # 42703: undefined_column; the cart patch migration adds cart_revision with the RPC.
+    text = str(exc)
+    return "42703" in text or "cart_revision" in text
+
+
+def _load_cart_with_revision(project_id: str):
+    global _cart_patch_rpc_available
+    if _cart_patch_rpc_available:
+        sb = get_supabase(_token())
+        try:
+            rows = sb.table("projects").select("cart,cart_revision").eq("id", project_id).limit(1).execute().data or []
+        except Exception as exc:
+            if not _is_missing_cart_revision_error(exc):
+                raise
+            # Unmigrated database: no revision column means no patch_project_cart either.
+            _cart_patch_rpc_available = False
+        else:
+            if rows:
+                return _normalized_cart(rows[0].get("cart")), rows[0].get("cart_revision")
+            return {"items": []}, None
+    _items, cart_meta = _project_cart_items_and_meta(project_id)
+    return cart_meta, None
+
+
+def _patch_cart_from(project_id: str, build_ops):
+    """
+    For patches computed from the current cart: read cart + revision, build ops, and
+    apply them only if nobody wrote in between (re-reading up to CART_PATCH_ATTEMPTS times).
+    """
+    for attempt in range(CART_PATCH_ATTEMPTS):
+        cart, revision = _load_cart_with_revision(project_id)
+        ops = build_ops(cart)
+        if not ops:
+            return revision
+        try:
+            return patch_project_cart(project_id, ops, expected_revision=revision)
+        except CartRevisionConflict:
+            if attempt == CART_PATCH_ATTEMPTS - 1:
+                raise
+
+
 def get_project_share_from_row(project_row: dict | None):
     """
     Extract share metadata from project cart payload.
@@ -948,20 +1381,82 @@ def get_project_share_from_row(project_row: dict | None):
     return {"token": token, "created_at": created_at, "enabled": enabled}
 
 
+# Share links resolve through project_share_tokens (sha256(token) -> project_id) instead of
+# a JSONB containment scan over projects.cart; resolved tokens are cached briefly.
+# Rejected tokens are cached too, so the cache is bounded: expired entries are dropped on
+# every write and the least recently used ones are evicted past SHARE_TOKEN_CACHE_SIZE.
+SHARE_TOKEN_CACHE_TTL_SECONDS = 30.0
+SHARE_TOKEN_CACHE_SIZE = 1024
+_share_token_cache: "OrderedDict[str, tuple[float, str | None]]" = OrderedDict()
+_share_token_cache_lock = threading.Lock()
+_share_token_index_available = True
+
+
+def _share_token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _remember_share_token(token_hash: str, project_id: str | None):
+    now = time.monotonic()
+    with _share_token_cache_lock:
+        for cached_hash, (expires, _cached_id) in list(_share_token_cache.items()):
+            if expires <= now:
+                del _share_token_cache[cached_hash]
+        _share_token_cache[token_hash] = (now + SHARE_TOKEN_CACHE_TTL_SECONDS, project_id)
+        _share_token_cache.move_to_end(token_hash)
+        while len(_share_token_cache) > SHARE_TOKEN_CACHE_SIZE:
+            _share_token_cache.popitem(last=False)
+
+
+def _forget_share_tokens_for_project(project_id: str):
+    project_key = str(project_id)
+    with _share_token_cache_lock:
+        for token_hash, (_expires, cached_id) in list(_share_token_cache.items()):
+            if cached_id == project_key:
+                del _share_token_cache[token_hash]
+
+
+def _sync_share_token_index(project_id: str, values: dict):
+    """
+    Mirror cart.share into project_share_tokens. A new token_hash replaces the project's
+    previous one; {"enabled": ...} alone only flips the flag.
+    """
+    global _share_token_index_available
+    _forget_share_tokens_for_project(project_id)
+    if not _share_token_index_available:
+        return
+    try:
+        sb = get_supabase(_token())
+        table = sb.table("project_share_tokens")
+        if "token_hash" in values:
+            table.upsert({"project_id": str(project_id), **values}, on_conflict="project_id").execute()
+        else:
+            table.update(values).eq("project_id", str(project_id)).execute()
+    except Exception as exc:
+        if not is_missing_table_error(exc):
+            raise
+        _share_token_index_available = False
+
+
 def rotate_project_share_token(project_id: str):
     """
     Generate and persist a new client share token for a project.
     """
     try:
-        items, cart_meta = _project_cart_items_and_meta(project_id)
         token = secrets.token_urlsafe(24)
-        cart_meta["items"] = items
-        cart_meta["share"] = {
+        created_at = datetime.now(timezone.utc).isoformat()
+        share = {
             "token": token,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": created_at,
             "enabled": True,
         }
-        _save_project_cart(project_id, cart_meta)
+        # Index first: links resolve through it, and a project only matches a token that
+        # its cart also holds, so a failed cart write cannot leave a live unindexed token.
+        _sync_share_token_index(
+            project_id,
+            {"token_hash": _share_token_hash(token), "enabled": True, "created_at": created_at},
+        )
+        patch_project_cart(project_id, [cart_set(["share"], share)])
         return token
     except Exception as e:
         st.error(f"❌ Failed to rotate share token for project '{project_id}': {e}")
@@ -970,50 +1465,74 @@ def rotate_project_share_token(project_id: str):
 
 def set_project_share_enabled(project_id: str, enabled: bool):
     try:
-        items, cart_meta = _project_cart_items_and_meta(project_id)
-        share = cart_meta.get("share") if isinstance(cart_meta.get("share"), dict) else {}
-        share["enabled"] = bool(enabled)
-        cart_meta["items"] = items
-        cart_meta["share"] = share
-        _save_project_cart(project_id, cart_meta)
+        _sync_share_token_index(project_id, {"enabled": bool(enabled)})
+        patch_project_cart(project_id, [cart_set(["share", "enabled"], bool(enabled))])
         return True
     except Exception as e:
         st.error(f"❌ Failed to update share settings for project '{project_id}': {e}")
         return False
 
 
+# Per-object activity lives in append-only tables; cart keys are the pre-migration home.
+OBJECT_ACTIVITY_TABLES = {
+    "comments": ("object_comments", "author_role,author_name,comment,created_at"),
+    "approval_history": ("object_approval_events", "action,actor_role,actor_name,created_at"),
+}
+_object_activity_tables_available = True
+
+
+def _insert_object_activity(kind: str, row) -> bool:
+    """
+    Insert one row (or a list of rows, in one request) into the activity table for `kind`.
+    Returns False when the table is not migrated yet, so callers use the cart.
+    """
+    global _object_activity_tables_available
+    if not _object_activity_tables_available:
+        return False
+    table_name, _columns = OBJECT_ACTIVITY_TABLES[kind]
+    try:
+        sb = get_supabase(_token())
+        sb.table(table_name).insert(row).execute()
+        return True
+    except Exception as exc:
+        if not is_missing_table_error(exc):
+            raise
+        _object_activity_tables_available = False
+        return False
+
+
+def _append_cart_activity(project_id: str, kind: str, object_id: str, entry: dict):
+    _append_cart_activity_many(project_id, kind, [(object_id, entry)])
+
+
+def _append_cart_activity_many(project_id: str, kind: str, entries):
+    """Append (object_id, entry) pairs to cart[kind][object_id] in one patch."""
+    created_at = datetime.now(timezone.utc).isoformat()
+    patch_project_cart(
+        project_id,
+        [cart_append([kind, object_id], {**entry, "created_at": created_at}) for object_id, entry in entries],
+    )
+
+
 def append_object_comment(project_id: str, object_id: str, author_role: str, author_name: str, comment: str):
     """
-    Persist a per-object comment inside projects.cart.comments.
+    Persist a per-object comment as one object_comments row
+    (projects.cart.comments before the table is migrated).
     """
     text = (comment or "").strip()
     if not text:
         return False
 
+    entry = {
+        "author_role": (author_role or "unknown").strip(),
+        "author_name": (author_name or "Unknown").strip(),
+        "comment": text,
+    }
     try:
-        items, cart_meta = _project_cart_items_and_meta(project_id)
-        comments = cart_meta.get("comments")
-        if not isinstance(comments, dict):
-            comments = {}
-
-        key = str(object_id)
-        rows = comments.get(key)
-        if not isinstance(rows, list):
-            rows = []
-
-        rows.append(
-            {
-                "author_role": (author_role or "unknown").strip(),
-                "author_name": (author_name or "Unknown").strip(),
-                "comment": text,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-            }
-        )
-
-        comments[key] = rows
-        cart_meta["items"] = items
-        cart_meta["comments"] = comments
-        _save_project_cart(project_id, cart_meta)
+        if not _insert_object_activity(
+            "comments", {"project_id": str(project_id), "object_id": str(object_id), **entry}
+        ):
+            _append_cart_activity(project_id, "comments", object_id, entry)
         return True
     except Exception as e:
         st.error(f"❌ Failed to save comment: {e}")
@@ -1028,75 +1547,115 @@ def _append_object_approval_event(
     actor_name: str,
 ):
     """
-    Persist per-object approval history in projects.cart.approval_history.
+    Persist one approval event as an object_approval_events row
+    (projects.cart.approval_history before the table is migrated).
     """
     if action not in {"approved", "unapproved"}:
         return False
 
+    entry = {
+        "action": action,
+        "actor_role": (actor_role or "unknown").strip(),
+        "actor_name": (actor_name or "Unknown").strip(),
+    }
     try:
-        items, cart_meta = _project_cart_items_and_meta(project_id)
-        history = cart_meta.get("approval_history")
-        if not isinstance(history, dict):
-            history = {}
-
-        key = str(object_id)
-        rows = history.get(key)
-        if not isinstance(rows, list):
-            rows = []
-
-        rows.append(
-            {
-                "action": action,
-                "actor_role": (actor_role or "unknown").strip(),
-                "actor_name": (actor_name or "Unknown").strip(),
-                "created_at": datetime.now(timezone.utc).isoformat(),
-            }
-        )
-
-        history[key] = rows
-        cart_meta["items"] = items
-        cart_meta["approval_history"] = history
-        _save_project_cart(project_id, cart_meta)
+        if not _insert_object_activity(
+            "approval_history", {"project_id": str(project_id), "object_id": str(object_id), **entry}
+        ):
+            _append_cart_activity(project_id, "approval_history", object_id, entry)
         return True
     except Exception as e:
         st.error(f"❌ Failed to save approval history: {e}")
         return False
 
 
-def get_object_comments_from_row(project_row: dict | None, object_id: str):
-    if not project_row or not isinstance(project_row, dict):
-        return []
+def _append_object_approval_events(project_id: str, object_ids, action: str, actor_role: str, actor_name: str):
+    """Approval events for several objects with one insert (or one cart rewrite)."""
+    if action not in {"approved", "unapproved"}:
+        return False
+    object_ids = [str(oid) for oid in object_ids or []]
+    if not object_ids:
+        return True
 
-    cart = project_row.get("cart") or {}
-    if not isinstance(cart, dict):
-        return []
+    entry = {
+        "action": action,
+        "actor_role": (actor_role or "unknown").strip(),
+        "actor_name": (actor_name or "Unknown").strip(),
+    }
+    try:
+        rows = [{"project_id": str(project_id), "object_id": oid, **entry} for oid in object_ids]
+        if not _insert_object_activity("approval_history", rows):
+            _append_cart_activity_many(project_id, "approval_history", [(oid, entry) for oid in object_ids])
+        return True
+    except Exception as e:
+        st.error(f"❌ Failed to save approval history: {e}")
+        return False
 
-    comments = cart.get("comments") or {}
-    if not isinstance(comments, dict):
-        return []
 
-    rows = comments.get(str(object_id)) or []
-    if not isinstance(rows, list):
-        return []
-    return rows
+def _object_activity_by_object(project_row: dict, kind: str, activity: dict | None = None):
+    """
+    {object_id: [rows oldest first]} for one project, read from the activity table with
+    one indexed query. `activity` is an optional memo the caller keeps for one render, so
+    N objects cost one request per kind; failed reads are not memoised.
+    """
+    global _object_activity_tables_available
+    if activity is not None and kind in activity:
+        return activity[kind]
+
+    grouped = {}
+    project_id = project_row.get("id")
+    if _object_activity_tables_available and project_id:
+        table_name, columns = OBJECT_ACTIVITY_TABLES[kind]
+        try:
+            sb = get_supabase(_token())
+            rows = (
+                sb.table(table_name)
+                .select(f"object_id,{columns}")
+                .eq("project_id", str(project_id))
+                .order("created_at")
+                .execute()
+                .data
+                or []
+            )
+        except Exception as exc:
+            if not is_missing_table_error(exc):
+                return grouped
+            _object_activity_tables_available = False
+            rows = []
+        for row in rows:
+            row = dict(row)
+            object_key = str(row.pop("object_id", "") or "")
+            grouped.setdefault(object_key, []).append(row)
+    if activity is not None:
+        activity[kind] = grouped
+    return grouped
 
 
-def get_object_approval_history_from_row(project_row: dict | None, object_id: str):
+def _object_activity_from_row(project_row: dict | None, object_id: str, kind: str, activity: dict | None = None):
     if not project_row or not isinstance(project_row, dict):
         return []
 
+    rows = []
     cart = project_row.get("cart") or {}
-    if not isinstance(cart, dict):
-        return []
+    block = cart.get(kind) if isinstance(cart, dict) else None
+    if isinstance(block, dict):
+        legacy_rows = block.get(str(object_id)) or []
+        if isinstance(legacy_rows, list):
+            rows.extend(legacy_rows)
+
+    table_rows = _object_activity_by_object(project_row, kind, activity).get(str(object_id)) or []
+    if table_rows:
+        rows.extend(table_rows)
+        rows.sort(key=lambda row: str(row.get("created_at") or "") if isinstance(row, dict) else "")
+    return rows
 
-    history = cart.get("approval_history") or {}
-    if not isinstance(history, dict):
-        return []
 
-    rows = history.get(str(object_id)) or []
-    if not isinstance(rows, list):
-        return []
-    return rows
+def get_object_comments_from_row(project_row: dict | None, object_id: str, activity: dict | None = None):
+    return _object_activity_from_row(project_row, object_id, "comments", activity)
+
+
+def get_object_approval_history_from_row(project_row: dict | None, object_id: str, activity: dict | None = None):
+    return _object_activity_from_row(project_row, object_id, "approval_history", activity)
 
 
 def _clean_share_token(share_token: str | None):
@@ -1114,6 +1673,48 @@ def _coerce_bool(value) -> bool:
     return False
 
 
+def _shared_project_matches(project: dict | None, token: str) -> bool:
+    if not project:
+        return False
+    share_meta = get_project_share_from_row(project)
+    return bool(share_meta.get("enabled")) and share_meta.get("token") == token
+
+
+def _find_shared_project(sb, token: str, token_hash: str):
+    global _share_token_index_available
+    if _share_token_index_available:
+        try:
+            rows = sb.rpc("get_project_by_share_token_hash", {"p_token_hash": token_hash}).execute().data or []
+            return rows[0] if isinstance(rows, list) and rows else None
+        except Exception as exc:
+            if not is_missing_rpc_error(exc):
+                raise
+            _share_token_index_available = False
+
+    # Not migrated yet: containment scan over projects.cart.
+    rows = (
+        sb.table("projects")
+        .select("*")
+        .contains("cart", {"share": {"token": token}})
+        .limit(1)
+        .execute()
+        .data
+        or []
+    )
+    return rows[0] if rows else None
+
+
+def _cached_shared_project_id(token: str):
+    """(hit, project_id) from the resolved-token cache; project_id is None for rejected tokens."""
+    token_hash = _share_token_hash(token)
+    with _share_token_cache_lock:
+        cached = _share_token_cache.get(token_hash)
+        if cached and cached[0] > time.monotonic():
+            _share_token_cache.move_to_end(token_hash)
+            return True, cached[1]
+    return False, None
+
+
 def get_shared_project_by_token(share_token: str | None):
     """
     Return one project that has a matching enabled share token.
@@ -1124,27 +1725,38 @@ def get_shared_project_by_token(share_token: str | None):
 
     try:
         sb = get_supabase(None)
-        rows = (
-            sb.table("projects")
-            .select("*")
-            .contains("cart", {"share": {"token": token}})
-            .limit(1)
-            .execute()
-            .data
-            or []
-        )
-        if not rows:
-            return None
-        project = rows[0]
-        share_meta = get_project_share_from_row(project)
-        if not share_meta.get("enabled"):
+        token_hash = _share_token_hash(token)
+        hit, project_id = _cached_shared_project_id(token)
+        if hit:
+            if not project_id:
+                return None
+            rows = sb.table("projects").select("*").eq("id", project_id).limit(1).execute().data or []
+            project = rows[0] if rows else None
+        else:
+            project = _find_shared_project(sb, token, token_hash)
+
+        if not _shared_project_matches(project, token):
+            _remember_share_token(token_hash, None)
             return None
+        _remember_share_token(token_hash, str(project.get("id")))
         return project
     except Exception as e:
         st.error(f"❌ Failed to load shared project: {e}")
         return None
 
 
+def _shared_project_id_by_token(share_token: str | None):
+    """Project id for an enabled share token; served from the cache without a request when possible."""
+    token = _clean_share_token(share_token)
+    if not token:
+        return None
+    hit, project_id = _cached_shared_project_id(token)
+    if hit:
+        return project_id
+    project = get_shared_project_by_token(token)
+    return str(project.get("id")) if project else None
+
+
 def _room_belongs_to_project(sb, room_id: str, project_id: str):
     rows = (
         sb.table("project_rooms")
@@ -1186,8 +1798,8 @@ def update_object_status_by_share_token(
     if new_status not in allowed:
         return False, "Invalid status requested."
 
-    project = get_shared_project_by_token(share_token)
-    if not project:
+    project_id = _shared_project_id_by_token(share_token)
+    if not project_id:
         return False, "Shared project link is invalid or disabled."
 
     try:
@@ -1196,7 +1808,7 @@ def update_object_status_by_share_token(
         if not obj:
             return False, "Object not found."
 
-        if not _room_belongs_to_project(sb, str(obj.get("room_id")), str(project.get("id"))):
+        if not _room_belongs_to_project(sb, str(obj.get("room_id")), project_id):
             return False, "Object does not belong to this shared project."
 
         if new_status == "client_approved" and not obj.get("material_id"):
@@ -1209,7 +1821,7 @@ def update_object_status_by_share_token(
         sb.table("room_objects").update({"status": new_status}).eq("id", object_id).execute()
         action = "approved" if new_status == "client_approved" else "unapproved"
         _append_object_approval_event(
-            project_id=str(project.get("id")),
+            project_id=project_id,
             object_id=str(object_id),
             action=action,
             actor_role="client",
@@ -1220,24 +1832,27 @@ def update_object_status_by_share_token(
         return False, f"Failed to update object status: {e}"
 
 
-def update_room_status_by_share_token(
+def update_room_status_by_share_token_detailed(
     share_token: str,
     room_id: str,
     approve_all: bool,
     actor_name: str | None = None,
 ):
     """
-    Bulk approve or unapprove all assigned objects in a room via share token.
-    Returns: (ok: bool, message: str)
+    Approve or unapprove every assigned object in a room with one `in_` status update
+    and one bulk approval-event append.
+    Returns: (ok: bool, message: str, outcomes: {object_id: outcome}) where outcome is
+    "approved" / "unapproved" (changed), "unchanged", "no_material" or "failed".
     """
-    project = get_shared_project_by_token(share_token)
-    if not project:
-        return False, "Shared project link is invalid or disabled."
+    project_id = _shared_project_id_by_token(share_token)
+    if not project_id:
+        return False, "Shared project link is invalid or disabled.", {}
 
+    outcomes = {}
     try:
         sb = get_supabase(None)
-        if not _room_belongs_to_project(sb, room_id, str(project.get("id"))):
-            return False, "Room does not belong to this shared project."
+        if not _room_belongs_to_project(sb, room_id, project_id):
+            return False, "Room does not belong to this shared project.", {}
 
         rows = (
             sb.table("room_objects")
@@ -1247,29 +1862,75 @@ def update_room_status_by_share_token(
             .data
             or []
         )
-        assigned = [r for r in rows if r.get("material_id")]
 
-        if approve_all:
-            target_ids = [str(r["id"]) for r in assigned if r.get("status") != "client_approved"]
-            next_status = "client_approved"
-        else:
-            target_ids = [str(r["id"]) for r in assigned if r.get("status") == "client_approved"]
-            next_status = "selected"
-
-        for oid in target_ids:
-            sb.table("room_objects").update({"status": next_status}).eq("id", oid).execute()
-            _append_object_approval_event(
-                project_id=str(project.get("id")),
-                object_id=str(oid),
-                action=("approved" if approve_all else "unapproved"),
+        next_status = "client_approved" if approve_all else "selected"
+        changed = "approved" if approve_all else "unapproved"
+        target_ids = []
+        for row in rows:
+            oid = str(row["id"])
+            if not row.get("material_id"):
+                outcomes[oid] = "no_material"
+            elif (row.get("status") == "client_approved") != approve_all:
+                target_ids.append(oid)
+            else:
+                outcomes[oid] = "unchanged"
+
+        if target_ids:
+            # Chunks are written one at a time so a failed chunk only fails its own objects.
+            for chunk in chunk_values(target_ids):
+                try:
+                    updated = (
+                        sb.table("room_objects")
+                        .update({"status": next_status})
+                        .in_("id", chunk)
+                        .eq("room_id", room_id)
+                        .execute()
+                        .data
+                    )
+                except Exception:
+                    outcomes.update({oid: "failed" for oid in chunk})
+                    continue
+                # PostgREST echoes the updated rows; anything RLS filtered out did not change.
+                updated_ids = {str(row.get("id")) for row in updated} if isinstance(updated, list) else set(chunk)
+                for oid in chunk:
+                    outcomes[oid] = changed if oid in updated_ids else "failed"
+
+            changed_ids = [oid for oid in target_ids if outcomes[oid] == changed]
+            _append_object_approval_events(
+                project_id=project_id,
+                object_ids=changed_ids,
+                action=changed,
                 actor_role="client",
                 actor_name=(actor_name or "Client"),
             )
 
+        changed_count = sum(1 for outcome in outcomes.values() if outcome == changed)
+        failed_count = sum(1 for outcome in outcomes.values() if outcome == "failed")
         action = "approved" if approve_all else "reset"
-        return True, f"{len(target_ids)} object(s) {action}."
+        if failed_count:
+            return False, f"{changed_count} object(s) {action}, {failed_count} could not be updated.", outcomes
+        return True, f"{changed_count} object(s) {action}.", outcomes
     except Exception as e:
-        return False, f"Failed to update room approvals: {e}"
+        return False, f"Failed to update room approvals: {e}", outcomes
+
+
+def update_room_status_by_share_token(
+    share_token: str,
+    room_id: str,
+    approve_all: bool,
+    actor_name: str | None = None,
+):
+    """
+    Bulk approve or unapprove all assigned objects in a room via share token.
+    Returns: (ok: bool, message: str)
+    """
+    ok, message, _outcomes = update_room_status_by_share_token_detailed(
+        share_token,
+        room_id,
+        approve_all,
+        actor_name=actor_name,
+    )
+    return ok, message
 
 
 def append_object_comment_by_share_token(share_token: str, object_id: str, author_name: str, comment: str):
@@ -1277,8 +1938,8 @@ def append_object_comment_by_share_token(share_token: str, object_id: str, autho
     Append a comment to an object using share token context.
     Returns: (ok: bool, message: str)
     """
-    project = get_shared_project_by_token(share_token)
-    if not project:
+    project_id = _shared_project_id_by_token(share_token)
+    if not project_id:
         return False, "Shared project link is invalid or disabled."
 
     try:
@@ -1287,11 +1948,11 @@ def append_object_comment_by_share_token(share_token: str, object_id: str, autho
         if not obj:
             return False, "Object not found."
 
-        if not _room_belongs_to_project(sb, str(obj.get("room_id")), str(project.get("id"))):
+        if not _room_belongs_to_project(sb, str(obj.get("room_id")), project_id):
             return False, "Object does not belong to this shared project."
 
         ok = append_object_comment(
-            project_id=str(project.get("id")),
+            project_id=project_id,
             object_id=str(object_id),
             author_role="client",
             author_name=(author_name or "Client"),
@@ -1351,14 +2012,7 @@ def load_room_objects_batch(room_ids):
         return out
 
     sb = get_supabase(_token())
-    rows = (
-        sb.table("room_objects")
-        .select("*")
-        .in_("room_id", room_ids)
-        .execute()
-        .data
-        or []
-    )
+    rows = execute_in_chunks(lambda ids: sb.table("room_objects").select("*").in_("room_id", ids), room_ids)
 
     for row in rows:
         rid = str(row.get("room_id"))
@@ -1367,26 +2021,41 @@ def load_room_objects_batch(room_ids):
     return out
 
 
-def load_room_statuses(room_ids):
+STATUS_COUNTER_KEYS = ("total", "assigned", "designer_ok", "client_ok")
+# Set to False once the status count views are found missing; counting then happens here.
+_status_views_available = True
+
+
+def _status_counts_from_view(view_name: str, key_column: str, ids, extra_keys=()):
     """
-    Batch status aggregation for many rooms in one query.
-    Returns: {room_id: {total, assigned, designer_ok, client_ok}}
+    {id: counters} from a status count view, or None when the view is unavailable.
+    One row per room / project comes back instead of every room_objects row.
     """
-    status_by_room = {
-        str(rid): {"total": 0, "assigned": 0, "designer_ok": 0, "client_ok": 0}
-        for rid in (room_ids or [])
+    global _status_views_available
+    if not _status_views_available:
+        return None
+    columns = ",".join((key_column, *extra_keys, *STATUS_COUNTER_KEYS))
+    try:
+        sb = get_supabase(_token())
+        rows = execute_in_chunks(lambda chunk: sb.table(view_name).select(columns).in_(key_column, chunk), ids)
+    except Exception as exc:
+        # Only a missing view disables it for the process; other errors (permissions,
+        # timeouts) fall back for this call alone.
+        if is_missing_table_error(exc):
+            _status_views_available = False
+        return None
+    return {
+        str(row.get(key_column)): {key: int(row.get(key) or 0) for key in (*extra_keys, *STATUS_COUNTER_KEYS)}
+        for row in rows
     }
-    if not room_ids:
-        return status_by_room
 
+
+def _room_statuses_from_objects(room_ids):
+    status_by_room = {}
     sb = get_supabase(_token())
-    objs = (
-        sb.table("room_objects")
-        .select("room_id, material_id, status")
-        .in_("room_id", room_ids)
-        .execute()
-        .data
-        or []
+    objs = execute_in_chunks(
+        lambda ids: sb.table("room_objects").select("room_id, material_id, status").in_("room_id", ids),
+        room_ids,
     )
 
     for o in objs:
@@ -1406,26 +2075,32 @@ def load_room_statuses(room_ids):
     return status_by_room
 
 
-def load_projects_statuses(project_ids):
+def load_room_statuses(room_ids):
     """
-    Batch status aggregation for many projects.
-    Returns: {project_id: {rooms, total, assigned, designer_ok, client_ok}}
+    Batch status aggregation for many rooms in one query.
+    Reads the `room_status_counts` view when it exists, else counts room_objects rows.
+    Returns: {room_id: {total, assigned, designer_ok, client_ok}}
     """
-    base = {
-        str(pid): {"rooms": 0, "total": 0, "assigned": 0, "designer_ok": 0, "client_ok": 0}
-        for pid in (project_ids or [])
+    status_by_room = {
+        str(rid): {"total": 0, "assigned": 0, "designer_ok": 0, "client_ok": 0}
+        for rid in (room_ids or [])
     }
-    if not project_ids:
-        return base
+    if not room_ids:
+        return status_by_room
+
+    counts = _status_counts_from_view("room_status_counts", "room_id", room_ids)
+    if counts is None:
+        counts = _room_statuses_from_objects(room_ids)
+    status_by_room.update(counts)
+    return status_by_room
+
 
+def _projects_statuses_from_rooms(project_ids):
+    base = {}
     sb = get_supabase(_token())
-    rooms = (
-        sb.table("project_rooms")
-        .select("id, project_id")
-        .in_("project_id", project_ids)
-        .execute()
-        .data
-        or []
+    rooms = execute_in_chunks(
+        lambda ids: sb.table("project_rooms").select("id, project_id").in_("project_id", ids),
+        project_ids,
     )
 
     room_ids = [r["id"] for r in rooms]
@@ -1449,6 +2124,27 @@ def load_projects_statuses(project_ids):
     return base
 
 
+def load_projects_statuses(project_ids):
+    """
+    Batch status aggregation for many projects.
+    Reads the `project_status_counts` view when it exists (one row per project),
+    else aggregates rooms and room_objects here.
+    Returns: {project_id: {rooms, total, assigned, designer_ok, client_ok}}
+    """
+    base = {
+        str(pid): {"rooms": 0, "total": 0, "assigned": 0, "designer_ok": 0, "client_ok": 0}
+        for pid in (project_ids or [])
+    }
+    if not project_ids:
+        return base
+
+    counts = _status_counts_from_view("project_status_counts", "project_id", project_ids, extra_keys=("rooms",))
+    if counts is None:
+        counts = _projects_statuses_from_rooms(project_ids)
+    base.update(counts)
+    return base
+
+
 def room_status(room_id: str):
     return load_room_statuses([room_id]).get(
         str(room_id), {"total": 0, "assigned": 0, "designer_ok": 0, "client_ok": 0}
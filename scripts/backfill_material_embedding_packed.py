@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from embedding_codec import DEFAULT_TAG, pack_vector, parse_vector  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fill materials.embedding_packed from the legacy embedding column."
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Do not write anything, only report.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows fetched per page.")
+    parser.add_argument("--dtype", choices=["f32", "f16"], default=DEFAULT_TAG, help="Packed storage dtype.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (or SUPABASE_ANON_KEY) are required.")
+    sb = create_client(url, key)
+
+    scanned = 0
+    packed_count = 0
+    skipped = 0
+    offset = 0
+    batch = max(1, int(args.batch_size))
+    while True:
+        rows = (
+            sb.table("materials")
+            .select("id,embedding")
+            .is_("embedding_packed", "null")
+            .order("id")
+            .range(offset, offset + batch - 1)
+            .execute()
+            .data
+            or []
+        )
+        if not rows:
+            break
+        scanned += len(rows)
+        page_skipped = 0
+        for row in rows:
+            packed = pack_vector(parse_vector(row.get("embedding")), tag=args.dtype)
+            if not packed:
+                page_skipped += 1
+                continue
+            if not args.dry_run:
+                sb.table("materials").update({"embedding_packed": packed}).eq("id", row["id"]).execute()
+            packed_count += 1
+        skipped += page_skipped
+        # Written rows drop out of the `is null` filter, so only unwritten rows advance the page.
+        offset += batch if args.dry_run else page_skipped
+
+    print(
+        json.dumps(
+            {
+                "scanned_rows": scanned,
+                "packed_rows": packed_count,
+                "skipped_rows": skipped,
+                "dtype": args.dtype,
+                "dry_run": bool(args.dry_run),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
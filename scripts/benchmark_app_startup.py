@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PATHS = {
+    # Anonymous visit: require_login() renders the sign-in form and stops.
+    "login": {},
+    # Client share link: render_client_portal() runs before login.
+    "portal": {"share": "benchmark-share-token"},
+}
+
+
+def _measure(path_name: str, timeout: float) -> dict:
+    """Run app.py once in this (fresh) process and time its first render."""
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    app = AppTest.from_file(str(ROOT / "app.py"), default_timeout=timeout)
+    for key, value in PATHS[path_name].items():
+        app.query_params[key] = value
+    app.run()
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path_name,
+        "first_render_s": round(elapsed, 3),
+        "exceptions": [str(item.value)[:200] for item in app.exception],
+        "torch_imported": "torch" in sys.modules,
+        "sentence_transformers_imported": "sentence_transformers" in sys.modules,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-render of app.py for the login and portal paths.")
+    parser.add_argument("--path", choices=sorted(PATHS), action="append", help="Path(s) to measure (default: all).")
+    parser.add_argument("--runs", type=int, default=3, help="Cold runs per path, each in a new interpreter.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--child", choices=sorted(PATHS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_measure(args.child, args.timeout)))
+        return
+
+    report = []
+    for path_name in args.path or sorted(PATHS):
+        samples = []
+        for _ in range(max(1, args.runs)):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", path_name, "--timeout", str(args.timeout)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        times = sorted(sample["first_render_s"] for sample in samples)
+        report.append(
+            {
+                "path": path_name,
+                "runs": len(samples),
+                "median_s": times[len(times) // 2],
+                "min_s": times[0],
+                "torch_imported": any(sample["torch_imported"] for sample in samples),
+                "exceptions": samples[-1]["exceptions"],
+            }
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import catalog_store  # noqa: E402
+
+
+def _synthetic_catalog(rows: int, dim: int, rng) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "product_name": [f"Product {idx}" for idx in range(rows)],
+            "Description": ["synthetic product description"] * rows,
+            "Category": rng.choice(["Tile", "Furniture", "Lighting"], size=rows),
+            "Price": rng.integers(100, 10_000, size=rows),
+            "Supplier": rng.choice(["acme", "globex", "initech"], size=rows),
+            "DateAdded": ["2026-01-01"] * rows,
+            "embedding": list(rng.random((rows, dim), dtype=np.float32)),
+        }
+    )
+
+
+def _new_product(idx: int) -> dict:
+    return {
+        "product_name": f"Benchmark Product {idx}",
+        "Description": "added by benchmark",
+        "Category": "Furniture",
+        "Price": 1000,
+        "Supplier": "acme",
+        "DateAdded": "2026-01-02",
+    }
+
+
+def _legacy_add(pickle_path: str, version_dir: str, product: dict, embedding):
+    # The pre-log render_add_product_form catalog write.
+    main_df = pd.read_pickle(pickle_path)
+    main_df = pd.concat([main_df, pd.DataFrame([{**product, "embedding": embedding}])], ignore_index=True)
+    main_df.drop_duplicates(subset=["product_name", "Supplier"], keep="last", inplace=True)
+    main_df.to_pickle(pickle_path)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+    main_df.to_pickle(os.path.join(version_dir, f"product_catalog_{timestamp}.pkl"))
+
+
+def _bench(rows: int, adds: int, legacy_adds: int, dim: int, rng) -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        pickle_path = os.path.join(work, "catalog.pkl")
+        store_dir = os.path.join(work, "store")
+        version_dir = os.path.join(work, "versions")
+        os.makedirs(version_dir)
+        catalog = _synthetic_catalog(rows, dim, rng)
+        catalog.to_pickle(pickle_path)
+        catalog_store.write_store(catalog, store_dir)
+
+        log_times = []
+        compactions = 0
+        for idx in range(adds):
+            started = time.perf_counter()
+            compactions += catalog_store.add_product(
+                store_dir,
+                _new_product(idx),
+                rng.random(dim, dtype=np.float32),
+                pickle_path=pickle_path,
+                archive_dir=version_dir,
+            )
+            log_times.append(time.perf_counter() - started)
+
+        legacy_times = []
+        for idx in range(legacy_adds):
+            started = time.perf_counter()
+            _legacy_add(pickle_path, version_dir, _new_product(adds + idx), rng.random(dim, dtype=np.float32))
+            legacy_times.append(time.perf_counter() - started)
+
+    return {
+        "catalog_rows": rows,
+        "log_adds": adds,
+        "log_compactions": compactions,
+        "log_add_median_ms": round(float(np.median(log_times)) * 1000, 3),
+        "log_add_amortised_ms": round(float(np.mean(log_times)) * 1000, 3),
+        "legacy_add_median_ms": round(float(np.median(legacy_times)) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-product add cost: append-only catalog log vs full rewrite.")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated catalog sizes.")
+    parser.add_argument("--adds", type=int, default=200, help="Products added through the log per size.")
+    parser.add_argument("--legacy-adds", type=int, default=3, help="Products added the legacy way per size.")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    report = [_bench(size, args.adds, args.legacy_adds, args.dim, rng) for size in sizes]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import materials_index  # noqa: E402
+import materials_manager  # noqa: E402
+import project_items_manager  # noqa: E402
+import project_manager  # noqa: E402
+import supabase_client  # noqa: E402
+from offline_postgrest import (  # noqa: E402
+    OfflineSupabase,
+    legacy_workspace,
+    materials_library,
+    relational_workspace,
+)
+
+OWNER_ID = "bench-user"
+ACCESS_TOKEN = "bench-token"
+
+
+class _SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError as exc:
+            raise AttributeError(name) from exc
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class _BenchStreamlit:
+    """The slice of `st` the managers touch: session_state plus message sinks."""
+
+    def __init__(self):
+        self.session_state = _SessionState(sb_access_token=ACCESS_TOKEN, user_id=OWNER_ID)
+        self.messages = []
+
+    def _message(self, kind):
+        return lambda text, *args, **kwargs: self.messages.append((kind, str(text)))
+
+    def __getattr__(self, name):
+        if name in {"error", "warning", "success", "info"}:
+            return self._message(name)
+        raise AttributeError(name)
+
+
+def _install(client: OfflineSupabase, log: supabase_client.QueryLog):
+    bench_st = _BenchStreamlit()
+    factory = lambda _access_token=None: supabase_client.InstrumentedClient(client, log)  # noqa: E731
+    for module in (project_manager, project_items_manager, materials_manager):
+        module.get_supabase = factory
+    project_manager.st = bench_st
+    project_items_manager.st = bench_st
+    return bench_st
+
+
+def _measure(log: supabase_client.QueryLog, label: str, fn):
+    log.begin_run(label)
+    started = time.perf_counter()
+    fn()
+    wall_ms = (time.perf_counter() - started) * 1000
+    summary = log.summary()
+    return {
+        "operation": label,
+        "round_trips": summary["requests"],
+        "rows": summary["rows"],
+        "bytes": summary["bytes"],
+        "wall_ms": round(wall_ms, 1),
+        "by_request": [
+            f"{group['count']}x {group['verb']} {group['table']} ({group['filters'] or '-'})"
+            for group in summary["groups"]
+        ],
+    }
+
+
+def _build_client(args) -> OfflineSupabase:
+    materials = materials_library(args.materials, owner_id=OWNER_ID, seed=args.seed)
+    tables = legacy_workspace(
+        args.projects,
+        max(3, args.rooms),
+        args.objects,
+        owner_id=OWNER_ID,
+        material_ids=[row["id"] for row in materials[:500]],
+        seed=args.seed,
+    )
+    relational = relational_workspace(args.projects, max(3, args.rooms), args.objects, seed=args.seed)
+    tables["rooms"] = relational["rooms"]
+    tables["project_items"] = relational["project_items"]
+    tables["suppliers"] = relational["suppliers"]
+    tables["materials"] = materials
+    return OfflineSupabase(tables, latency_ms=args.latency_ms)
+
+
+def _suite(client: OfflineSupabase, log: supabase_client.QueryLog) -> list[dict]:
+    pm = project_manager
+    project = client.tables["projects"][0]
+    project_id = project["id"]
+    project_ids = [row["id"] for row in client.tables["projects"]]
+    room_ids = [row["id"] for row in client.tables["project_rooms"] if row["project_id"] == project_id]
+    share_token = project["cart"]["share"]["token"]
+    relational_project_id = client.tables["rooms"][0]["project_id"]
+    materials_index.clear_indexes()
+    project_manager._share_token_cache.clear()
+
+    ops = [
+        ("project_manager.load_project_summaries", pm.load_project_summaries),
+        ("project_manager.load_projects", pm.load_projects),
+        ("project_manager.load_project", lambda: pm.load_project(project_id)),
+        ("project_manager.load_projects_statuses", lambda: pm.load_projects_statuses(project_ids)),
+        ("project_manager.load_project_rooms", lambda: pm.load_project_rooms(project_id)),
+        ("project_manager.load_room_statuses", lambda: pm.load_room_statuses(room_ids)),
+        ("project_manager.load_room_objects_batch", lambda: pm.load_room_objects_batch(room_ids)),
+        ("project_manager.load_room_objects (per room)", lambda: [pm.load_room_objects(rid) for rid in room_ids]),
+        ("project_manager.get_shared_project_by_token", lambda: pm.get_shared_project_by_token(share_token)),
+        ("project_manager.save_project_budget", lambda: pm.save_project_budget(project_id, 1000.0, {})),
+        ("project_manager.rename_project_room", lambda: pm.rename_project_room(project_id, room_ids[0], "Renamed")),
+        ("project_manager.add_project_room", lambda: pm.add_project_room(project_id, "Bench Room")),
+        (
+            "project_manager.update_room_status_by_share_token",
+            lambda: pm.update_room_status_by_share_token(share_token, room_ids[1], True, "Client"),
+        ),
+        ("project_manager.delete_project_room", lambda: pm.delete_project_room(project_id, room_ids[2])),
+        (
+            "project_manager.duplicate_project",
+            lambda: pm.duplicate_project(project_id, "Bench Copy", show_feedback=False),
+        ),
+        (
+            "project_items_manager.list_project_items_grouped_by_room",
+            lambda: project_items_manager.list_project_items_grouped_by_room(relational_project_id, ACCESS_TOKEN),
+        ),
+        ("materials_manager.list_materials", lambda: materials_manager.list_materials(ACCESS_TOKEN)),
+        (
+            "materials_manager.visible_index (cold)",
+            lambda: materials_manager._visible_material_index(ACCESS_TOKEN),
+        ),
+        (
+            "materials_manager.visible_index (warm)",
+            lambda: materials_manager._visible_material_index(ACCESS_TOKEN),
+        ),
+    ]
+    return [_measure(log, label, fn) for label, fn in ops]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Round trips, bytes and wall time per manager operation against an in-memory PostgREST."
+    )
+    parser.add_argument("--projects", type=int, default=20, help="Projects in the synthetic workspace.")
+    parser.add_argument("--rooms", type=int, default=10, help="Rooms per project (at least 3).")
+    parser.add_argument("--objects", type=int, default=15, help="Objects (and relational items) per room.")
+    parser.add_argument("--materials", type=int, default=10000, help="Rows in the materials library.")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated latency per request.")
+    parser.add_argument("--seed", type=int, default=0, help="Dataset seed.")
+    parser.add_argument("--jsonl", default=None, help="Also append every recorded request to this JSONL file.")
+    args = parser.parse_args()
+
+    # First pass settles the "RPC/view missing" flags so the measured pass is steady state.
+    warmup_log = supabase_client.QueryLog(max_runs=1)
+    warmup_client = _build_client(args)
+    _install(warmup_client, warmup_log)
+    _suite(warmup_client, warmup_log)
+
+    log = supabase_client.QueryLog(max_runs=64)
+    client = _build_client(args)
+    bench_st = _install(client, log)
+    results = _suite(client, log)
+    if args.jsonl:
+        supabase_client.export_query_log_jsonl(args.jsonl, log)
+
+    report = {
+        "dataset": {
+            "projects": args.projects,
+            "rooms_per_project": max(3, args.rooms),
+            "objects_per_room": args.objects,
+            "materials": args.materials,
+            "latency_ms": args.latency_ms,
+        },
+        "operations": results,
+        "totals": {
+            "round_trips": sum(row["round_trips"] for row in results),
+            "bytes": sum(row["bytes"] for row in results),
+            "wall_ms": round(sum(row["wall_ms"] for row in results), 1),
+        },
+        "errors": [text for kind, text in bench_st.messages if kind == "error"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
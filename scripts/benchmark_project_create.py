@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import project_manager as pm  # noqa: E402
+from assets.villa_template import SMALL_VILLA_TEMPLATE  # noqa: E402
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "p95_ms": round(p95 * 1000, 1),
+    }
+
+
+def _bench(sb, create_fn, owner_id: str, room_payloads, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        name = f"benchmark-{uuid.uuid4().hex[:12]}"
+        started = time.perf_counter()
+        project_id = create_fn(sb, name, owner_id, room_payloads)
+        samples.append(time.perf_counter() - started)
+        pm._delete_project_tree(sb, project_id)
+    return _summary(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Project creation latency: create_legacy_project RPC vs the multi-call insert flow."
+    )
+    parser.add_argument("--owner-id", required=True, help="profiles/auth user id that owns the benchmark projects.")
+    parser.add_argument("--runs", type=int, default=10, help="Projects created per path.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (or SUPABASE_ANON_KEY) are required.")
+    sb = create_client(url, key)
+
+    template_source = pm._normalize_template_map(SMALL_VILLA_TEMPLATE)
+    room_payloads = pm._template_room_payloads(list(template_source.keys()), template_source)
+    runs = max(1, int(args.runs))
+
+    report = {
+        "rooms": len(room_payloads),
+        "objects": sum(len(room["objects"]) for room in room_payloads),
+        "multi_call": _bench(sb, pm._create_project_rows, args.owner_id, room_payloads, runs),
+        "rpc": _bench(sb, pm._create_project_rpc, args.owner_id, room_payloads, runs),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import supabase_client  # noqa: E402
+
+
+def _summary(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "requests": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "p95_ms": round(p95 * 1000, 1),
+        "first_ms": round(samples[0] * 1000, 1),
+    }
+
+
+def _bench(table: str, access_token: str | None, requests: int, pooled: bool) -> dict:
+    supabase_client.clear_client_pool()
+    supabase_client.CLIENT_POOL_SIZE = 32 if pooled else 0
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        # Same shape as the managers: get a client, run one small query.
+        supabase_client.get_supabase(access_token).table(table).select("id").limit(1).execute()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request latency with and without the Supabase client pool.")
+    parser.add_argument("--requests", type=int, default=30, help="Requests per mode.")
+    parser.add_argument("--table", default="materials", help="Table to read one row from.")
+    parser.add_argument("--access-token", default=None, help="User JWT; omit to query as anon.")
+    args = parser.parse_args()
+
+    requests = max(2, int(args.requests))
+    report = {
+        "table": args.table,
+        "fresh_client_per_call": _bench(args.table, args.access_token, requests, pooled=False),
+        "pooled_client": _bench(args.table, args.access_token, requests, pooled=True),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
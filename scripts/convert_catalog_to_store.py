@@ -0,0 +1,25 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import catalog_store  # noqa: E402
+from config import CATALOG_PKL, CATALOG_STORE_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the pickled product catalog into the memory-mapped catalog store."
+    )
+    parser.add_argument("--pickle", default=CATALOG_PKL, help="Source catalog pickle.")
+    parser.add_argument("--out", default=CATALOG_STORE_DIR, help="Store directory to (re)write.")
+    args = parser.parse_args()
+
+    manifest = catalog_store.convert_pickle(args.pickle, args.out)
+    print(json.dumps({"pickle": args.pickle, "out": args.out, **manifest}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
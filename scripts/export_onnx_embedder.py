@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from embedding import _model_path, _onnx_path  # noqa: E402
+from embedding_onnx import MODEL_FILES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the sentence embedder to ONNX (fp32 + int8) for EMBED_BACKEND=onnx / onnx-int8."
+    )
+    parser.add_argument("--model", default=_model_path(), help="SentenceTransformer path or hub id.")
+    parser.add_argument("--out", default=_onnx_path(), help="Output directory (EMBED_ONNX_PATH).")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(args.out, exist_ok=True)
+    st_model = SentenceTransformer(args.model, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(args.out)
+
+    sample = tokenizer(["light wood bench for outdoor"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(args.out, MODEL_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=args.opset,
+        )
+
+    int8_path = os.path.join(args.out, MODEL_FILES["onnx-int8"])
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    print(
+        json.dumps(
+            {
+                "model": args.model,
+                "out": args.out,
+                "onnx_mb": round(os.path.getsize(fp32_path) / 1e6, 1),
+                "onnx_int8_mb": round(os.path.getsize(int8_path) / 1e6, 1),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import image_store  # noqa: E402
+
+
+def _inline_images(cart) -> list:
+    brief = cart.get("design_brief") if isinstance(cart, dict) else None
+    images = brief.get("mood_images") if isinstance(brief, dict) else None
+    if not isinstance(images, list):
+        return []
+    return [value for value in images if str(value or "").startswith("data:image/")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move base64 mood-board images out of projects.cart into the content-addressed image store."
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Do not write anything, only report.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Projects fetched per page.")
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="Write to a local store in this directory instead of IMAGE_STORE_BUCKET (it must be the one the app serves).",
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (or SUPABASE_ANON_KEY) are required.")
+    sb = create_client(url, key)
+
+    # Refs written here must resolve wherever the app runs, so never fall back to this
+    # machine's default directory silently.
+    bucket = os.getenv("IMAGE_STORE_BUCKET", "").strip()
+    if args.store_dir:
+        image_store.set_image_store(image_store.LocalImageStore(args.store_dir))
+    elif bucket:
+        image_store.set_image_store(image_store.BucketImageStore(sb.storage.from_(bucket)))
+    else:
+        raise SystemExit("Set IMAGE_STORE_BUCKET (with SUPABASE_SERVICE_ROLE_KEY) or pass --store-dir.")
+
+    scanned = 0
+    projects_updated = 0
+    images_moved = 0
+    bytes_removed = 0
+    offset = 0
+    batch = max(1, int(args.batch_size))
+    while True:
+        rows = (
+            sb.table("projects")
+            .select("id,cart")
+            .order("id")
+            .range(offset, offset + batch - 1)
+            .execute()
+            .data
+            or []
+        )
+        if not rows:
+            break
+        scanned += len(rows)
+        for row in rows:
+            cart = row.get("cart")
+            inline = _inline_images(cart)
+            if not inline:
+                continue
+            if args.dry_run:
+                moved = len(inline)
+            else:
+                cart, moved = image_store.migrate_mood_images(cart)
+                if moved:
+                    sb.table("projects").update({"cart": cart}).eq("id", row["id"]).execute()
+            if moved:
+                projects_updated += 1
+                images_moved += moved
+                bytes_removed += sum(len(value) for value in inline)
+        # Rows keep their place in the id order, so paging is unaffected by the updates.
+        offset += batch
+
+    print(
+        json.dumps(
+            {
+                "dry_run": args.dry_run,
+                "store": type(image_store.get_image_store()).__name__,
+                "projects_scanned": scanned,
+                "projects_updated": projects_updated,
+                "images_moved": images_moved,
+                "cart_bytes_removed": bytes_removed,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+In-memory stand-in for the Supabase/PostgREST client, for offline benchmarks.
+
+OfflineSupabase keeps tables as lists of dict rows and implements the query surface the
+managers use: select / eq / neq / in_ / contains / order / limit / insert / update /
+upsert / delete, plus rpc() through registered handlers. Every execute() sleeps
+`latency_ms` to stand in for the network, and responses are JSON round-tripped so
+callers get fresh copies, like a real response body.
+
+Missing tables and functions fail with the same PGRST205 / PGRST202 messages as
+PostgREST, so the managers take their pre-migration fallbacks unless handlers or view
+tables are provided.
+
+The generators build synthetic datasets:
+  legacy_workspace(projects, rooms, objects)   projects / project_rooms / room_objects
+  relational_workspace(projects, rooms, items) projects / rooms / project_items / suppliers
+  materials_library(count)                     materials
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+
+class OfflineResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _copy(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+def _contains(haystack, needle) -> bool:
+    """jsonb @> semantics for dict / list / scalar values."""
+    if isinstance(needle, dict):
+        return isinstance(haystack, dict) and all(
+            key in haystack and _contains(haystack[key], value) for key, value in needle.items()
+        )
+    if isinstance(needle, list):
+        return isinstance(haystack, list) and all(any(_contains(h, n) for h in haystack) for n in needle)
+    return haystack == needle
+
+
+def _sort_key(value):
+    # Nulls last, then compare as text like the tests' fakes; numbers compare numerically.
+    if value is None:
+        return (1, 0, "")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, 0, value)
+    return (0, 1, str(value))
+
+
+class OfflineQuery:
+    def __init__(self, client, table_name: str):
+        self.client = client
+        self.table_name = table_name
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = "id"
+        self.filters = []
+        self.orders = []
+        self.limit_count = None
+        self.count_mode = None
+
+    def select(self, columns="*", count=None, **_kwargs):
+        self.operation = "select"
+        self.columns = columns or "*"
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **_kwargs):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def update(self, payload, **_kwargs):
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict="id", **_kwargs):
+        self.operation = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def delete(self, **_kwargs):
+        self.operation = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) != str(value))
+        return self
+
+    def in_(self, column, values):
+        allowed = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(column)) in allowed)
+        return self
+
+    def contains(self, column, value):
+        self.filters.append(lambda row: _contains(row.get(column), value))
+        return self
+
+    def order(self, column, desc=False, **_kwargs):
+        self.orders.append((column, bool(desc)))
+        return self
+
+    def limit(self, count, **_kwargs):
+        self.limit_count = int(count)
+        return self
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.latency_ms > 0:
+            time.sleep(self.client.latency_ms / 1000.0)
+        with self.client.lock:
+            table = self.client.tables.get(self.table_name)
+            if table is None:
+                raise RuntimeError(
+                    f"PGRST205: Could not find the table 'public.{self.table_name}' in the schema cache"
+                )
+            handler = getattr(self, f"_{self.operation}")
+            return handler(table)
+
+    def _matching(self, table):
+        return [row for row in table if all(check(row) for check in self.filters)]
+
+    def _project(self, rows):
+        if self.columns.strip() == "*":
+            return rows
+        keys = [key.strip() for key in self.columns.split(",") if key.strip()]
+        return [{key: row.get(key) for key in keys} for row in rows]
+
+    def _select(self, table):
+        rows = self._matching(table)
+        for column, desc in reversed(self.orders):
+            rows = sorted(rows, key=lambda row: _sort_key(row.get(column)), reverse=desc)
+        total = len(rows)
+        if self.limit_count is not None:
+            rows = rows[: self.limit_count]
+        return OfflineResponse(_copy(self._project(rows)), count=total if self.count_mode else None)
+
+    def _new_row(self, payload: dict) -> dict:
+        row = {key: (_now_iso() if value == "now()" else value) for key, value in _copy(payload).items()}
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now_iso())
+        return row
+
+    def _insert(self, table):
+        payload_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        created = [self._new_row(payload) for payload in payload_rows]
+        table.extend(created)
+        return OfflineResponse(_copy(created))
+
+    def _update(self, table):
+        changes = {key: (_now_iso() if value == "now()" else value) for key, value in _copy(self.payload).items()}
+        updated = []
+        for row in self._matching(table):
+            row.update(changes)
+            updated.append(row)
+        return OfflineResponse(_copy(updated))
+
+    def _upsert(self, table):
+        payload_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        written = []
+        for payload in payload_rows:
+            key = payload.get(self.on_conflict)
+            existing = next((row for row in table if key is not None and str(row.get(self.on_conflict)) == str(key)), None)
+            if existing is None:
+                existing = self._new_row(payload)
+                table.append(existing)
+            else:
+                existing.update(_copy(payload))
+            written.append(existing)
+        return OfflineResponse(_copy(written))
+
+    def _delete(self, table):
+        doomed = self._matching(table)
+        doomed_ids = {id(row) for row in doomed}
+        table[:] = [row for row in table if id(row) not in doomed_ids]
+        return OfflineResponse(_copy(doomed))
+
+
+class _OfflineRpc:
+    def __init__(self, client, name: str, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.latency_ms > 0:
+            time.sleep(self.client.latency_ms / 1000.0)
+        handler = self.client.rpc_handlers.get(self.name)
+        if handler is None:
+            raise RuntimeError(f"PGRST202: Could not find the function public.{self.name} in the schema cache")
+        with self.client.lock:
+            return OfflineResponse(_copy(handler(self.client, _copy(self.params or {}))))
+
+
+class OfflineSupabase:
+    """
+    `tables`: {table_name: [row, ...]}; rows are kept by reference and mutated in place.
+    `rpc_handlers`: {function_name: handler(client, params) -> data}.
+    """
+
+    def __init__(self, tables: dict | None = None, latency_ms: float = 0.0, rpc_handlers: dict | None = None):
+        self.tables = {name: list(rows) for name, rows in (tables or {}).items()}
+        self.latency_ms = float(latency_ms or 0.0)
+        self.rpc_handlers = dict(rpc_handlers or {})
+        self.lock = threading.RLock()
+        self.requests = 0
+        self.postgrest = self
+
+    def auth(self, _access_token):
+        return None
+
+    def table(self, table_name: str) -> OfflineQuery:
+        return OfflineQuery(self, table_name)
+
+    def from_(self, table_name: str) -> OfflineQuery:
+        return OfflineQuery(self, table_name)
+
+    def rpc(self, name: str, params=None):
+        return _OfflineRpc(self, name, params)
+
+
+ROOM_NAMES = ["Living Room", "Kitchen", "Master Bedroom", "Bedroom", "Bathroom", "Terrace", "Office", "Dining"]
+OBJECT_NAMES = ["Sofa", "Tile", "Pendant Light", "Faucet", "Wardrobe", "Rug", "Mirror", "Paint", "Desk", "Chair"]
+CATEGORIES = ["furniture", "tiles", "lighting", "sanitary", "paint", "kitchen", "other"]
+OBJECT_STATUSES = ["unassigned", "selected", "designer_approved", "client_approved"]
+
+
+def _timestamp(rng: random.Random, base: datetime) -> str:
+    return (base - timedelta(minutes=rng.randint(0, 60 * 24 * 365))).isoformat()
+
+
+def materials_library(count: int, owner_id: str | None = None, seed: int = 0) -> list[dict]:
+    """`count` material rows; about one in five is private to `owner_id`."""
+    rng = random.Random(seed)
+    base = datetime.now(timezone.utc)
+    rows = []
+    for idx in range(int(count)):
+        category = rng.choice(CATEGORIES)
+        private = owner_id is not None and rng.random() < 0.2
+        created_at = _timestamp(rng, base)
+        rows.append(
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "owner_id": owner_id if private else None,
+                "visibility": "private" if private else "global",
+                "name": f"{category.title()} material {idx}",
+                "description": f"Synthetic {category} finish #{idx} for benchmarks.",
+                "category": category,
+                "supplier_name": f"Supplier {rng.randint(1, 40)}",
+                "price": round(rng.uniform(5, 2500), 2),
+                "tags": rng.sample(["matte", "warm", "oak", "brass", "linen", "stone", "white"], 2),
+                "image_url": None,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+        )
+    return rows
+
+
+def legacy_workspace(
+    projects: int,
+    rooms: int,
+    objects: int,
+    owner_id: str = "bench-user",
+    material_ids=None,
+    seed: int = 0,
+) -> dict:
+    """Legacy Streamlit schema: `projects` x `rooms` x `objects` with shared links enabled."""
+    rng = random.Random(seed)
+    base = datetime.now(timezone.utc)
+    material_ids = list(material_ids or [])
+    tables = {"projects": [], "project_rooms": [], "room_objects": []}
+    for p_idx in range(int(projects)):
+        project_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        created_at = _timestamp(rng, base)
+        tables["projects"].append(
+            {
+                "id": project_id,
+                "name": f"Villa {p_idx}",
+                "owner_id": owner_id,
+                "cart": {
+                    "items": [],
+                    "share": {"token": f"share-{p_idx}", "enabled": True, "created_at": created_at},
+                },
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+        )
+        for r_idx in range(int(rooms)):
+            room_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            tables["project_rooms"].append(
+                {"id": room_id, "project_id": project_id, "name": f"{ROOM_NAMES[r_idx % len(ROOM_NAMES)]} {r_idx}"}
+            )
+            for o_idx in range(int(objects)):
+                status = rng.choice(OBJECT_STATUSES)
+                assigned = status != "unassigned" and material_ids
+                tables["room_objects"].append(
+                    {
+                        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                        "room_id": room_id,
+                        "object_key": f"object_{o_idx}",
+                        "object_name": OBJECT_NAMES[o_idx % len(OBJECT_NAMES)],
+                        "category": rng.choice(CATEGORIES),
+                        "qty": rng.randint(1, 6),
+                        "status": status,
+                        "material_id": rng.choice(material_ids) if assigned else None,
+                    }
+                )
+    return tables
+
+
+def relational_workspace(
+    projects: int,
+    rooms: int,
+    items: int,
+    suppliers: int = 40,
+    created_by: str = "bench-user",
+    seed: int = 0,
+) -> dict:
+    """Relational purchasing schema: `items` project_items per room, spread over `suppliers`."""
+    rng = random.Random(seed)
+    base = datetime.now(timezone.utc)
+    tables = {"projects": [], "rooms": [], "project_items": [], "suppliers": []}
+    supplier_ids = []
+    for s_idx in range(int(suppliers)):
+        supplier_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        supplier_ids.append(supplier_id)
+        tables["suppliers"].append({"id": supplier_id, "name": f"Supplier {s_idx}"})
+    for p_idx in range(int(projects)):
+        project_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        created_at = _timestamp(rng, base)
+        tables["projects"].append(
+            {"id": project_id, "name": f"Project {p_idx}", "created_by": created_by,
+             "created_at": created_at, "updated_at": created_at}
+        )
+        for r_idx in range(int(rooms)):
+            room_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            tables["rooms"].append(
+                {"id": room_id, "project_id": project_id, "name": f"{ROOM_NAMES[r_idx % len(ROOM_NAMES)]} {r_idx}",
+                 "sort_order": r_idx, "type": "custom"}
+            )
+            for i_idx in range(int(items)):
+                tables["project_items"].append(
+                    {
+                        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                        "project_id": project_id,
+                        "room_id": room_id,
+                        "supplier_id": rng.choice(supplier_ids) if supplier_ids else None,
+                        "name": OBJECT_NAMES[i_idx % len(OBJECT_NAMES)],
+                        "category": rng.choice(CATEGORIES),
+                        "quantity": rng.randint(1, 6),
+                        "unit_price": round(rng.uniform(5, 2500), 2),
+                        "status": "draft",
+                        "created_at": _timestamp(rng, base),
+                    }
+                )
+    return tables
@@ -1,6 +1,13 @@
 # supabase_client.py
 
+import hashlib
+import json
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 from supabase import create_client, Client
 from dotenv import load_dotenv
@@ -31,7 +38,7 @@ def _build_client_options():
 
 
 def _build_supabase_client(supabase_url: str, supabase_key: str, access_token: str | None) -> Client:
-    # Do not cache client objects globally; shared clients can leak auth state across users.
+    # Never share one client between tokens; shared clients can leak auth state across users.
     options = _build_client_options()
     if options is not None:
         try:
@@ -46,11 +53,7 @@ def _build_supabase_client(supabase_url: str, supabase_key: str, access_token: s
     return sb
 
 
-def get_supabase(access_token: str | None = None) -> Client:
-    """
-    Returns a Supabase client.
-    If access_token is provided, attaches it so RLS auth.uid() works.
-    """
+def _credentials() -> tuple[str, str]:
     supabase_url = None
     supabase_key = None
 
@@ -67,4 +70,379 @@ def get_supabase(access_token: str | None = None) -> Client:
     if not supabase_url or not supabase_key:
         raise RuntimeError("Supabase credentials missing")
 
-    return _build_supabase_client(supabase_url, supabase_key, access_token)
+    return supabase_url, supabase_key
+
+
+# Data clients are pooled per access token so repeated calls within (and across) reruns
+# reuse one HTTP connection pool instead of paying a new TLS handshake each time.
+# Keys hash url + anon key + token, so two tokens never share a client or its auth header;
+# entries expire after a fixed TTL and the least recently used ones are evicted first.
+CLIENT_POOL_SIZE = int(os.getenv("SUPABASE_CLIENT_POOL_SIZE", "32") or 0)
+CLIENT_POOL_TTL_SECONDS = float(os.getenv("SUPABASE_CLIENT_POOL_TTL", "300") or 0)
+_client_pool: "OrderedDict[str, tuple[float, Client]]" = OrderedDict()
+_client_pool_lock = threading.Lock()
+
+
+def _pool_key(supabase_url: str, supabase_key: str, access_token: str | None) -> str:
+    raw = "\0".join((supabase_url, supabase_key, access_token or ""))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def clear_client_pool():
+    with _client_pool_lock:
+        _client_pool.clear()
+
+
+def get_supabase(access_token: str | None = None) -> Client:
+    """
+    Returns a Supabase client for table/RPC/storage calls.
+    If access_token is provided, attaches it so RLS auth.uid() works.
+    Clients are reused per token (see CLIENT_POOL_SIZE); use get_auth_client() for
+    sign-in/refresh flows, which change the client's own auth state.
+    With QUERY_LOG_ENABLED the client is wrapped so every request is recorded.
+    """
+    sb = _pooled_supabase(access_token)
+    if not QUERY_LOG_ENABLED:
+        return sb
+    return InstrumentedClient(sb, current_query_log())
+
+
+def _pooled_supabase(access_token: str | None) -> Client:
+    supabase_url, supabase_key = _credentials()
+    if CLIENT_POOL_SIZE <= 0 or CLIENT_POOL_TTL_SECONDS <= 0:
+        return _build_supabase_client(supabase_url, supabase_key, access_token)
+
+    key = _pool_key(supabase_url, supabase_key, access_token)
+    now = time.monotonic()
+    with _client_pool_lock:
+        entry = _client_pool.get(key)
+        if entry is not None and entry[0] > now:
+            _client_pool.move_to_end(key)
+            return entry[1]
+        _client_pool.pop(key, None)
+
+    sb = _build_supabase_client(supabase_url, supabase_key, access_token)
+    with _client_pool_lock:
+        _client_pool[key] = (now + CLIENT_POOL_TTL_SECONDS, sb)
+        _client_pool.move_to_end(key)
+        while len(_client_pool) > CLIENT_POOL_SIZE:
+            _client_pool.popitem(last=False)
+    return sb
+
+
+# Request instrumentation. SUPABASE_QUERY_LOG=1 wraps every data client so each
+# PostgREST request records table, verb, filter shape (columns only, never values),
+# row count, payload/response bytes and wall time into the session's QueryLog, grouped
+# by rerun (begin_query_run). SUPABASE_QUERY_LOG_PATH additionally appends every record
+# as one JSON line, which is what to grep for N+1 patterns in production.
+QUERY_LOG_ENABLED = str(os.getenv("SUPABASE_QUERY_LOG", "")).strip().lower() in {"1", "true", "yes", "on"}
+QUERY_LOG_PATH = os.getenv("SUPABASE_QUERY_LOG_PATH") or None
+QUERY_LOG_MAX_RUNS = int(os.getenv("SUPABASE_QUERY_LOG_RUNS", "20") or 20)
+_QUERY_LOG_SESSION_KEY = "_supabase_query_log"
+_query_log_file_lock = threading.Lock()
+
+_QUERY_VERBS = {"select", "insert", "update", "upsert", "delete"}
+_QUERY_FILTERS = {
+    "eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_", "contains",
+    "contained_by", "filter", "match", "not_", "or_", "text_search",
+}
+_QUERY_MODIFIERS = {"order", "limit", "range", "single", "maybe_single"}
+
+
+def _json_size(value) -> int:
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str, separators=(",", ":")).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _filter_shape(method: str, args) -> str:
+    name = method.rstrip("_")
+    column = str(args[0]) if args else ""
+    if method == "in_" and len(args) > 1:
+        try:
+            return f"{name}:{column}[{len(args[1])}]"
+        except TypeError:
+            pass
+    if method in {"or_", "match"}:
+        return name
+    return f"{name}:{column}" if column else name
+
+
+class QueryLog:
+    """Per-session request records, kept for the last QUERY_LOG_MAX_RUNS reruns."""
+
+    def __init__(self, max_runs: int | None = None):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.runs: deque = deque(maxlen=max(1, int(max_runs or QUERY_LOG_MAX_RUNS)))
+        self._run_seq = 0
+        self._lock = threading.Lock()
+        self.begin_run()
+
+    def begin_run(self, label: str = ""):
+        with self._lock:
+            self._run_seq += 1
+            self.runs.append({"run": self._run_seq, "label": str(label or ""), "started_at": time.time(), "queries": []})
+
+    @property
+    def current_run(self) -> dict:
+        return self.runs[-1]
+
+    def record(self, entry: dict):
+        with self._lock:
+            run = self.current_run
+            entry = {"session": self.session_id, "run": run["run"], **entry}
+            run["queries"].append(entry)
+        if QUERY_LOG_PATH:
+            _append_jsonl(QUERY_LOG_PATH, [entry])
+        return entry
+
+    def summary(self, run: dict | None = None) -> dict:
+        """Totals plus per (table, verb, filters) counts, most repeated first."""
+        run = run or self.current_run
+        queries = list(run["queries"])
+        groups = {}
+        for entry in queries:
+            key = (entry["table"], entry["verb"], entry["filters"])
+            group = groups.setdefault(
+                key,
+                {"table": key[0], "verb": key[1], "filters": key[2], "count": 0, "rows": 0, "ms": 0.0},
+            )
+            group["count"] += 1
+            group["rows"] += entry["rows"]
+            group["ms"] += entry["ms"]
+        ordered = sorted(groups.values(), key=lambda group: (-group["count"], -group["ms"]))
+        for group in ordered:
+            group["ms"] = round(group["ms"], 1)
+        return {
+            "run": run["run"],
+            "label": run["label"],
+            "requests": len(queries),
+            "rows": sum(entry["rows"] for entry in queries),
+            "bytes": sum(entry["payload_bytes"] + entry["response_bytes"] for entry in queries),
+            "ms": round(sum(entry["ms"] for entry in queries), 1),
+            "groups": ordered,
+        }
+
+
+_fallback_query_log = None
+
+
+def current_query_log() -> QueryLog:
+    """The QueryLog in st.session_state, or a process-wide one outside a Streamlit session."""
+    global _fallback_query_log
+    try:
+        state = st.session_state
+        log = state.get(_QUERY_LOG_SESSION_KEY)
+        if log is None:
+            log = QueryLog()
+            state[_QUERY_LOG_SESSION_KEY] = log
+        return log
+    except Exception:
+        if _fallback_query_log is None:
+            _fallback_query_log = QueryLog()
+        return _fallback_query_log
+
+
+def begin_query_run(label: str = ""):
+    """Start a new group of records; call once at the top of each rerun."""
+    if QUERY_LOG_ENABLED:
+        current_query_log().begin_run(label)
+
+
+def _jsonl(entries) -> str:
+    return "".join(json.dumps(entry, default=str) + "\n" for entry in entries)
+
+
+def _append_jsonl(path: str, entries):
+    lines = _jsonl(entries)
+    with _query_log_file_lock:
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(lines)
+
+
+def query_log_to_jsonl(log: QueryLog | None = None) -> str:
+    """Every recorded request of the session, one JSON object per line."""
+    log = log or current_query_log()
+    return _jsonl(entry for run in list(log.runs) for entry in run["queries"])
+
+
+def export_query_log_jsonl(path: str, log: QueryLog | None = None) -> int:
+    """Append every recorded request of the session to `path`; returns the number written."""
+    log = log or current_query_log()
+    entries = [entry for run in list(log.runs) for entry in run["queries"]]
+    if entries:
+        _append_jsonl(path, entries)
+    return len(entries)
+
+
+class InstrumentedQuery:
+    """Proxies a postgrest request builder and records the request on execute()."""
+
+    def __init__(self, builder, log: QueryLog, table: str, verb: str = "select", filters=(), payload_bytes: int = 0):
+        self._builder = builder
+        self._log = log
+        self._table = table
+        self._verb = verb
+        self._filters = tuple(filters)
+        self._payload_bytes = payload_bytes
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            # e.g. `.not_` is a property returning the next builder.
+            return self._chain(name, (), attr) if hasattr(attr, "execute") else attr
+
+        def _call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if not hasattr(result, "execute"):
+                return result
+            return self._chain(name, args, result)
+
+        return _call
+
+    def _chain(self, name: str, args, builder):
+        verb, filters, payload_bytes = self._verb, self._filters, self._payload_bytes
+        if name in _QUERY_VERBS:
+            verb = name
+            if name != "select" and args:
+                payload_bytes = _json_size(args[0])
+        elif name in _QUERY_FILTERS:
+            filters = filters + (_filter_shape(name, args),)
+        elif name in _QUERY_MODIFIERS:
+            filters = filters + (name,)
+        return InstrumentedQuery(builder, self._log, self._table, verb, filters, payload_bytes)
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        error = None
+        data = None
+        try:
+            response = self._builder.execute(*args, **kwargs)
+            data = getattr(response, "data", None)
+            return response
+        except Exception as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            self._log.record(
+                {
+                    "table": self._table,
+                    "verb": self._verb,
+                    "filters": ",".join(self._filters),
+                    "rows": len(data) if isinstance(data, list) else (1 if data is not None else 0),
+                    "payload_bytes": self._payload_bytes,
+                    "response_bytes": _json_size(data),
+                    "ms": round((time.perf_counter() - started) * 1000, 2),
+                    "error": error,
+                    "thread": threading.current_thread().name,
+                    "at": time.time(),
+                }
+            )
+
+
+class InstrumentedClient:
+    """Wraps a Supabase client: table()/from_()/rpc() are recorded, the rest passes through."""
+
+    def __init__(self, client, log: QueryLog):
+        self._client = client
+        self._log = log
+
+    def table(self, table_name: str):
+        return InstrumentedQuery(self._client.table(table_name), self._log, str(table_name))
+
+    def from_(self, table_name: str):
+        return InstrumentedQuery(self._client.from_(table_name), self._log, str(table_name))
+
+    def rpc(self, fn: str, params=None, *args, **kwargs):
+        builder = self._client.rpc(fn, params, *args, **kwargs)
+        return InstrumentedQuery(builder, self._log, f"rpc:{fn}", "rpc", payload_bytes=_json_size(params))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def get_auth_client() -> Client:
+    """A fresh, unshared client for GoTrue calls (sign-in, OTP, OAuth, session refresh)."""
+    supabase_url, supabase_key = _credentials()
+    return _build_supabase_client(supabase_url, supabase_key, None)
+
+
+def get_service_client() -> Client | None:
+    """
+    A client signed with SUPABASE_SERVICE_ROLE_KEY for server-side work that no user
+    session can authorise (e.g. Storage uploads from a shared process). None when
+    the service key is not configured.
+    """
+    service_key = None
+    if hasattr(st, "secrets"):
+        service_key = st.secrets.get("SUPABASE_SERVICE_ROLE_KEY")
+    service_key = service_key or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not service_key:
+        return None
+    supabase_url, _anon_key = _credentials()
+    return _build_supabase_client(supabase_url, service_key, None)
+
+
+def is_missing_rpc_error(exc: Exception) -> bool:
+    """
+    True when a database function is not deployed: PGRST202 (PostgREST has no such
+    function) or 42883 (Postgres undefined_function). Any other error, including a
+    missing table or column inside a deployed function, is a real failure.
+    """
+    text = str(exc)
+    return "PGRST202" in text or "42883" in text or "Could not find the function" in text
+
+
+def is_missing_table_error(exc: Exception) -> bool:
+    """
+    True when a table or view is not deployed: PGRST205 (not in PostgREST's schema cache)
+    or 42P01 (Postgres undefined_table). A missing column or function is not matched.
+    """
+    text = str(exc)
+    return "PGRST205" in text or "42P01" in text or "Could not find the table" in text
+
+
+# Large `in_` filters are split so request URLs stay under PostgREST/proxy limits
+# (150 uuids ~ 5.5 KB of query string) and chunks are fetched concurrently.
+IN_FILTER_CHUNK_SIZE = int(os.getenv("SUPABASE_IN_CHUNK_SIZE", "150") or 150)
+IN_FILTER_MAX_WORKERS = int(os.getenv("SUPABASE_IN_MAX_WORKERS", "4") or 4)
+
+
+def chunk_values(values, chunk_size: int | None = None) -> list[list]:
+    """De-duplicate `values` (order kept) and split them into `in_`-sized chunks."""
+    unique_values = list(dict.fromkeys(values or []))
+    size = max(1, int(chunk_size or IN_FILTER_CHUNK_SIZE))
+    return [unique_values[idx : idx + size] for idx in range(0, len(unique_values), size)]
+
+
+def execute_in_chunks(query_for_chunk, values, chunk_size: int | None = None, max_workers: int | None = None):
+    """
+    Run `query_for_chunk(chunk).execute()` for each chunk of `values` and return the
+    concatenated `.data` rows in chunk order.
+    `query_for_chunk` must build a fresh query per call, e.g.
+      lambda ids: sb.table("room_objects").select("*").in_("room_id", ids)
+    Values are de-duplicated (order kept); an empty list makes no request.
+    Chunks run concurrently, so a failure can leave other chunks applied: pass
+    `max_workers=1` for writes and let the caller decide how far a partial write got.
+    """
+    chunks = chunk_values(values, chunk_size)
+    if not chunks:
+        return []
+
+    def _run(chunk):
+        return query_for_chunk(chunk).execute().data or []
+
+    workers = max(1, min(int(max_workers or IN_FILTER_MAX_WORKERS), len(chunks)))
+    if workers == 1:
+        results = [_run(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase-in") as pool:
+            results = list(pool.map(_run, chunks))
+
+    rows = []
+    for chunk_rows in results:
+        rows.extend(chunk_rows)
+    return rows
@@ -64,9 +64,24 @@ def _ensure_dotenv_stub():
     sys.modules["dotenv"] = module
 
 
+def _ensure_sentence_transformers_stub():
+    if "sentence_transformers" in sys.modules:
+        return
+
+    module = types.ModuleType("sentence_transformers")
+
+    class SentenceTransformer:  # pragma: no cover - tests patch get_embedder instead
+        def __init__(self, *_args, **_kwargs):
+            raise RuntimeError("sentence-transformers is not installed")
+
+    module.SentenceTransformer = SentenceTransformer
+    sys.modules["sentence_transformers"] = module
+
+
 _ensure_streamlit_stub()
 _ensure_supabase_stub()
 _ensure_dotenv_stub()
+_ensure_sentence_transformers_stub()
 
 
 class FakeQuery:
@@ -0,0 +1,173 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+import catalog_store  # noqa: E402
+
+
+def _catalog(rows=4, dim=3):
+    return pd.DataFrame(
+        {
+            "product_name": [f"Product {idx}" for idx in range(rows)],
+            "Price": [100 * idx if idx % 2 else f"{idx} THB" for idx in range(rows)],
+            "embedding": [np.arange(dim, dtype=float) + idx for idx in range(rows)],
+        }
+    )
+
+
+def test_store_roundtrip_uses_read_only_memmap(tmp_path):
+    df = _catalog()
+    df.loc[2, "embedding"] = None
+
+    manifest = catalog_store.write_store(df, str(tmp_path))
+    meta, embeddings = catalog_store.read_store(str(tmp_path))
+
+    assert (manifest["rows"], manifest["dim"]) == (4, 3)
+    assert "embedding" not in meta.columns
+    assert meta["product_name"].tolist() == df["product_name"].tolist()
+    assert isinstance(embeddings, np.memmap)
+    assert embeddings.dtype == np.float32
+    assert not embeddings.flags.writeable
+    assert embeddings[3].tolist() == [3.0, 4.0, 5.0]
+    assert embeddings[2].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_convert_pickle_and_staleness_check(tmp_path):
+    pickle_path = str(tmp_path / "catalog.pkl")
+    store_dir = str(tmp_path / "store")
+    _catalog().to_pickle(pickle_path)
+    assert not catalog_store.is_current(store_dir, pickle_path)
+
+    catalog_store.convert_pickle(pickle_path, store_dir)
+    version = catalog_store.store_version(store_dir)
+    assert catalog_store.is_current(store_dir, pickle_path)
+
+    # A later rewrite of the legacy pickle makes the store stale until reconverted.
+    future = os.path.getmtime(pickle_path) + 60
+    os.utime(pickle_path, (future, future))
+    assert not catalog_store.is_current(store_dir, pickle_path)
+    assert version is not None
+
+
+def test_catalog_without_embeddings_has_no_matrix(tmp_path):
+    df = _catalog().drop(columns=["embedding"])
+
+    catalog_store.write_store(df, str(tmp_path))
+    meta, embeddings = catalog_store.read_store(str(tmp_path))
+
+    assert embeddings is None
+    assert len(meta) == 4
+
+
+def test_appends_go_to_log_and_replace_rows_by_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_store, "COMPACT_MIN_ENTRIES", 100)
+    store_dir = str(tmp_path)
+    catalog_store.write_store(_catalog(rows=3).assign(Supplier="acme"), store_dir)
+    base_bytes = os.path.getsize(os.path.join(store_dir, catalog_store.EMBEDDINGS_FILE))
+
+    compacted = catalog_store.add_product(
+        store_dir, {"product_name": "Product 1", "Supplier": "acme", "Price": 5}, np.full(3, 9.0)
+    )
+    catalog_store.add_product(store_dir, {"product_name": "New", "Supplier": "acme"}, np.ones(3))
+
+    assert not compacted
+    assert os.path.getsize(os.path.join(store_dir, catalog_store.EMBEDDINGS_FILE)) == base_bytes
+    meta, embeddings = catalog_store.read_store(store_dir)
+    assert meta["product_name"].tolist() == ["Product 0", "Product 2", "Product 1", "New"]
+    assert embeddings[2].tolist() == [9.0, 9.0, 9.0]
+    assert embeddings.shape == (4, 3)
+
+
+def test_compaction_folds_log_refreshes_pickle_and_archives_delta(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_store, "COMPACT_MIN_ENTRIES", 3)
+    store_dir = str(tmp_path / "store")
+    archive_dir = str(tmp_path / "versions")
+    pickle_path = str(tmp_path / "catalog.pkl")
+    catalog_store.write_store(_catalog(rows=2), store_dir)
+
+    results = [
+        catalog_store.add_product(
+            store_dir, {"product_name": f"Added {idx}"}, np.full(3, idx), pickle_path=pickle_path, archive_dir=archive_dir
+        )
+        for idx in range(4)
+    ]
+
+    assert results == [False, False, True, False]
+    assert [entry["row"]["product_name"] for entry in catalog_store.read_log(store_dir)] == ["Added 3"]
+    assert catalog_store.read_manifest(store_dir)["rows"] == 5
+    assert len(pd.read_pickle(pickle_path)) == 5
+    assert catalog_store.is_current(store_dir, pickle_path)
+    deltas = os.listdir(archive_dir)
+    assert len(deltas) == 1 and deltas[0].startswith("product_catalog_delta_")
+
+    frame = catalog_store.load_frame(store_dir)
+    assert frame["product_name"].tolist()[-2:] == ["Added 2", "Added 3"]
+    assert frame["embedding"].iloc[-1].tolist() == [3.0, 3.0, 3.0]
+
+
+def test_concurrent_adds_and_compactions_keep_every_row(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_store, "COMPACT_MIN_ENTRIES", 4)
+    store_dir = str(tmp_path / "store")
+    archive_dir = str(tmp_path / "versions")
+    catalog_store.write_store(_catalog(rows=2), store_dir)
+
+    def _add(idx):
+        return catalog_store.add_product(
+            store_dir, {"product_name": f"Added {idx}"}, np.full(3, idx), archive_dir=archive_dir
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        compactions = sum(pool.map(_add, range(40)))
+
+    frame = catalog_store.load_frame(store_dir)
+    assert compactions > 0
+    assert sorted(name for name in frame["product_name"] if name.startswith("Added")) == sorted(
+        f"Added {idx}" for idx in range(40)
+    )
+    assert len(os.listdir(archive_dir)) == compactions
+
+
+def test_save_frame_keeps_rows_added_after_the_edit_was_loaded(tmp_path):
+    store_dir = str(tmp_path / "store")
+    pickle_path = str(tmp_path / "catalog.pkl")
+    catalog_store.write_store(_catalog(rows=2), store_dir)
+    catalog_store.add_product(store_dir, {"product_name": "Before edit"}, np.full(3, 7.0))
+
+    edited = catalog_store.load_frame(store_dir)
+    edited.at[0, "product_name"] = "Renamed"
+    catalog_store.add_product(store_dir, {"product_name": "During edit"}, np.full(3, 9.0))
+
+    saved = catalog_store.save_frame(store_dir, edited, pickle_path=pickle_path)
+
+    names = ["Renamed", "Product 1", "Before edit", "During edit"]
+    assert saved["product_name"].tolist() == names
+    assert catalog_store.load_frame(store_dir)["product_name"].tolist() == names
+    assert pd.read_pickle(pickle_path)["product_name"].tolist() == names
+    assert catalog_store.read_log(store_dir) == []
+    assert catalog_store.is_current(store_dir, pickle_path)
+
+    catalog_store.add_product(store_dir, {"product_name": "Later"}, np.full(3, 1.0))
+    catalog_store.compact(store_dir)
+    with pytest.raises(catalog_store.StaleFrameError):
+        catalog_store.save_frame(store_dir, saved)
+
+
+def test_rebase_on_pickle_replays_the_log_once(tmp_path):
+    store_dir = str(tmp_path / "store")
+    pickle_path = str(tmp_path / "catalog.pkl")
+    catalog_store.write_store(_catalog(rows=2), store_dir)
+    catalog_store.add_product(store_dir, {"product_name": "Logged"}, np.full(3, 5.0))
+    _catalog(rows=3).to_pickle(pickle_path)
+    os.utime(pickle_path, None)
+
+    assert catalog_store.rebase_on_pickle(store_dir, pickle_path)
+    assert not catalog_store.rebase_on_pickle(store_dir, pickle_path)
+
+    expected = ["Product 0", "Product 1", "Product 2", "Logged"]
+    assert catalog_store.load_frame(store_dir)["product_name"].tolist() == expected
+    assert pd.read_pickle(pickle_path)["product_name"].tolist() == expected
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+import embedding
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.asarray([[float(len(text)), float(text.count(" ")), 1.0] for text in texts])
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    cache = embedding.EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    embedding.set_embedding_cache(cache)
+    yield cache
+    embedding.set_embedding_cache(None)
+
+
+def test_repeat_encodes_only_run_model_for_misses(disk_cache):
+    model = CountingModel()
+
+    first = embedding.encode_texts(["Oak Bench Furniture", "Marble Tile"], model=model, model_name="m")
+    second = embedding.encode_texts(["Marble  Tile ", "Brass Lamp", "Oak Bench Furniture"], model=model, model_name="m")
+
+    assert model.calls == [["Oak Bench Furniture", "Marble Tile"], ["Brass Lamp"]]
+    assert np.array_equal(second[0], first[1])
+    assert np.array_equal(second[2], first[0])
+    assert disk_cache.stats["hits"] == 2
+    assert disk_cache.stats["misses"] == 3
+
+
+def test_cache_survives_new_process_and_is_keyed_by_model(disk_cache, tmp_path):
+    embedding.encode_text("Walnut Table", model=CountingModel(), model_name="model-a")
+
+    reopened = embedding.EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    embedding.set_embedding_cache(reopened)
+    model = CountingModel()
+    vec = embedding.encode_text("Walnut Table", model=model, model_name="model-a")
+    embedding.encode_text("Walnut Table", model=model, model_name="model-b")
+
+    assert vec.dtype == np.float32
+    assert vec[0] == len("Walnut Table")
+    assert reopened.stats["disk_hits"] == 1
+    assert model.calls == [["Walnut Table"]]
+
+
+def test_memory_tier_is_bounded_lru():
+    cache = embedding.EmbeddingCache(None, memory_size=2)
+    embedding.set_embedding_cache(cache)
+    model = CountingModel()
+    try:
+        for text in ["a", "b", "a", "c", "a", "b"]:
+            embedding.encode_text(text, model=model, model_name="m")
+    finally:
+        embedding.set_embedding_cache(None)
+
+    assert model.calls == [["a"], ["b"], ["c"], ["b"]]
@@ -0,0 +1,73 @@
+import numpy as np
+
+import embedding_codec as codec
+
+
+def test_pack_unpack_roundtrip_float32_is_exact():
+    vec = np.array([0.125, -1.5, 3.0, 1e-3], dtype=np.float32)
+
+    packed = codec.pack_vector(vec, tag="f32")
+    restored = codec.unpack_vector(packed)
+
+    assert packed.startswith("f32:")
+    assert restored.dtype == np.float32
+    assert restored.flags["C_CONTIGUOUS"]
+    assert np.array_equal(restored, vec)
+
+
+def test_pack_float16_halves_payload():
+    vec = np.linspace(-1, 1, 384).astype(np.float32)
+
+    f32 = codec.pack_vector(vec, tag="f32")
+    f16 = codec.pack_vector(vec, tag="f16")
+
+    assert len(f16) < len(f32) * 0.55
+    assert np.allclose(codec.unpack_vector(f16), vec, atol=1e-3)
+
+
+def test_unpack_rejects_malformed_payloads():
+    assert codec.unpack_vector(None) is None
+    assert codec.unpack_vector("f64:AAAA") is None
+    assert codec.unpack_vector("f32:not base64!") is None
+    assert codec.unpack_vector("f32:AAA=") is None
+
+
+def test_parse_vector_accepts_json_and_pgvector_text():
+    assert np.array_equal(codec.parse_vector("[1, 2.5, -3]"), np.array([1, 2.5, -3], dtype=np.float32))
+    assert np.array_equal(codec.parse_vector("[1,2,3]"), np.array([1, 2, 3], dtype=np.float32))
+    assert codec.parse_vector("[]") is None
+    assert codec.parse_vector("garbage") is None
+
+
+def test_decode_row_embedding_parses_each_row_version_once(monkeypatch):
+    codec.clear_cache()
+    calls = []
+    real_parse = codec.parse_vector
+
+    def counting_parse(value):
+        calls.append(value)
+        return real_parse(value)
+
+    monkeypatch.setattr(codec, "parse_vector", counting_parse)
+    row = {"id": "mat-1", "updated_at": "2026-03-01T00:00:00", "embedding": "[1, 2, 3]"}
+
+    first = codec.decode_row_embedding(row)
+    second = codec.decode_row_embedding(dict(row))
+    codec.decode_row_embedding({**row, "updated_at": "2026-03-02T00:00:00", "embedding": "[4, 5, 6]"})
+
+    assert first is second
+    assert not first.flags.writeable
+    assert len(calls) == 2
+    assert codec.cache_stats()["hits"] == 1
+
+
+def test_decode_row_embedding_prefers_packed_column():
+    codec.clear_cache()
+    row = {
+        "id": "mat-2",
+        "updated_at": "2026-03-01T00:00:00",
+        "embedding": "[9, 9, 9]",
+        "embedding_packed": codec.pack_vector([1.0, 2.0, 3.0], tag="f32"),
+    }
+
+    assert np.array_equal(codec.decode_row_embedding(row), np.array([1, 2, 3], dtype=np.float32))
@@ -0,0 +1,50 @@
+import ast
+from pathlib import Path
+
+import embedding
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+        self.max_seq_length = 256
+
+    def encode(self, text, convert_to_numpy=True):
+        self.encoded.append(text)
+        return [float(len(text))]
+
+
+def test_lazy_embedder_loads_model_on_first_use_only():
+    loads = []
+
+    def _loader():
+        loads.append(1)
+        return CountingModel()
+
+    proxy = embedding.LazyEmbedder(_loader)
+    assert not proxy.loaded
+    assert loads == []
+
+    assert proxy.encode("oak") == [3.0]
+    assert proxy.encode("teak", convert_to_numpy=True) == [4.0]
+    assert proxy.max_seq_length == 256
+    assert proxy.loaded
+    assert loads == [1]
+
+
+def test_app_startup_does_not_import_torch_or_load_model():
+    tree = ast.parse((ROOT / "app.py").read_text(encoding="utf-8"))
+    heavy = {"torch", "sentence_transformers"}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            assert not {alias.name.split(".")[0] for alias in node.names} & heavy
+        if isinstance(node, ast.ImportFrom):
+            assert (node.module or "").split(".")[0] not in heavy
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            continue
+        # Module-level code runs before the login screen and the share portal render.
+        for call in ast.walk(node):
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Name):
+                assert call.func.id != "get_embedder"
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+
+import embedding
+from embedding_onnx import OnnxEmbedder
+
+
+PARITY_CORPUS = [
+    "light wood bench for outdoor",
+    "Oak Bench Furniture solid wood bench",
+    "Marble Tile Tiles white carrara",
+    "Brass Lamp Lighting",
+    "Outdoor Teak Lounger Furniture weather resistant",
+    "Generic Paint General baseline",
+    "walnut side table",
+    "terrazzo floor tile grey",
+    "rattan pendant light",
+    "linen curtain sheer white",
+]
+
+
+def _fake_onnx_embedder():
+    model = OnnxEmbedder.__new__(OnnxEmbedder)
+    model.batches = []
+
+    def _forward(texts):
+        model.batches.append(list(texts))
+        return np.asarray([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+    model._forward = _forward
+    return model
+
+
+def test_encode_batches_by_length_and_keeps_input_order():
+    model = _fake_onnx_embedder()
+
+    matrix = model.encode(["ccc", "a", "bbbb", "dd"], batch_size=2)
+
+    assert matrix[:, 0].tolist() == [3.0, 1.0, 4.0, 2.0]
+    assert model.batches == [["a", "dd"], ["ccc", "bbbb"]]
+    assert model.encode("oak").shape == (2,)
+
+
+def test_onnx_backend_falls_back_to_torch_when_export_missing(monkeypatch, tmp_path):
+    monkeypatch.setenv("EMBED_BACKEND", "onnx-int8")
+    monkeypatch.setenv("EMBED_ONNX_PATH", str(tmp_path))
+    monkeypatch.setattr(embedding, "_load_torch_embedder", lambda: "torch-model")
+    monkeypatch.setattr(embedding, "_LOADED_BACKEND", None)
+
+    assert embedding.cache_model_name().endswith("#torch")
+    assert embedding._load_embedder(embedding._backend()) == "torch-model"
+    assert embedding.cache_model_name().endswith("#torch")
+
+
+def test_cache_model_name_follows_the_backend_that_loaded(monkeypatch):
+    monkeypatch.setenv("EMBED_BACKEND", "onnx")
+    monkeypatch.setattr(embedding, "_onnx_backend_usable", lambda _backend: True)
+    monkeypatch.setattr(embedding, "_LOADED_BACKEND", None)
+    assert embedding.cache_model_name().endswith("#onnx")
+
+    monkeypatch.setattr(embedding, "_LOADED_BACKEND", "torch")
+    assert embedding.cache_model_name().endswith("#torch")
+
+
+@pytest.mark.parametrize("variant", ["onnx", "onnx-int8"])
+def test_onnx_backend_matches_torch_embeddings(variant):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    if not getattr(sentence_transformers, "__file__", None):
+        pytest.skip("sentence-transformers is not installed")
+    model_dir = embedding._onnx_path()
+    if not os.path.exists(os.path.join(model_dir, "tokenizer.json")):
+        pytest.skip("run scripts/export_onnx_embedder.py first")
+
+    reference = embedding._load_torch_embedder().encode(PARITY_CORPUS, convert_to_numpy=True)
+    candidate = OnnxEmbedder(model_dir, variant=variant).encode(PARITY_CORPUS)
+
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cosine = np.sum(reference * candidate, axis=1)
+    assert cosine.min() > 0.99
@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+import pytest
+
+import embedding_worker
+
+
+class RecordingEncoder:
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.batches.append(list(texts))
+        return np.asarray([[float(len(text)), 1.0] for text in texts])
+
+
+def test_concurrent_requests_are_coalesced_into_batches():
+    encoder = RecordingEncoder()
+    batcher = embedding_worker.EmbeddingBatcher(encode_batch=encoder, max_batch=8, max_wait=0.2)
+    texts = [f"material {'x' * idx}" for idx in range(20)]
+    results = {}
+    start = threading.Barrier(len(texts))
+
+    def _worker(text):
+        start.wait()
+        results[text] = batcher.encode(text, timeout=5)
+
+    threads = [threading.Thread(target=_worker, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(results[text][0] == len(text) for text in texts)
+    assert len(encoder.batches) < len(texts)
+    assert max(len(batch) for batch in encoder.batches) <= 8
+    assert batcher.stats["requests"] == len(texts)
+
+
+def test_encode_many_keeps_order_and_encodes_duplicates_once():
+    encoder = RecordingEncoder()
+    batcher = embedding_worker.EmbeddingBatcher(encode_batch=encoder, max_batch=16, max_wait=0.05)
+
+    vectors = batcher.encode_many(["bb", "a", "bb", "ccc"], timeout=5)
+
+    assert [vec[0] for vec in vectors] == [2.0, 1.0, 2.0, 3.0]
+    assert sum(len(batch) for batch in encoder.batches) == 3
+
+
+def test_encoder_errors_reach_every_caller():
+    def _broken(_texts):
+        raise RuntimeError("model unavailable")
+
+    batcher = embedding_worker.EmbeddingBatcher(encode_batch=_broken, max_wait=0.0)
+
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        batcher.encode("oak", timeout=5)
+    # The worker thread survives a failed batch.
+    with pytest.raises(RuntimeError):
+        batcher.encode("teak", timeout=5)
+
+
+def test_schedule_runs_follow_up_with_vector():
+    embedding_worker.set_batcher(embedding_worker.EmbeddingBatcher(encode_batch=RecordingEncoder(), max_wait=0.0))
+    seen = []
+    try:
+        done = embedding_worker.schedule("walnut", lambda vec: seen.append(vec[0]) or "saved")
+        assert embedding_worker.wait_for_pending(timeout=5)
+    finally:
+        embedding_worker.set_batcher(None)
+
+    assert done.result() == "saved"
+    assert seen == [6.0]
@@ -0,0 +1,100 @@
+import base64
+import os
+
+import pytest
+
+import image_store
+
+
+@pytest.fixture
+def local_store(tmp_path):
+    store = image_store.LocalImageStore(str(tmp_path / "images"))
+    image_store.set_image_store(store)
+    image_store._DISPLAY_CACHE.clear()
+    yield store
+    image_store.set_image_store(None)
+    image_store._DISPLAY_CACHE.clear()
+
+
+def _data_url(payload: bytes) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(payload).decode("ascii")
+
+
+def test_put_is_content_addressed_and_deduplicated(local_store):
+    ref = local_store.put(b"same bytes", thumbnail=b"thumb")
+    again = local_store.put(b"same bytes", thumbnail=b"thumb")
+
+    assert ref == again
+    assert image_store.is_ref(ref)
+    assert local_store.get(ref) == b"same bytes"
+    assert local_store.get(ref, thumbnail=True) == b"thumb"
+    files = [name for _, _, names in os.walk(local_store.root) for name in names]
+    assert len(files) == 2
+
+
+def test_display_src_inlines_thumbnail_for_local_store(local_store):
+    ref = local_store.put(b"full", thumbnail=b"small")
+
+    assert image_store.display_src(ref) == _data_url(b"small")
+    assert image_store.display_src("blob:sha256:" + "0" * 64) is None
+
+
+def test_migrate_mood_images_replaces_only_data_urls(local_store):
+    cart = {
+        "items": [{"name": "Sofa"}],
+        "design_brief": {
+            "style": "warm",
+            "mood_images": ["https://example.com/a.jpg", _data_url(b"pixels"), _data_url(b"pixels")],
+        },
+    }
+
+    migrated, moved = image_store.migrate_mood_images(cart)
+
+    assert moved == 2
+    images = migrated["design_brief"]["mood_images"]
+    assert images[0] == "https://example.com/a.jpg"
+    assert images[1] == images[2] == image_store.make_ref(b"pixels")
+    assert migrated["design_brief"]["style"] == "warm"
+    assert migrated["items"] == cart["items"]
+    assert cart["design_brief"]["mood_images"][1].startswith("data:image/")
+    assert image_store.migrate_mood_images(migrated) == (migrated, 0)
+
+
+def test_put_upload_stores_resized_jpeg(local_store):
+    Image = pytest.importorskip("PIL.Image")
+    from io import BytesIO
+
+    upload = BytesIO()
+    Image.new("RGB", (2400, 1200), (200, 120, 40)).save(upload, format="PNG")
+    upload.seek(0)
+
+    ref = image_store.put_upload(upload)
+
+    full = Image.open(BytesIO(local_store.get(ref)))
+    thumb = Image.open(BytesIO(local_store.get(ref, thumbnail=True)))
+    assert full.format == "JPEG" and max(full.size) == image_store.FULL_SIZE
+    assert max(thumb.size) == image_store.THUMB_SIZE
+
+
+def test_bucket_store_uses_given_client_and_requires_service_key_otherwise(monkeypatch, tmp_path):
+    import supabase_client
+
+    class FakeStorage:
+        def from_(self, bucket):
+            return f"bucket:{bucket}"
+
+    class FakeClient:
+        storage = FakeStorage()
+
+    monkeypatch.setenv("IMAGE_STORE_BUCKET", "mood-images")
+    monkeypatch.setenv("IMAGE_STORE_DIR", str(tmp_path))
+    store = image_store._build_default_store(FakeClient())
+    assert isinstance(store, image_store.BucketImageStore)
+    assert store.bucket == "bucket:mood-images"
+
+    monkeypatch.setattr(supabase_client, "get_service_client", lambda: None)
+    with pytest.raises(RuntimeError, match="SUPABASE_SERVICE_ROLE_KEY"):
+        image_store._build_default_store()
+
+    monkeypatch.delenv("IMAGE_STORE_BUCKET")
+    assert isinstance(image_store._build_default_store(), image_store.LocalImageStore)
@@ -0,0 +1,404 @@
+import ast
+import zlib
+
+import numpy as np
+import pytest
+
+import embedding_worker
+import materials_index
+import materials_manager as mm
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeMaterialsTable:
+    def __init__(self, client):
+        self.client = client
+        self.columns = "*"
+        self.id_filter = None
+        self.order_key = None
+        self.order_desc = False
+        self.limit_count = None
+        self.write = None
+        self.eq_filter = None
+
+    def insert(self, payload):
+        self.write = ("insert", payload)
+        return self
+
+    def update(self, payload):
+        self.write = ("update", payload)
+        return self
+
+    def eq(self, key, value):
+        self.eq_filter = (key, value)
+        return self
+
+    def select(self, columns="*", **_kwargs):
+        self.columns = columns
+        return self
+
+    def order(self, key, desc=False):
+        self.order_key = key
+        self.order_desc = desc
+        return self
+
+    def in_(self, key, values):
+        assert key == "id"
+        self.id_filter = {str(v) for v in values}
+        return self
+
+    def or_(self, *_args, **_kwargs):
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def execute(self):
+        if self.write is not None:
+            return self.client.apply_write(self.write, self.eq_filter)
+        self.client.requests.append((self.columns, sorted(self.id_filter) if self.id_filter is not None else None))
+        if self.columns != "*" and "updated_at" in self.columns and not self.client.has_updated_at:
+            raise RuntimeError("column materials.updated_at does not exist")
+        rows = [dict(row) for row in self.client.rows]
+        if self.id_filter is not None:
+            rows = [row for row in rows if str(row.get("id")) in self.id_filter]
+        if self.order_key:
+            rows.sort(key=lambda row: str(row.get(self.order_key) or ""), reverse=self.order_desc)
+        if self.columns != "*":
+            keys = [col.strip() for col in self.columns.split(",")]
+            rows = [{key: row.get(key) for key in keys} for row in rows]
+        if self.limit_count is not None:
+            rows = rows[: self.limit_count]
+        return FakeResult(rows)
+
+
+class FakeRpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client.rpc_calls.append((self.name, self.params))
+        if self.client.rpc_error is not None:
+            raise self.client.rpc_error
+        if self.client.rpc_rows is None:
+            raise RuntimeError("Could not find the function public.match_materials")
+        return FakeResult(list(self.client.rpc_rows))
+
+
+class FakeMaterialsSupabase:
+    def __init__(self, rows, has_updated_at=True, rpc_rows=None):
+        self.rows = list(rows)
+        self.has_updated_at = has_updated_at
+        self.rpc_rows = rpc_rows
+        self.rpc_error = None
+        self.requests = []
+        self.rpc_calls = []
+        self.writes = []
+        self.rejected_columns = set()
+
+    def apply_write(self, write, eq_filter):
+        verb, payload = write
+        self.writes.append((verb, payload))
+        payloads = payload if isinstance(payload, list) else [payload]
+        for item in payloads:
+            rejected = self.rejected_columns.intersection(item)
+            if rejected:
+                raise RuntimeError(f"column materials.{sorted(rejected)[0]} does not exist")
+        if verb == "insert":
+            created = []
+            for item in payloads:
+                row = {"id": f"mat-new-{len(self.rows) + 1}", **item}
+                self.rows.append(row)
+                created.append(dict(row))
+            return FakeResult(created)
+        key, value = eq_filter
+        matched = [row for row in self.rows if str(row.get(key)) == str(value)]
+        for row in matched:
+            row.update(payload)
+        return FakeResult([dict(row) for row in matched])
+
+    def table(self, table_name):
+        assert table_name == "materials"
+        return FakeMaterialsTable(self)
+
+    def rpc(self, name, params):
+        return FakeRpc(self, name, params)
+
+
+VOCAB = ["oak", "wood", "bench", "marble", "tile", "brass", "lamp", "outdoor"]
+
+
+class FakeEmbedder:
+    def encode(self, text, convert_to_numpy=True):
+        words = str(text or "").lower().split()
+        vec = np.array([1.0 + sum(word.startswith(v) for word in words) for v in VOCAB], dtype=float)
+        # Text-seeded jitter so distinct texts never tie exactly; float32 storage only
+        # preserves ordering up to ~1e-7, which real model outputs never sit within.
+        noise = np.random.default_rng(zlib.crc32(" ".join(words).encode("utf-8"))).random(len(VOCAB))
+        return vec + noise * 0.1
+
+
+def _row(idx, name, category="Furniture", tags=None, created_at=None, embed=True, description=""):
+    row = {
+        "id": f"mat-{idx}",
+        "name": name,
+        "category": category,
+        "description": description,
+        "tags": tags or [],
+        "created_at": created_at or f"2026-03-{idx:02d}T00:00:00",
+        "updated_at": f"2026-03-{idx:02d}T00:00:00",
+    }
+    if embed:
+        row["embedding"] = str(FakeEmbedder().encode(f"{name} {category} {description}").tolist())
+    return row
+
+
+def _reference_search(rows, query, limit):
+    """The original per-row ranking loop, kept here as the parity oracle."""
+    q = query.strip()
+    q_lower = q.lower()
+    tokens = [tok for tok in q_lower.split() if tok]
+    query_vec = np.asarray(FakeEmbedder().encode(q), dtype=float)
+
+    ranked = []
+    for row in rows:
+        haystack = mm._material_text_for_embedding(row).lower()
+        token_hits = sum(1 for tok in tokens if tok in haystack)
+        phrase_hit = 1 if q_lower in haystack else 0
+        lexical_score = (2.0 * phrase_hit) + (0.8 * token_hits)
+        score = lexical_score
+        semantic_score = None
+        raw = row.get("embedding")
+        if raw is not None:
+            row_vec = np.asarray(ast.literal_eval(raw), dtype=float)
+            denom = float(np.linalg.norm(query_vec) * np.linalg.norm(row_vec))
+            if denom > 0:
+                semantic_score = float(np.dot(query_vec, row_vec) / denom)
+                score += max(semantic_score, 0.0) * 0.55
+        is_general = mm._is_general_material(row)
+        if is_general:
+            score += 0.15
+        if lexical_score > 0 or (semantic_score is not None and semantic_score >= 0.20) or is_general:
+            ranked.append((score, row))
+
+    ranked.sort(key=lambda item: (item[0], str(item[1].get("created_at") or "")), reverse=True)
+    top_rows = [row for _, row in ranked[:limit]]
+    seen_ids = {str(r.get("id")) for r in top_rows}
+    if len(top_rows) < limit:
+        general_rows = [r for r in rows if mm._is_general_material(r) and str(r.get("id")) not in seen_ids]
+        general_rows.sort(key=lambda r: str(r.get("created_at") or ""), reverse=True)
+        for r in general_rows:
+            top_rows.append(r)
+            if len(top_rows) >= limit:
+                break
+    return top_rows[:limit]
+
+
+@pytest.fixture
+def catalog_rows():
+    return [
+        _row(1, "Oak Bench", description="solid wood bench"),
+        _row(2, "Marble Tile", category="Tiles"),
+        _row(3, "Brass Lamp", category="Lighting"),
+        _row(4, "Outdoor Teak Bench", description="outdoor wood"),
+        _row(5, "Generic Paint", category="General", embed=False),
+        _row(6, "Wood Tile", category="Tiles", tags=["generic"]),
+        _row(7, "Walnut Side Table", embed=False),
+    ]
+
+
+@pytest.fixture(autouse=True)
+def reset_match_rpc_state(monkeypatch):
+    monkeypatch.setattr(mm, "_match_rpc_unavailable_until", 0.0)
+
+
+@pytest.fixture(autouse=True)
+def fake_embedding_worker():
+    batcher = embedding_worker.EmbeddingBatcher(
+        encode_batch=lambda texts: [FakeEmbedder().encode(text) for text in texts],
+        max_wait=0.0,
+    )
+    embedding_worker.set_batcher(batcher)
+    yield batcher
+    embedding_worker.set_batcher(None)
+
+
+@pytest.fixture
+def fake_materials(monkeypatch, catalog_rows):
+    materials_index.clear_indexes()
+    fake_sb = FakeMaterialsSupabase(catalog_rows)
+    monkeypatch.setattr(mm, "get_supabase", lambda _access_token: fake_sb)
+    return fake_sb
+
+
+@pytest.mark.parametrize("query,limit", [("oak bench", 5), ("wood", 3), ("tile", 10), ("zzz", 4)])
+def test_search_materials_semantic_matches_reference_ranking(fake_materials, catalog_rows, query, limit):
+    results = mm.search_materials_semantic("token-1", query, limit=limit)
+
+    expected = _reference_search(sorted(catalog_rows, key=lambda r: r["created_at"], reverse=True), query, limit)
+    assert [row["id"] for row in results] == [row["id"] for row in expected]
+
+
+def test_search_index_only_fetches_changed_rows(fake_materials):
+    mm.search_materials_semantic("token-1", "oak", limit=5)
+    fake_materials.requests.clear()
+
+    changed = next(row for row in fake_materials.rows if row["id"] == "mat-3")
+    changed["name"] = "Oak Lamp"
+    changed["updated_at"] = "2026-04-01T00:00:00"
+    fake_materials.rows = [row for row in fake_materials.rows if row["id"] != "mat-7"]
+
+    results = mm.search_materials_semantic("token-1", "oak", limit=5)
+
+    full_fetches = [ids for columns, ids in fake_materials.requests if columns == "*"]
+    assert full_fetches == [["mat-3"]]
+    assert "mat-3" in [row["id"] for row in results]
+    assert "mat-7" not in materials_index.index_for_scope("token-1").ids
+
+
+def test_search_index_falls_back_to_full_reload_without_updated_at(monkeypatch, catalog_rows):
+    materials_index.clear_indexes()
+    fake_sb = FakeMaterialsSupabase(catalog_rows, has_updated_at=False)
+    monkeypatch.setattr(mm, "get_supabase", lambda _access_token: fake_sb)
+
+    results = mm.search_materials_semantic("token-1", "marble", limit=2)
+
+    assert results[0]["id"] == "mat-2"
+
+
+def test_scope_key_uses_jwt_subject_across_token_refreshes():
+    import base64
+    import json
+
+    def _jwt(sub, exp):
+        body = base64.urlsafe_b64encode(json.dumps({"sub": sub, "exp": exp}).encode()).decode().rstrip("=")
+        return f"header.{body}.signature"
+
+    assert materials_index.scope_key(_jwt("user-1", 1)) == materials_index.scope_key(_jwt("user-1", 2))
+    assert materials_index.scope_key(_jwt("user-1", 1)) != materials_index.scope_key(_jwt("user-2", 1))
+    assert materials_index.scope_key("opaque-token").startswith("token:")
+
+
+def test_hybrid_ranker_matches_reference_on_randomized_catalog(monkeypatch):
+    import random
+
+    rng = random.Random(7)
+    words = ["oak", "oakwood", "white", "marble", "tile", "brass", "lamp", "bench", "outdoor", "teak"]
+    rows = []
+    for idx in range(1, 121):
+        name = " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+        rows.append(
+            _row(
+                (idx % 28) + 1,
+                name.title(),
+                category=rng.choice(["Furniture", "Tiles", "General", "Lighting"]),
+                tags=rng.choice([[], ["generic"], "['baseline', 'warm']"]),
+                embed=rng.random() > 0.2,
+                description=rng.choice(["", "hand  finished", "warm oak tone"]),
+            )
+        )
+        rows[-1]["id"] = f"mat-r{idx}"
+
+    materials_index.clear_indexes()
+    fake_sb = FakeMaterialsSupabase(rows)
+    monkeypatch.setattr(mm, "get_supabase", lambda _access_token: fake_sb)
+
+    listing_order = sorted(rows, key=lambda r: r["created_at"], reverse=True)
+    for query in ["oak", "oak oak", "wood tile", "marble tile", "warm oak", "Teak  Bench", "lamp", "qq"]:
+        for limit in [1, 5, 20, 200]:
+            results = mm.search_materials_semantic("token-1", query, limit=limit)
+            expected = _reference_search(listing_order, query, limit)
+            assert [row["id"] for row in results] == [row["id"] for row in expected], (query, limit)
+
+
+def test_search_uses_match_materials_rpc_when_available(monkeypatch, catalog_rows):
+    materials_index.clear_indexes()
+    rpc_rows = [catalog_rows[1], catalog_rows[0]]
+    fake_sb = FakeMaterialsSupabase(catalog_rows, rpc_rows=rpc_rows)
+    monkeypatch.setattr(mm, "get_supabase", lambda _access_token: fake_sb)
+
+    results = mm.search_materials_semantic("token-1", " Marble ", limit=7)
+
+    assert results == rpc_rows
+    assert fake_sb.requests == []
+    name, params = fake_sb.rpc_calls[0]
+    assert name == "match_materials"
+    assert params["match_count"] == 7
+    assert params["query_text"] == "Marble"
+    assert len(params["query_embedding"]) == len(VOCAB)
+
+
+def test_search_falls_back_to_in_process_ranker_when_rpc_missing(fake_materials, catalog_rows):
+    first = mm.search_materials_semantic("token-1", "marble", limit=3)
+    second = mm.search_materials_semantic("token-1", "marble", limit=3)
+
+    expected = _reference_search(sorted(catalog_rows, key=lambda r: r["created_at"], reverse=True), "marble", 3)
+    assert [row["id"] for row in first] == [row["id"] for row in expected]
+    assert second == first
+    # The missing RPC is not retried on every keystroke.
+    assert len(fake_materials.rpc_calls) == 1
+
+
+def test_search_retries_rpc_after_errors_other_than_missing_function(fake_materials):
+    fake_materials.rpc_error = RuntimeError("canceling statement due to statement timeout")
+    mm.search_materials_semantic("token-1", "marble", limit=3)
+
+    fake_materials.rpc_error = None
+    fake_materials.rpc_rows = [{"id": "mat-2"}]
+    assert mm.search_materials_semantic("token-1", "marble", limit=3) == [{"id": "mat-2"}]
+    assert len(fake_materials.rpc_calls) == 2
+
+
+def test_search_falls_through_to_text_search_when_rpc_returns_nothing(fake_materials, catalog_rows):
+    fake_materials.rpc_rows = []
+
+    results = mm.search_materials_semantic("token-1", "marble", limit=2)
+
+    assert fake_materials.requests == [("*", None)]
+    assert len(results) == 2
+
+
+def test_add_private_material_returns_before_embedding_and_backfills(fake_materials):
+    fake_materials.rejected_columns = {"embedding_packed"}
+    payload = {"name": "Oak Shelf", "category": "Furniture", "tags": ["wood"], "lead_time_days": "0"}
+
+    created = mm.add_private_material("token-1", "user-1", payload)
+
+    insert_verb, inserted = fake_materials.writes[0]
+    assert insert_verb == "insert"
+    assert "embedding" not in inserted
+    assert inserted["lead_time_days"] is None
+    assert embedding_worker.wait_for_pending(timeout=5)
+
+    stored = next(row for row in fake_materials.rows if row["id"] == created["id"])
+    expected = FakeEmbedder().encode("Oak Shelf Furniture wood")
+    assert np.allclose(stored["embedding"], expected)
+    assert stored["updated_at"] == "now()"
+    assert "embedding_packed" not in stored
+
+
+def test_add_private_material_can_embed_before_insert(fake_materials):
+    created = mm.add_private_material("token-1", "user-1", {"name": "Brass Hook"}, defer_embedding=False)
+
+    assert len(fake_materials.writes) == 1
+    assert created["embedding_packed"].startswith("f32:")
+    assert np.allclose(created["embedding"], FakeEmbedder().encode("Brass Hook"))
+
+
+def test_add_private_materials_bulk_inserts_once_and_batches_embeddings(fake_materials, fake_embedding_worker):
+    payloads = [{"name": f"Tile {idx}", "category": "Tiles"} for idx in range(6)] + [{"category": "nameless"}]
+
+    created = mm.add_private_materials_bulk("token-1", "user-1", payloads)
+
+    assert [row["name"] for row in created] == [f"Tile {idx}" for idx in range(6)]
+    assert [verb for verb, _ in fake_materials.writes].count("insert") == 1
+    assert embedding_worker.wait_for_pending(timeout=5)
+    assert all(row.get("embedding_packed") for row in fake_materials.rows if row["id"].startswith("mat-new"))
+    assert fake_embedding_worker.stats["encoded"] == 6
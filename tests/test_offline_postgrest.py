@@ -0,0 +1,60 @@
+import types
+
+import pytest
+
+import project_manager as pm
+from scripts.offline_postgrest import OfflineSupabase, legacy_workspace, materials_library
+
+
+def test_offline_client_filters_orders_and_writes():
+    sb = OfflineSupabase(
+        {
+            "projects": [
+                {"id": "p1", "name": "B", "cart": {"share": {"token": "t1", "enabled": True}}},
+                {"id": "p2", "name": "A", "cart": {"items": []}},
+            ]
+        }
+    )
+
+    assert [row["id"] for row in sb.table("projects").select("id").order("name").execute().data] == ["p2", "p1"]
+    assert sb.table("projects").select("id").contains("cart", {"share": {"token": "t1"}}).execute().data == [
+        {"id": "p1"}
+    ]
+    assert sb.table("projects").select("id").in_("id", ["p2", "p9"]).limit(5).execute().data == [{"id": "p2"}]
+
+    created = sb.table("projects").insert({"name": "C"}).execute().data[0]
+    sb.table("projects").update({"name": "D", "updated_at": "now()"}).eq("id", created["id"]).execute()
+    assert sb.table("projects").select("name").eq("id", created["id"]).execute().data == [{"name": "D"}]
+    assert sb.table("projects").delete().neq("id", "p1").execute().data[0]["id"] == "p2"
+    assert sb.requests == 7
+
+    with pytest.raises(RuntimeError, match="PGRST205"):
+        sb.table("project_summaries").select("*").execute()
+    with pytest.raises(RuntimeError, match="PGRST202"):
+        sb.rpc("create_legacy_project", {}).execute()
+
+
+def test_generators_build_linked_rows():
+    materials = materials_library(50, owner_id="user-1", seed=3)
+    tables = legacy_workspace(2, 3, 4, owner_id="user-1", material_ids=[m["id"] for m in materials], seed=3)
+
+    assert len(materials) == 50
+    assert len(tables["projects"]) == 2
+    assert len(tables["project_rooms"]) == 6
+    assert len(tables["room_objects"]) == 24
+    room_ids = {room["id"] for room in tables["project_rooms"]}
+    assert all(obj["room_id"] in room_ids for obj in tables["room_objects"])
+    assert legacy_workspace(2, 3, 4, seed=3)["projects"][0]["id"] == tables["projects"][0]["id"]
+
+
+def test_managers_run_against_offline_client(monkeypatch):
+    tables = legacy_workspace(1, 4, 5, owner_id="user-1")
+    sb = OfflineSupabase(tables)
+    monkeypatch.setattr(pm, "st", types.SimpleNamespace(session_state={"sb_access_token": "token-1"}))
+    monkeypatch.setattr(pm, "get_supabase", lambda _access_token=None: sb)
+    room_ids = [room["id"] for room in tables["project_rooms"]]
+
+    objects = pm.load_room_objects_batch(room_ids)
+
+    assert sum(len(rows) for rows in objects.values()) == 20
+    assert sb.requests == 1
@@ -31,6 +31,7 @@ class FakeTable:
         self.filters = []
         self.order_by = []
         self.limit_count = None
+        self.in_filters = []
 
     def select(self, *_args, **_kwargs):
         self.op = "select"
@@ -40,6 +41,10 @@ class FakeTable:
         self.filters.append((key, value))
         return self
 
+    def in_(self, key, values):
+        self.in_filters.append((key, {str(value) for value in values}))
+        return self
+
     def order(self, key, desc=False):
         self.order_by.append((key, desc))
         return self
@@ -77,6 +82,8 @@ class FakeTable:
         rows = [dict(r) for r in self.client.db[self.table_name]]
         for key, value in self.filters:
             rows = [r for r in rows if str(r.get(key)) == str(value)]
+        for key, values in self.in_filters:
+            rows = [r for r in rows if str(r.get(key)) in values]
         return rows
 
     def _select(self):
@@ -1,6 +1,25 @@
+import re
+import sqlite3
+from pathlib import Path
+
 import pytest
 
 import project_manager as pm
+import supabase_client
+
+
+@pytest.fixture(autouse=True)
+def _reset_share_token_cache():
+    pm._share_token_cache.clear()
+    yield
+    pm._share_token_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rpc_flags(monkeypatch):
+    monkeypatch.setattr(pm, "_cart_patch_rpc_available", True)
+    monkeypatch.setattr(pm, "_cascade_delete_rpc_available", True)
+    monkeypatch.setattr(pm, "_project_touch_triggers_available", None)
 
 
 class SessionState(dict):
@@ -47,15 +66,22 @@ class FakeTable:
         self.order_key = None
         self.order_desc = False
         self.limit_count = None
+        self.columns = "*"
+        self.in_filters = []
 
-    def select(self, *_args, **_kwargs):
+    def select(self, columns="*", *_args, **_kwargs):
         self.operation = "select"
+        self.columns = columns
         return self
 
     def eq(self, key, value):
         self.filters.append((key, value))
         return self
 
+    def in_(self, key, values):
+        self.in_filters.append((key, {str(value) for value in values}))
+        return self
+
     def order(self, key, desc=False):
         self.order_key = key
         self.order_desc = desc
@@ -70,6 +96,17 @@ class FakeTable:
         self.payload = payload
         return self
 
+    def upsert(self, payload, on_conflict=None):
+        self.operation = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, payload):
+        self.operation = "update"
+        self.payload = payload
+        return self
+
     def delete(self):
         self.operation = "delete"
         return self
@@ -79,20 +116,33 @@ class FakeTable:
             return FakeResult(self._select_rows())
         if self.operation == "insert":
             return FakeResult(self._insert_rows())
+        if self.operation == "update":
+            return FakeResult(self._update_rows())
+        if self.operation == "upsert":
+            return FakeResult(self._upsert_rows())
         if self.operation == "delete":
             return FakeResult(self._delete_rows())
         raise AssertionError(f"Unsupported operation: {self.operation}")
 
     def _select_rows(self):
+        self.client.selects.append((self.table_name, self.columns))
+        self._require_table()
+        for column in self.columns.split(","):
+            if column.strip() in self.client.missing_columns:
+                raise RuntimeError(f"42703: column {self.table_name}.{column.strip()} does not exist")
         rows = [dict(row) for row in self.client.db[self.table_name] if self._matches(row)]
         if self.order_key:
             rows.sort(key=lambda row: str(row.get(self.order_key) or ""), reverse=self.order_desc)
         if self.limit_count is not None:
             rows = rows[: self.limit_count]
+        if self.columns != "*":
+            keys = [key.strip() for key in self.columns.split(",")]
+            rows = [{key: row.get(key) for key in keys} for row in rows]
         return rows
 
     def _insert_rows(self):
         payload_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        self._require_table()
 
         if self.table_name == "project_rooms":
             if self.client.room_insert_mode == "error":
@@ -102,6 +152,7 @@ class FakeTable:
         if self.table_name == "room_objects" and self.client.partial_room_object_insert and len(payload_rows) > 1:
             payload_rows = payload_rows[:-1]
 
+        self.client.writes.append((self.table_name, "insert"))
         created = []
         for payload in payload_rows:
             row = dict(payload)
@@ -110,7 +161,34 @@ class FakeTable:
             created.append(dict(row))
         return created
 
+    def _require_table(self):
+        if self.table_name not in self.client.db:
+            raise RuntimeError(f"PGRST205: Could not find the table 'public.{self.table_name}' in the schema cache")
+
+    def _update_rows(self):
+        self._require_table()
+        self.client.writes.append((self.table_name, "update"))
+        updated = []
+        for row in self.client.db[self.table_name]:
+            if self._matches(row):
+                row.update(self.payload)
+                updated.append(dict(row))
+        return updated
+
+    def _upsert_rows(self):
+        self._require_table()
+        self.client.writes.append((self.table_name, "upsert"))
+        table = self.client.db[self.table_name]
+        for row in table:
+            if str(row.get(self.on_conflict)) == str(self.payload.get(self.on_conflict)):
+                row.update(self.payload)
+                return [dict(row)]
+        table.append(dict(self.payload))
+        return [dict(self.payload)]
+
     def _delete_rows(self):
+        self._require_table()
+        self.client.writes.append((self.table_name, "delete"))
         kept = []
         deleted = []
         for row in self.client.db[self.table_name]:
@@ -123,7 +201,9 @@ class FakeTable:
         return deleted
 
     def _matches(self, row):
-        return all(str(row.get(key)) == str(value) for key, value in self.filters)
+        return all(str(row.get(key)) == str(value) for key, value in self.filters) and all(
+            str(row.get(key)) in values for key, values in self.in_filters
+        )
 
 
 class FakeSupabase:
@@ -135,8 +215,10 @@ class FakeSupabase:
         projects=None,
         project_rooms=None,
         room_objects=None,
+        missing_columns=(),
     ):
         self.room_insert_mode = room_insert_mode
+        self.missing_columns = set(missing_columns)
         self.partial_room_object_insert = partial_room_object_insert
         self.db = {
             "projects": list(projects or []),
@@ -144,6 +226,10 @@ class FakeSupabase:
             "room_objects": list(room_objects or []),
         }
         self.deleted = {"projects": [], "project_rooms": [], "room_objects": []}
+        self.selects = []
+        self.rpc_handlers = {}
+        self.rpc_calls = []
+        self.writes = []
         self._counters = {"projects": 0, "project_rooms": 0, "room_objects": 0}
         for table_name, rows in self.db.items():
             self._counters[table_name] = len(rows)
@@ -151,14 +237,26 @@ class FakeSupabase:
     def table(self, table_name):
         return FakeTable(self, table_name)
 
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        handler = self.rpc_handlers.get(name)
+
+        class _Call:
+            def execute(_self):
+                if handler is None:
+                    raise RuntimeError(f"PGRST202: Could not find the function public.{name}")
+                return FakeResult(handler(params))
+
+        return _Call()
+
     def next_id(self, table_name):
-        self._counters[table_name] += 1
+        self._counters[table_name] = self._counters.get(table_name, 0) + 1
         prefixes = {
             "projects": "project",
             "project_rooms": "room",
             "room_objects": "object",
         }
-        return f"{prefixes[table_name]}-{self._counters[table_name]}"
+        return f"{prefixes.get(table_name, table_name)}-{self._counters[table_name]}"
 
 
 def _install_test_context(monkeypatch, fake_sb):
@@ -203,6 +301,83 @@ def test_create_project_normalizes_and_dedupes_room_names(monkeypatch):
     assert [row["name"] for row in fake_sb.db["project_rooms"]] == ["Living Room", "Kitchen"]
 
 
+def test_create_project_uses_single_rpc_with_expanded_template(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.rpc_handlers["create_legacy_project"] = lambda params: {"project_id": "project-9"}
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_create_project_rpc_available", True)
+
+    pm.create_project(
+        "Hill Villa",
+        rooms=["Kitchen", "Bedroom 2"],
+        template_map={"Kitchen": [{"name": "Sink", "qty": "2"}], "Bedroom": ["Bed"]},
+    )
+
+    assert fake_st.errors == []
+    assert fake_st.session_state.current_project_id == "project-9"
+    assert fake_sb.selects == []
+    assert fake_sb.rpc_calls == [
+        (
+            "create_legacy_project",
+            {
+                "p_name": "Hill Villa",
+                "p_owner_id": "user-1",
+                "p_rooms": [
+                    {
+                        "name": "Kitchen",
+                        "objects": [{"object_key": "sink", "object_name": "Sink", "category": "General", "qty": 2}],
+                    },
+                    {
+                        "name": "Bedroom 2",
+                        "objects": [{"object_key": "bed", "object_name": "Bed", "category": "General", "qty": 1}],
+                    },
+                ],
+            },
+        )
+    ]
+
+
+def test_create_project_rpc_reports_duplicate_name_and_missing_rpc_falls_back(monkeypatch):
+    fake_sb = FakeSupabase()
+
+    def _taken(_params):
+        raise RuntimeError("project_name_exists")
+
+    fake_sb.rpc_handlers["create_legacy_project"] = _taken
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_create_project_rpc_available", True)
+
+    pm.create_project("Villa", rooms=["Kitchen"], template_map={"Kitchen": []})
+
+    assert fake_st.warnings == ["⚠️ Project 'Villa' already exists."]
+    assert fake_st.errors == []
+
+    del fake_sb.rpc_handlers["create_legacy_project"]
+    pm.create_project("Villa", rooms=["Kitchen"], template_map={"Kitchen": []})
+
+    assert pm._create_project_rpc_available is False
+    assert [row["name"] for row in fake_sb.db["projects"]] == ["Villa"]
+    assert [row["name"] for row in fake_sb.db["project_rooms"]] == ["Kitchen"]
+
+
+def test_create_project_rpc_errors_inside_the_function_do_not_disable_it(monkeypatch):
+    fake_sb = FakeSupabase()
+
+    def _broken(_params):
+        raise RuntimeError('42P01: relation "public.room_objects" does not exist')
+
+    fake_sb.rpc_handlers["create_legacy_project"] = _broken
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_create_project_rpc_available", True)
+
+    pm.create_project("Villa", rooms=["Kitchen"], template_map={"Kitchen": []})
+
+    assert pm._create_project_rpc_available is True
+    assert fake_st.errors
+    assert fake_sb.db["projects"] == []
+    assert supabase_client.is_missing_rpc_error(RuntimeError("42883: function public.create_legacy_project(text) does not exist"))
+
+
 def test_duplicate_project_without_materials_resets_assignments(monkeypatch):
     fake_sb = FakeSupabase(
         projects=[
@@ -342,6 +517,56 @@ def test_duplicate_project_bulk_creates_requested_count(monkeypatch):
     assert all(row.get("status") == "selected" for row in duplicated_objects)
 
 
+def test_duplicate_project_bulk_uses_one_clone_rpc_for_all_copies(monkeypatch):
+    fake_sb = FakeSupabase(
+        projects=[
+            {"id": "project-1", "name": "Master Villa", "owner_id": "user-1", "cart": []},
+            {"id": "project-2", "name": "Master Villa (Copy)", "owner_id": "user-1", "cart": []},
+        ],
+    )
+    fake_sb.rpc_handlers["clone_legacy_project"] = lambda params: [
+        {"project_id": f"clone-{idx}", "name": name} for idx, name in enumerate(params["p_names"], start=1)
+    ]
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_clone_project_rpc_available", True)
+
+    new_ids = pm.duplicate_project_bulk("project-1", copies_count=2, include_materials=True)
+
+    assert new_ids == ["clone-1", "clone-2"]
+    assert fake_sb.rpc_calls == [
+        (
+            "clone_legacy_project",
+            {
+                "p_source_project_id": "project-1",
+                "p_names": ["Master Villa (Copy 2)", "Master Villa (Copy 3)"],
+                "p_include_materials": True,
+            },
+        )
+    ]
+    assert len(fake_sb.selects) == 2
+    assert fake_st.errors == []
+
+
+def test_duplicate_project_clone_rpc_failure_creates_nothing(monkeypatch):
+    fake_sb = FakeSupabase(
+        projects=[{"id": "project-1", "name": "Master Villa", "owner_id": "user-1", "cart": []}],
+    )
+
+    def _fail(_params):
+        raise RuntimeError("insert or update on table room_objects violates foreign key constraint")
+
+    fake_sb.rpc_handlers["clone_legacy_project"] = _fail
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_clone_project_rpc_available", True)
+
+    assert pm.duplicate_project("project-1") is None
+    assert pm.duplicate_project_bulk("project-1", copies_count=2) == []
+
+    assert pm._clone_project_rpc_available is True
+    assert [row["id"] for row in fake_sb.db["projects"]] == ["project-1"]
+    assert len(fake_st.errors) == 2
+
+
 def test_duplicate_project_bulk_rejects_non_positive_count(monkeypatch):
     fake_sb = FakeSupabase(projects=[{"id": "project-1", "name": "Master Villa", "owner_id": "user-1", "cart": []}])
     fake_st = _install_test_context(monkeypatch, fake_sb)
@@ -391,6 +616,66 @@ def test_duplicate_project_rolls_back_incomplete_clone(monkeypatch):
     assert fake_st.errors
 
 
+def test_load_project_summaries_skip_cart_and_load_project_fetches_one_row(monkeypatch):
+    big_cart = {"design_brief": {"mood_images": ["data:image/jpeg;base64," + "A" * 50_000]}, "items": []}
+    fake_sb = FakeSupabase(
+        projects=[
+            {"id": "project-1", "name": "Old", "owner_id": "user-1", "updated_at": "2026-01-01", "cart": big_cart},
+            {"id": "project-2", "name": "New", "owner_id": "user-1", "updated_at": "2026-02-01", "cart": big_cart},
+            {"id": "project-3", "name": "Other", "owner_id": "user-2", "updated_at": "2026-03-01", "cart": []},
+        ]
+    )
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_project_summary_view_available", True)
+
+    summaries = pm.load_project_summaries()
+
+    assert [row["id"] for row in summaries] == ["project-2", "project-1"]
+    assert all("cart" not in row for row in summaries)
+    # The view is missing in this fake, so later calls go straight to the base table.
+    assert fake_sb.selects == [("project_summaries", "*"), ("projects", pm.PROJECT_SUMMARY_COLUMNS)]
+    pm.load_project_summaries()
+    assert fake_sb.selects[-1] == ("projects", pm.PROJECT_SUMMARY_COLUMNS)
+
+    assert pm.load_project("project-1")["cart"] == big_cart
+    assert pm.load_project("project-3") is None
+
+
+def test_load_project_summaries_prefers_summary_view(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.db["project_summaries"] = [
+        {"id": "project-1", "owner_id": "user-1", "name": "Villa", "room_count": 3, "object_count": 12}
+    ]
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_project_summary_view_available", True)
+
+    summaries = pm.load_project_summaries()
+
+    assert summaries[0]["room_count"] == 3
+    assert fake_sb.selects == [("project_summaries", "*")]
+
+
+def test_load_project_summaries_keeps_the_view_after_other_errors(monkeypatch):
+    fake_sb = FakeSupabase(projects=[{"id": "project-1", "name": "Villa", "owner_id": "user-1", "cart": []}])
+    fake_sb.db["project_summaries"] = [{"id": "project-1", "owner_id": "user-1", "name": "Villa", "room_count": 3}]
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_project_summary_view_available", True)
+    original_table = fake_sb.table
+
+    def _table(name):
+        if name == "project_summaries":
+            raise RuntimeError("57014: canceling statement due to statement timeout")
+        return original_table(name)
+
+    monkeypatch.setattr(fake_sb, "table", _table)
+
+    assert [row["id"] for row in pm.load_project_summaries()] == ["project-1"]
+    assert pm._project_summary_view_available is True
+
+    monkeypatch.setattr(fake_sb, "table", original_table)
+    assert pm.load_project_summaries()[0]["room_count"] == 3
+
+
 def test_load_project_rooms_backfills_legacy_rooms_when_project_rows_are_empty(monkeypatch):
     fake_sb = FakeSupabase(
         projects=[
@@ -457,6 +742,9 @@ class ShareLookupSupabase:
         assert table_name == "projects"
         return ShareLookupTable(self._rows)
 
+    def rpc(self, name, _params):
+        raise RuntimeError(f"PGRST202: Could not find the function public.{name}")
+
 
 def test_get_project_share_from_row_coerces_enabled_variants():
     row_true = {"cart": {"share": {"token": "abc", "enabled": "true"}}}
@@ -523,9 +811,585 @@ def test_prune_project_cart_object_metadata_removes_order_stage(monkeypatch):
 
     monkeypatch.setattr(pm, "_project_cart_items_and_meta", fake_cart_items_and_meta)
     monkeypatch.setattr(pm, "_save_project_cart", fake_save_project_cart)
+    _install_test_context(monkeypatch, FakeSupabase(missing_columns={"cart_revision"}))
 
     pm._prune_project_cart_object_metadata("project-1", ["obj-1"])
 
     procurement = captured["payload"]["procurement"]
     assert procurement["order_stage"] == {"obj-2": "final_install"}
     assert procurement["notes"] == {"obj-2": "y"}
+
+
+def test_delete_room_prunes_cart_on_database_without_cart_revision(monkeypatch):
+    cart = {
+        "items": [{"object_id": "object-1", "name": "Sink"}, {"object_id": "object-9", "name": "Lamp"}],
+        "assignment_notes": {"object-1": "matte", "object-9": "warm"},
+    }
+    fake_sb = FakeSupabase(
+        projects=[{"id": "project-1", "name": "Villa", "owner_id": "user-1", "cart": cart}],
+        project_rooms=[{"id": "room-1", "project_id": "project-1", "name": "Bath"}],
+        room_objects=[{"id": "object-1", "room_id": "room-1"}],
+        missing_columns={"cart_revision"},
+    )
+    _install_test_context(monkeypatch, fake_sb)
+
+    assert pm.delete_project_room("project-1", "room-1")
+
+    saved = fake_sb.db["projects"][0]["cart"]
+    assert saved["items"] == [{"object_id": "object-9", "name": "Lamp"}]
+    assert saved["assignment_notes"] == {"object-9": "warm"}
+    assert pm._cart_patch_rpc_available is False
+
+
+def test_object_comments_append_one_row_and_read_in_one_query(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.db["object_comments"] = [
+        {"project_id": "project-1", "object_id": "object-2", "author_role": "client", "author_name": "Ann",
+         "comment": "Too dark", "created_at": "2026-10-02T00:00:00+00:00"},
+    ]
+    fake_sb.db["object_approval_events"] = []
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_object_activity_tables_available", True)
+    monkeypatch.setattr(pm, "_project_cart_items_and_meta", lambda _pid: pytest.fail("cart must not be read"))
+
+    assert pm.append_object_comment("project-1", "object-1", "designer", "Dee", "  Swap finish ")
+    assert pm._append_object_approval_event("project-1", "object-1", "approved", "client", "Ann")
+
+    inserted = {key: value for key, value in fake_sb.db["object_comments"][-1].items() if key != "id"}
+    assert inserted == {
+        "project_id": "project-1",
+        "object_id": "object-1",
+        "author_role": "designer",
+        "author_name": "Dee",
+        "comment": "Swap finish",
+    }
+    assert fake_sb.db["object_approval_events"][0]["action"] == "approved"
+    assert fake_st.errors == []
+
+    legacy = {"author_role": "client", "author_name": "Old", "comment": "Legacy", "created_at": "2026-10-01T00:00:00+00:00"}
+    project_row = {"id": "project-1", "cart": {"items": [], "comments": {"object-2": [legacy]}}}
+    activity = {}
+    comments = pm.get_object_comments_from_row(project_row, "object-2", activity)
+    assert comments == [
+        legacy,
+        {"author_role": "client", "author_name": "Ann", "comment": "Too dark", "created_at": "2026-10-02T00:00:00+00:00"},
+    ]
+    assert [c["comment"] for c in pm.get_object_comments_from_row(project_row, "object-1", activity)] == ["Swap finish"]
+    assert pm.get_object_comments_from_row(project_row, "object-9", activity) == []
+    assert fake_sb.selects == [("object_comments", "object_id,author_role,author_name,comment,created_at")]
+    assert set(project_row) == {"id", "cart"}
+
+
+def test_object_activity_reads_retry_after_transient_errors(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.db["object_comments"] = [
+        {"project_id": "project-1", "object_id": "object-1", "author_name": "Ann", "comment": "Hi",
+         "created_at": "2026-10-02T00:00:00+00:00"},
+    ]
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_object_activity_tables_available", True)
+    project_row = {"id": "project-1", "cart": {"items": []}}
+    activity = {}
+    real_select_rows = FakeTable._select_rows
+
+    def timeout(_self):
+        raise RuntimeError('57014: canceling statement due to statement timeout on "object_comments" (does not exist)')
+
+    monkeypatch.setattr(FakeTable, "_select_rows", timeout)
+    assert pm.get_object_comments_from_row(project_row, "object-1", activity) == []
+    assert activity == {}
+    assert pm._object_activity_tables_available is True
+
+    monkeypatch.setattr(FakeTable, "_select_rows", real_select_rows)
+    assert [c["comment"] for c in pm.get_object_comments_from_row(project_row, "object-1", activity)] == ["Hi"]
+    assert "comments" in activity
+
+
+def test_missing_table_check_matches_only_missing_relations():
+    assert supabase_client.is_missing_table_error(
+        RuntimeError("PGRST205: Could not find the table 'public.object_comments' in the schema cache")
+    )
+    assert supabase_client.is_missing_table_error(RuntimeError('42P01: relation "public.project_summaries" does not exist'))
+    assert not supabase_client.is_missing_table_error(RuntimeError("42703: column projects.cart_revision does not exist"))
+    assert not supabase_client.is_missing_table_error(RuntimeError('42704: type "vector" does not exist'))
+
+
+def test_object_comments_fall_back_to_cart_before_migration(monkeypatch):
+    fake_sb = FakeSupabase()
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_object_activity_tables_available", True)
+    captured = {}
+    monkeypatch.setattr(pm, "_project_cart_items_and_meta", lambda _pid: ([], {"items": []}))
+    monkeypatch.setattr(pm, "_save_project_cart", lambda _pid, payload: captured.update(payload))
+
+    assert pm.append_object_comment("project-1", "object-1", "designer", "Dee", "Hello")
+
+    assert pm._object_activity_tables_available is False
+    assert captured["comments"]["object-1"][0]["comment"] == "Hello"
+    row = {"id": "project-1", "cart": captured}
+    assert pm.get_object_comments_from_row(row, "object-1")[0]["author_name"] == "Dee"
+    assert fake_sb.selects == []
+
+
+def test_update_room_status_by_share_token_batches_updates_and_events(monkeypatch):
+    def _obj(idx, status, material_id="mat-1"):
+        return {"id": f"object-{idx}", "room_id": "room-1", "status": status, "material_id": material_id}
+
+    fake_sb = FakeSupabase(
+        project_rooms=[{"id": "room-1", "project_id": "project-1", "name": "Kitchen"}],
+        room_objects=[
+            _obj(1, "selected"),
+            _obj(2, "selected"),
+            _obj(3, "client_approved"),
+            _obj(4, "unassigned", material_id=None),
+            {"id": "object-5", "room_id": "room-2", "status": "selected", "material_id": "mat-1"},
+        ],
+    )
+    fake_sb.db["object_approval_events"] = []
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_object_activity_tables_available", True)
+    monkeypatch.setattr(pm, "get_shared_project_by_token", lambda _token: {"id": "project-1"})
+
+    ok, message, outcomes = pm.update_room_status_by_share_token_detailed("tok", "room-1", True, actor_name="Ann")
+
+    assert (ok, message) == (True, "2 object(s) approved.")
+    assert outcomes == {
+        "object-1": "approved",
+        "object-2": "approved",
+        "object-3": "unchanged",
+        "object-4": "no_material",
+    }
+    assert fake_sb.writes == [("room_objects", "update"), ("object_approval_events", "insert")]
+    statuses = {row["id"]: row["status"] for row in fake_sb.db["room_objects"]}
+    assert statuses == {
+        "object-1": "client_approved",
+        "object-2": "client_approved",
+        "object-3": "client_approved",
+        "object-4": "unassigned",
+        "object-5": "selected",
+    }
+    events = fake_sb.db["object_approval_events"]
+    assert [(row["object_id"], row["action"], row["actor_name"]) for row in events] == [
+        ("object-1", "approved", "Ann"),
+        ("object-2", "approved", "Ann"),
+    ]
+
+    assert pm.update_room_status_by_share_token("tok", "room-1", False) == (True, "3 object(s) reset.")
+    assert {row["status"] for row in fake_sb.db["room_objects"][:3]} == {"selected"}
+
+
+def test_update_room_status_by_share_token_fails_only_the_chunk_that_failed(monkeypatch):
+    fake_sb = FakeSupabase(
+        project_rooms=[{"id": "room-1", "project_id": "project-1", "name": "Kitchen"}],
+        room_objects=[
+            {"id": f"object-{idx}", "room_id": "room-1", "status": "selected", "material_id": "mat-1"}
+            for idx in range(1, 6)
+        ],
+    )
+    fake_sb.db["object_approval_events"] = []
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_object_activity_tables_available", True)
+    monkeypatch.setattr(pm, "get_shared_project_by_token", lambda _token: {"id": "project-1"})
+    monkeypatch.setattr(supabase_client, "IN_FILTER_CHUNK_SIZE", 2)
+
+    original_update = FakeTable._update_rows
+
+    def _update_rows(self):
+        if any("object-3" in values for _key, values in self.in_filters):
+            raise RuntimeError("statement timeout")
+        return original_update(self)
+
+    monkeypatch.setattr(FakeTable, "_update_rows", _update_rows)
+
+    ok, message, outcomes = pm.update_room_status_by_share_token_detailed("tok", "room-1", True)
+
+    assert (ok, message) == (False, "3 object(s) approved, 2 could not be updated.")
+    assert outcomes == {
+        "object-1": "approved",
+        "object-2": "approved",
+        "object-3": "failed",
+        "object-4": "failed",
+        "object-5": "approved",
+    }
+    assert [row["object_id"] for row in fake_sb.db["object_approval_events"]] == ["object-1", "object-2", "object-5"]
+
+
+def test_shared_project_resolves_through_token_index_and_cache(monkeypatch):
+    share = {"token": "tok-1", "enabled": True}
+    project = {"id": "project-1", "name": "Villa", "cart": {"items": [], "share": share}}
+    fake_sb = FakeSupabase(projects=[project])
+    token_rows = {pm._share_token_hash("tok-1"): project}
+    fake_sb.rpc_handlers["get_project_by_share_token_hash"] = lambda params: (
+        [dict(token_rows[params["p_token_hash"]])] if params["p_token_hash"] in token_rows else []
+    )
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_share_token_index_available", True)
+
+    assert pm.get_shared_project_by_token("tok-1")["id"] == "project-1"
+    assert pm.get_shared_project_by_token("nope") is None
+    assert [name for name, _params in fake_sb.rpc_calls] == ["get_project_by_share_token_hash"] * 2
+
+    # Cached: mutations resolve the id without a request, page loads fetch by primary key.
+    assert pm._shared_project_id_by_token("tok-1") == "project-1"
+    assert pm._shared_project_id_by_token("nope") is None
+    assert pm.get_shared_project_by_token("tok-1")["id"] == "project-1"
+    assert len(fake_sb.rpc_calls) == 2
+    assert fake_sb.selects == [("projects", "*")]
+
+
+def test_share_token_changes_update_index_and_drop_cached_tokens(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.db["project_share_tokens"] = []
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_share_token_index_available", True)
+    cart = {"items": []}
+    monkeypatch.setattr(pm, "_project_cart_items_and_meta", lambda _pid: ([], dict(cart)))
+    monkeypatch.setattr(pm, "_save_project_cart", lambda _pid, payload: cart.update(payload))
+    pm._share_token_cache["stale"] = (float("inf"), "project-1")
+
+    token = pm.rotate_project_share_token("project-1")
+
+    assert "stale" not in pm._share_token_cache
+    assert fake_sb.db["project_share_tokens"] == [
+        {
+            "project_id": "project-1",
+            "token_hash": pm._share_token_hash(token),
+            "enabled": True,
+            "created_at": cart["share"]["created_at"],
+        }
+    ]
+
+    assert pm.set_project_share_enabled("project-1", False)
+    assert fake_sb.db["project_share_tokens"][0]["enabled"] is False
+    assert cart["share"]["enabled"] is False
+
+
+def test_share_token_rotation_writes_the_index_before_the_cart(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.rpc_handlers["patch_project_cart"] = lambda params: pytest.fail("cart must not be patched")
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_share_token_index_available", True)
+
+    def failing_upsert(*_args, **_kwargs):
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(FakeTable, "upsert", failing_upsert)
+
+    assert pm.rotate_project_share_token("project-1") is None
+    assert fake_sb.rpc_calls == []
+    assert "network down" in fake_st.errors[0]
+
+
+def test_share_token_cache_is_bounded_and_drops_expired_entries(monkeypatch):
+    monkeypatch.setattr(pm, "SHARE_TOKEN_CACHE_SIZE", 3)
+    pm._share_token_cache["expired"] = (0.0, "project-0")
+    for token in ("tok-1", "tok-2", "tok-3", "tok-4"):
+        pm._remember_share_token(pm._share_token_hash(token), None)
+
+    hashes = {pm._share_token_hash(token): token for token in ("tok-1", "tok-2", "tok-3", "tok-4", "tok-5")}
+    assert [hashes[key] for key in pm._share_token_cache] == ["tok-2", "tok-3", "tok-4"]
+
+    # A hit keeps the token; the least recently used one is evicted next.
+    assert pm._cached_shared_project_id("tok-2") == (True, None)
+    pm._remember_share_token(pm._share_token_hash("tok-5"), "project-5")
+    assert [hashes[key] for key in pm._share_token_cache] == ["tok-4", "tok-2", "tok-5"]
+
+
+def _status_view_rows(db):
+    """Run the status count views from the migration over `db` with SQLite."""
+    sql = (Path(__file__).resolve().parents[1] / "db/migrations/20261018_add_status_count_views.sql").read_text()
+    views = dict(
+        re.findall(
+            r"create or replace view public\.(\w+)\s+with \(security_invoker = true\)\s+as\s+(select.*?)\$view\$",
+            sql,
+            flags=re.S,
+        )
+    )
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("attach database ':memory:' as public")
+    conn.execute("create table public.projects (id text)")
+    conn.execute("create table public.project_rooms (id text, project_id text)")
+    conn.execute("create table public.room_objects (id text, room_id text, material_id text, status text)")
+    conn.executemany("insert into public.projects values (?)", [(row["id"],) for row in db["projects"]])
+    conn.executemany(
+        "insert into public.project_rooms values (?, ?)", [(row["id"], row["project_id"]) for row in db["project_rooms"]]
+    )
+    conn.executemany(
+        "insert into public.room_objects values (?, ?, ?, ?)",
+        [(row["id"], row["room_id"], row.get("material_id"), row.get("status")) for row in db["room_objects"]],
+    )
+    return {name: [dict(row) for row in conn.execute(query)] for name, query in views.items()}
+
+
+def test_status_count_views_match_python_fallback(monkeypatch):
+    def _obj(idx, room_id, status, material_id=None):
+        return {"id": f"object-{idx}", "room_id": room_id, "status": status, "material_id": material_id}
+
+    fake_sb = FakeSupabase(
+        projects=[{"id": "project-1"}, {"id": "project-2"}, {"id": "project-3"}],
+        project_rooms=[
+            {"id": "room-1", "project_id": "project-1", "name": "Kitchen"},
+            {"id": "room-2", "project_id": "project-1", "name": "Empty"},
+            {"id": "room-3", "project_id": "project-3", "name": "Bath"},
+        ],
+        room_objects=[
+            _obj(1, "room-1", "unassigned"),
+            _obj(2, "room-1", "selected", "mat-1"),
+            _obj(3, "room-1", "designer_approved", "mat-2"),
+            _obj(4, "room-1", "client_approved", "mat-3"),
+            _obj(5, "room-3", "client_approved", "mat-1"),
+        ],
+    )
+    _install_test_context(monkeypatch, fake_sb)
+    project_ids = ["project-1", "project-2", "project-missing"]
+    room_ids = ["room-1", "room-2", "room-3", "room-missing"]
+
+    monkeypatch.setattr(pm, "_status_views_available", False)
+    fallback_projects = pm.load_projects_statuses(project_ids)
+    fallback_rooms = pm.load_room_statuses(room_ids)
+
+    view_rows = _status_view_rows(fake_sb.db)
+    assert set(view_rows) == {"room_status_counts", "project_status_counts"}
+    fake_sb.db.update(view_rows)
+    fake_sb.selects.clear()
+    monkeypatch.setattr(pm, "_status_views_available", True)
+    view_projects = pm.load_projects_statuses(project_ids)
+    view_rooms = pm.load_room_statuses(room_ids)
+
+    assert view_projects == fallback_projects
+    assert view_rooms == fallback_rooms
+    assert view_projects["project-1"] == {"rooms": 2, "total": 4, "assigned": 3, "designer_ok": 1, "client_ok": 1}
+    assert [table for table, _columns in fake_sb.selects] == ["project_status_counts", "room_status_counts"]
+    assert pm._status_views_available is True
+
+
+def test_status_view_errors_other_than_missing_view_keep_the_view_enabled(monkeypatch):
+    fake_sb = FakeSupabase(
+        project_rooms=[{"id": "room-1", "project_id": "project-1", "name": "Kitchen"}],
+        room_objects=[{"id": "object-1", "room_id": "room-1", "status": "selected", "material_id": "mat-1"}],
+    )
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_status_views_available", True)
+    original_table = fake_sb.table
+
+    def _table(name):
+        if name == "room_status_counts":
+            raise RuntimeError("42501: permission denied for view room_status_counts")
+        return original_table(name)
+
+    monkeypatch.setattr(fake_sb, "table", _table)
+
+    statuses = pm.load_room_statuses(["room-1"])
+
+    assert statuses["room-1"] == {"total": 1, "assigned": 1, "designer_ok": 0, "client_ok": 0}
+    assert pm._status_views_available is True
+
+    monkeypatch.setattr(fake_sb, "table", original_table)
+    pm.load_room_statuses(["room-1"])
+    assert pm._status_views_available is False
+
+
+def test_load_room_objects_batch_fetches_in_chunks(monkeypatch):
+    fake_sb = FakeSupabase(
+        room_objects=[{"id": f"object-{idx}", "room_id": f"room-{idx % 5}"} for idx in range(10)],
+    )
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(supabase_client, "IN_FILTER_CHUNK_SIZE", 2)
+
+    by_room = pm.load_room_objects_batch([f"room-{idx}" for idx in range(5)])
+
+    assert {room_id: len(rows) for room_id, rows in by_room.items()} == {f"room-{idx}": 2 for idx in range(5)}
+    assert fake_sb.selects == [("room_objects", "*")] * 3
+
+
+def test_apply_cart_patch_sets_deletes_and_appends_paths():
+    cart = [{"object_id": "object-1"}]
+    ops = [
+        pm.cart_set(["share", "enabled"], True),
+        pm.cart_append(["comments", "object-1"], {"comment": "Hi"}),
+        pm.cart_append(["comments", "object-1"], {"comment": "Again"}),
+        pm.cart_delete(["procurement", "notes", "object-9"]),
+        pm.cart_set(["budget"], {"project": 10.0, "rooms": {}}),
+    ]
+
+    patched = pm.apply_cart_patch(cart, ops)
+
+    assert patched == {
+        "items": [{"object_id": "object-1"}],
+        "share": {"enabled": True},
+        "comments": {"object-1": [{"comment": "Hi"}, {"comment": "Again"}]},
+        "budget": {"project": 10.0, "rooms": {}},
+    }
+    assert cart == [{"object_id": "object-1"}]
+    assert pm.apply_cart_patch(patched, [pm.cart_delete(["share"])]).get("share") is None
+
+
+def test_cart_mutators_send_one_patch_instead_of_rewriting_cart(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.rpc_handlers["patch_project_cart"] = lambda params: 4
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_project_cart_items_and_meta", lambda _pid: pytest.fail("cart must not be read"))
+
+    pm.update_current_cart("project-1", [{"object_id": "object-1"}])
+    assert pm.save_project_budget("project-1", 100, {"Kitchen": 40})
+    assert pm.set_project_share_enabled("project-1", False)
+
+    assert [params["p_ops"] for _name, params in fake_sb.rpc_calls] == [
+        [{"op": "set", "path": ["items"], "value": [{"object_id": "object-1"}]}],
+        [{"op": "set", "path": ["budget"], "value": {"project": 100.0, "rooms": {"Kitchen": 40.0}}}],
+        [{"op": "set", "path": ["share", "enabled"], "value": False}],
+    ]
+    assert all(params["p_expected_revision"] is None for _name, params in fake_sb.rpc_calls)
+    assert fake_sb.selects == []
+
+
+def test_whole_block_cart_writes_report_stale_revisions(monkeypatch):
+    fake_sb = FakeSupabase()
+
+    def _patch(params):
+        if params["p_expected_revision"] is not None and params["p_expected_revision"] != 5:
+            raise RuntimeError("cart_revision_conflict")
+        return 6
+
+    fake_sb.rpc_handlers["patch_project_cart"] = _patch
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+
+    assert not pm.save_project_budget("project-1", 100, {}, expected_revision=4)
+    assert not pm.update_current_cart("project-1", [], expected_revision=4)
+    assert len(fake_st.errors) == 2
+    assert pm.save_project_budget("project-1", 100, {}, expected_revision=5)
+    assert pm.append_cart_item("project-1", {"name": "Lamp"})
+
+    assert fake_sb.rpc_calls[-1][1]["p_ops"] == [{"op": "append", "path": ["items"], "value": {"name": "Lamp"}}]
+
+
+def test_prune_cart_metadata_retries_on_revision_conflict(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.db["projects"] = [
+        {
+            "id": "project-1",
+            "cart_revision": 7,
+            "cart": {"items": [], "assignment_notes": {"obj-1": "why", "obj-2": "keep"}},
+        }
+    ]
+    attempts = []
+
+    def _patch(params):
+        attempts.append(params)
+        if len(attempts) == 1:
+            raise RuntimeError("cart_revision_conflict")
+        return 9
+
+    fake_sb.rpc_handlers["patch_project_cart"] = _patch
+    _install_test_context(monkeypatch, fake_sb)
+
+    pm._prune_project_cart_object_metadata("project-1", ["obj-1"])
+
+    assert len(attempts) == 2
+    assert attempts[-1]["p_expected_revision"] == 7
+    assert attempts[-1]["p_ops"] == [{"op": "delete", "path": ["assignment_notes", "obj-1"]}]
+
+
+def test_patch_project_cart_falls_back_to_cart_rewrite_before_migration(monkeypatch):
+    fake_sb = FakeSupabase()
+    _install_test_context(monkeypatch, fake_sb)
+    cart = {"items": [{"object_id": "object-1"}], "share": {"token": "tok-1", "enabled": True}}
+    saved = {}
+    monkeypatch.setattr(pm, "_project_cart_items_and_meta", lambda _pid: (cart["items"], dict(cart)))
+    monkeypatch.setattr(pm, "_save_project_cart", lambda _pid, payload: saved.update(payload))
+
+    revision = pm.patch_project_cart("project-1", [pm.cart_set(["share", "enabled"], False)])
+
+    assert revision is None
+    assert pm._cart_patch_rpc_available is False
+    assert saved == {"items": [{"object_id": "object-1"}], "share": {"token": "tok-1", "enabled": False}}
+
+
+def test_room_mutators_send_only_their_own_write(monkeypatch):
+    fake_sb = FakeSupabase(
+        projects=[{"id": "project-1", "name": "Villa", "cart": {"items": []}}],
+        project_rooms=[{"id": "room-1", "project_id": "project-1", "name": "Kitchen"}],
+    )
+    fake_sb.rpc_handlers["project_touch_triggers_enabled"] = lambda params: True
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_normalize_template_map", lambda _template: {})
+
+    assert pm.rename_project_room("project-1", "room-1", "Galley")
+    assert fake_sb.writes == [("project_rooms", "update")]
+    assert fake_sb.rpc_calls == [("project_touch_triggers_enabled", {})]
+
+    fake_sb.writes.clear()
+    assert pm.add_project_room("project-1", "Study", template_map={})
+    assert fake_sb.writes == [("project_rooms", "insert")]
+
+    fake_sb.writes.clear()
+    fake_sb.rpc_calls.clear()
+    fake_sb.rpc_handlers["delete_legacy_project_room"] = lambda params: True
+    assert pm.delete_project_room("project-1", "room-1")
+    assert fake_sb.writes == []
+    assert fake_sb.rpc_calls == [
+        ("delete_legacy_project_room", {"p_project_id": "project-1", "p_room_id": "room-1"})
+    ]
+
+
+def test_room_mutators_touch_project_without_triggers(monkeypatch):
+    fake_sb = FakeSupabase(
+        projects=[{"id": "project-1", "name": "Villa", "cart": {"items": []}}],
+        project_rooms=[{"id": "room-1", "project_id": "project-1", "name": "Kitchen"}],
+    )
+    _install_test_context(monkeypatch, fake_sb)
+    monkeypatch.setattr(pm, "_normalize_template_map", lambda _template: {})
+
+    assert pm.rename_project_room("project-1", "room-1", "Galley")
+    assert pm.add_project_room("project-1", "Study", template_map={})
+
+    assert pm._project_touch_triggers_available is False
+    assert fake_sb.writes == [
+        ("project_rooms", "update"),
+        ("projects", "update"),
+        ("project_rooms", "insert"),
+        ("projects", "update"),
+    ]
+    assert fake_sb.db["projects"][0]["updated_at"] == "now()"
+    assert [name for name, _params in fake_sb.rpc_calls] == ["project_touch_triggers_enabled"]
+
+
+def test_delete_project_is_one_cascade_call(monkeypatch):
+    fake_sb = FakeSupabase()
+    fake_sb.rpc_handlers["delete_legacy_project"] = lambda params: params["p_project_id"] == "project-1"
+    fake_st = _install_test_context(monkeypatch, fake_sb)
+
+    assert pm.delete_project("project-1")
+    assert not pm.delete_project("project-2")
+
+    assert fake_sb.rpc_calls == [
+        ("delete_legacy_project", {"p_project_id": "project-1", "p_owner_id": "user-1"}),
+        ("delete_legacy_project", {"p_project_id": "project-2", "p_owner_id": "user-1"}),
+    ]
+    assert fake_sb.selects == []
+    assert fake_sb.writes == []
+    assert fake_st.errors == ["Project not found."]
+
+
+def test_delete_project_falls_back_to_row_deletes_before_migration(monkeypatch):
+    fake_sb = FakeSupabase(
+        projects=[{"id": "project-1", "owner_id": "user-1", "name": "Villa"}],
+        project_rooms=[
+            {"id": "room-1", "project_id": "project-1", "name": "Kitchen"},
+            {"id": "room-2", "project_id": "project-1", "name": "Bath"},
+        ],
+        room_objects=[
+            {"id": "object-1", "room_id": "room-1"},
+            {"id": "object-2", "room_id": "room-2"},
+        ],
+    )
+    _install_test_context(monkeypatch, fake_sb)
+
+    assert pm.delete_project("project-1")
+    pm.delete_project_room("project-1", "room-9")
+
+    assert pm._cascade_delete_rpc_available is False
+    assert [name for name, _params in fake_sb.rpc_calls] == ["delete_legacy_project"]
+    assert fake_sb.db == {"projects": [], "project_rooms": [], "room_objects": []}
+    assert fake_sb.writes == [("room_objects", "delete"), ("project_rooms", "delete"), ("projects", "delete")]
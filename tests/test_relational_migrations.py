@@ -90,3 +90,139 @@ def test_client_view_overview_migration_adds_publish_time_progress_and_budget_sn
     assert "'showhouseoverviews', v_client_view.show_house_overviews" in sql
     assert "'projectoverview', case when v_client_view.show_project_overview then v_client_view.project_overview else null end" in sql
     assert "'houseoverviews', case when v_client_view.show_house_overviews then v_client_view.house_overviews else '[]'::jsonb end" in sql
+
+
+def test_material_embedding_packed_migration_adds_checked_text_column():
+    sql = _read("db/migrations/20261018_add_material_embedding_packed.sql")
+
+    assert "add column if not exists embedding_packed text" in sql
+    assert "check (embedding_packed is null or embedding_packed ~ '^(f32|f16):[a-za-z0-9+/=]+$')" in sql
+
+
+def test_match_materials_migration_adds_hnsw_index_and_hybrid_rpc():
+    sql = _read("db/migrations/20261018_add_match_materials_vector_search.sql")
+
+    assert "create extension if not exists vector with schema extensions" in sql
+    assert "add column if not exists embedding_vector extensions.vector(384)" in sql
+    assert "create trigger trg_materials_sync_embedding_vector" in sql
+    assert "using hnsw (embedding_vector extensions.vector_cosine_ops)" in sql
+    assert "create or replace function public.match_materials(" in sql
+    assert "query_text text default null" in sql
+    assert "security invoker" in sql
+    assert "grant execute on function public.match_materials(extensions.vector, integer, text) to authenticated" in sql
+    assert "perform set_config('hnsw.ef_search', v_shortlist::text, true);" in sql
+    assert "generated always as (public.material_search_text(name, category, description, to_jsonb(tags))) stored" in sql
+    assert "using gin (search_text extensions.gin_trgm_ops)" in sql
+    assert "join public.materials m on m.search_text like k.pattern" in sql
+    assert "public.material_search_text(m." not in sql
+
+
+def test_project_summaries_migration_adds_invoker_view_without_cart():
+    sql = _read("db/migrations/20261018_add_project_summaries_view.sql")
+
+    assert "create or replace view public.project_summaries" in sql
+    assert "with (security_invoker = true)" in sql
+    assert "as room_count" in sql
+    assert "as object_count" in sql
+    assert "as cart_item_count" in sql
+    assert "p.cart," not in sql
+    assert "grant select on public.project_summaries to authenticated" in sql
+
+
+def test_create_legacy_project_migration_inserts_tree_in_one_function():
+    sql = _read("db/migrations/20261018_add_create_legacy_project_function.sql")
+
+    assert "create or replace function public.create_legacy_project(" in sql
+    assert "security invoker" in sql
+    assert "raise exception 'project_name_exists'" in sql
+    assert "insert into public.project_rooms (project_id, name)" in sql
+    assert "insert into public.room_objects (room_id, object_key, object_name, category, qty, status, material_id)" in sql
+    assert "grant execute on function public.create_legacy_project(text, uuid, jsonb) to authenticated" in sql
+
+
+def test_clone_legacy_project_migration_maps_room_ids_in_one_statement():
+    sql = _read("db/migrations/20261018_add_clone_legacy_project_function.sql")
+
+    assert "create or replace function public.clone_legacy_project(" in sql
+    assert "p_names text[]" in sql
+    assert "with room_map as materialized (" in sql
+    assert "gen_random_uuid() as target_room_id" in sql
+    assert "join room_map m on m.source_room_id = o.room_id" in sql
+    assert "case when p_include_materials then o.material_id end" in sql
+    assert "grant execute on function public.clone_legacy_project(uuid, text[], boolean) to authenticated" in sql
+
+
+def test_object_activity_migration_creates_tables_and_moves_cart_json():
+    sql = _read("db/migrations/20261018_add_object_activity_tables.sql")
+
+    assert "create table if not exists public.object_comments (" in sql
+    assert "create table if not exists public.object_approval_events (" in sql
+    assert "object_id uuid not null references public.room_objects(id) on delete cascade" in sql
+    assert "on public.object_comments (project_id, created_at)" in sql
+    assert "insert into public.object_comments (project_id, object_id, author_role, author_name, comment, created_at)" in sql
+    assert "set cart = (cart::jsonb - 'comments' - 'approval_history')" in sql
+    assert sql.count("join public.project_rooms pr on pr.id = ro.room_id") == 4
+    assert sql.count("and pr.project_id = object_comments.project_id") == 1
+    assert sql.count("and pr.project_id = object_approval_events.project_id") == 1
+    assert "join public.project_rooms pr on pr.id = ro.room_id and pr.project_id = p.id" in sql
+    assert "exception when data_exception then" in sql
+    assert "pg_temp.activity_created_at(c.value ->> 'created_at')" in sql
+    assert "pg_temp.activity_created_at(e.value ->> 'created_at')" in sql
+    assert "->> 'created_at')::timestamptz" not in sql
+
+
+def test_project_share_tokens_migration_indexes_hashed_tokens():
+    sql = _read("db/migrations/20261018_add_project_share_tokens.sql")
+
+    assert "create table if not exists public.project_share_tokens (" in sql
+    assert "token_hash text primary key" in sql
+    assert "project_id uuid not null unique references public.projects(id) on delete cascade" in sql
+    assert "create or replace function public.get_project_by_share_token_hash(p_token_hash text)" in sql
+    assert "and t.enabled" in sql
+    assert "encode(extensions.digest(p.cart::jsonb #>> '{share,token}', 'sha256'), 'hex')" in sql
+
+
+def test_status_count_views_migration_adds_invoker_views():
+    sql = _read("db/migrations/20261018_add_status_count_views.sql")
+
+    assert "create or replace view public.room_status_counts" in sql
+    assert "create or replace view public.project_status_counts" in sql
+    assert sql.count("with (security_invoker = true)") == 2
+    assert "grant select on public.project_status_counts to anon, authenticated" in sql
+    assert "grant select on public.room_status_counts to anon, authenticated" in sql
+    # The views read no owner column, so they do not wait for one to exist.
+    assert "owner_id" not in sql
+
+
+def test_project_cart_patch_migration_adds_revisioned_patch_function():
+    sql = _read("db/migrations/20261018_add_project_cart_patch_function.sql")
+
+    assert "add column if not exists cart_revision bigint not null default 0" in sql
+    assert "create or replace function public.patch_project_cart(" in sql
+    assert "for update;" in sql
+    assert "raise exception 'cart_revision_conflict' using errcode = '40001'" in sql
+    assert "v_cart := v_cart #- v_path;" in sql
+    assert "v_current || jsonb_build_array(" in sql
+    assert "cart_revision = v_revision + 1" in sql
+
+
+def test_project_touch_trigger_migration_bumps_parent_once_per_statement():
+    sql = _read("db/migrations/20261018_add_project_touch_triggers.sql")
+
+    assert "create or replace function public.touch_projects_from_rooms()" in sql
+    assert "create or replace function public.touch_projects_from_room_objects()" in sql
+    assert sql.count("for each statement execute function public.touch_projects_from_") == 6
+    assert "referencing old table as changed_rows" in sql
+    assert "join public.project_rooms pr on pr.id = o.room_id" in sql
+    assert "create or replace function public.project_touch_triggers_enabled()" in sql
+
+
+def test_project_cascade_delete_migration_adds_cascades_and_delete_functions():
+    sql = _read("db/migrations/20261018_add_project_cascade_deletes.sql")
+
+    assert "foreign key (project_id) references public.projects(id) on delete cascade not valid" in sql
+    assert "foreign key (room_id) references public.project_rooms(id) on delete cascade not valid" in sql
+    assert "create or replace function public.delete_legacy_project(" in sql
+    assert "create or replace function public.delete_legacy_project_room(" in sql
+    assert "(v_cart -> v_block) - v_keys" in sql
+    assert "cart_revision = cart_revision + 1" in sql
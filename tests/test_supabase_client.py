@@ -0,0 +1,170 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import supabase_client
+
+
+class HeaderRecordingClient:
+    def __init__(self):
+        self.postgrest = self
+        self.headers = {}
+
+    def auth(self, access_token):
+        self.headers["Authorization"] = f"Bearer {access_token}"
+
+
+@pytest.fixture
+def pooled_clients(monkeypatch):
+    created = []
+
+    def _create_client(_url, _key):
+        client = HeaderRecordingClient()
+        created.append(client)
+        return client
+
+    monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+    monkeypatch.setenv("SUPABASE_ANON_KEY", "anon-key")
+    monkeypatch.setattr(supabase_client, "create_client", _create_client)
+    supabase_client.clear_client_pool()
+    yield created
+    supabase_client.clear_client_pool()
+
+
+class RecordingQuery:
+    def __init__(self, calls, chunk):
+        self.calls = calls
+        self.chunk = chunk
+
+    def execute(self):
+        self.calls.append((list(self.chunk), threading.current_thread().name))
+        return type("Result", (), {"data": [{"id": value} for value in self.chunk]})()
+
+
+def test_execute_in_chunks_splits_dedupes_and_keeps_order():
+    calls = []
+
+    rows = supabase_client.execute_in_chunks(
+        lambda chunk: RecordingQuery(calls, chunk),
+        ["a", "b", "a", "c", "d", "e"],
+        chunk_size=2,
+        max_workers=3,
+    )
+
+    assert [row["id"] for row in rows] == ["a", "b", "c", "d", "e"]
+    assert sorted(chunk for chunk, _thread in calls) == [["a", "b"], ["c", "d"], ["e"]]
+    assert all(thread.startswith("supabase-in") for _chunk, thread in calls)
+
+
+def test_execute_in_chunks_runs_single_chunk_inline_and_skips_empty_values():
+    calls = []
+
+    assert supabase_client.execute_in_chunks(lambda chunk: RecordingQuery(calls, chunk), []) == []
+    assert calls == []
+
+    rows = supabase_client.execute_in_chunks(lambda chunk: RecordingQuery(calls, chunk), ["a", "b"], chunk_size=10)
+
+    assert rows == [{"id": "a"}, {"id": "b"}]
+    assert calls == [(["a", "b"], threading.current_thread().name)]
+
+
+def test_get_supabase_reuses_client_per_token_and_never_shares_auth(pooled_clients):
+    alice = supabase_client.get_supabase("token-alice")
+    bob = supabase_client.get_supabase("token-bob")
+    anon = supabase_client.get_supabase(None)
+
+    assert supabase_client.get_supabase("token-alice") is alice
+    assert supabase_client.get_supabase(None) is anon
+    assert len(pooled_clients) == 3
+    assert alice.headers == {"Authorization": "Bearer token-alice"}
+    assert bob.headers == {"Authorization": "Bearer token-bob"}
+    assert anon.headers == {}
+    assert supabase_client.get_auth_client() is not anon
+
+
+def test_get_supabase_isolates_tokens_across_threads(pooled_clients):
+    tokens = [f"token-{idx % 4}" for idx in range(200)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        clients = list(pool.map(supabase_client.get_supabase, tokens))
+
+    for token, client in zip(tokens, clients):
+        assert client.headers == {"Authorization": f"Bearer {token}"}
+    assert len({id(client) for client in clients}) <= len(pooled_clients)
+
+
+def test_get_supabase_pool_expires_and_evicts_least_recently_used(pooled_clients, monkeypatch):
+    monkeypatch.setattr(supabase_client, "CLIENT_POOL_SIZE", 2)
+    clock = [100.0]
+    monkeypatch.setattr(supabase_client.time, "monotonic", lambda: clock[0])
+
+    first = supabase_client.get_supabase("a")
+    supabase_client.get_supabase("b")
+    assert supabase_client.get_supabase("a") is first
+    supabase_client.get_supabase("c")
+
+    assert supabase_client.get_supabase("a") is first
+    assert len(pooled_clients) == 3
+    supabase_client.get_supabase("b")
+    assert len(pooled_clients) == 4
+
+    clock[0] += supabase_client.CLIENT_POOL_TTL_SECONDS + 1
+    assert supabase_client.get_supabase("a") is not first
+
+
+class FakeBuilder:
+    def __init__(self, data):
+        self.data = data
+
+    def __getattr__(self, _name):
+        return lambda *args, **kwargs: self
+
+    @property
+    def not_(self):
+        return self
+
+    def execute(self):
+        return type("Result", (), {"data": self.data})()
+
+
+class TableClient(HeaderRecordingClient):
+    def table(self, _name):
+        return FakeBuilder([{"id": "room-1", "name": "Kitchen"}, {"id": "room-2", "name": "Bath"}])
+
+    def rpc(self, _name, _params):
+        return FakeBuilder(7)
+
+
+def test_query_log_records_shape_rows_and_bytes_per_rerun(monkeypatch, pooled_clients, tmp_path):
+    log = supabase_client.QueryLog()
+    export_path = tmp_path / "queries.jsonl"
+    monkeypatch.setattr(supabase_client, "create_client", lambda _url, _key: TableClient())
+    monkeypatch.setattr(supabase_client, "QUERY_LOG_ENABLED", True)
+    monkeypatch.setattr(supabase_client, "QUERY_LOG_PATH", str(export_path))
+    monkeypatch.setattr(supabase_client, "current_query_log", lambda: log)
+
+    sb = supabase_client.get_supabase("token-1")
+    for room_id in ["room-1", "room-2", "room-3"]:
+        sb.table("room_objects").select("id").eq("room_id", room_id).order("id").execute()
+    sb.table("project_rooms").select("*").in_("id", ["a", "b"]).not_.is_("name", "null").execute()
+    log.begin_run("next")
+    sb.rpc("patch_project_cart", {"p_ops": []}).execute()
+
+    first, second = log.summary(log.runs[0]), log.summary()
+    assert first["requests"] == 4
+    assert first["groups"][0] == {
+        "table": "room_objects", "verb": "select", "filters": "eq:room_id,order",
+        "count": 3, "rows": 6, "ms": first["groups"][0]["ms"],
+    }
+    assert first["groups"][1]["filters"] == "in:id[2],not,is:name"
+    assert second["groups"][0]["table"] == "rpc:patch_project_cart"
+    assert log.runs[-1]["queries"][0]["payload_bytes"] == len('{"p_ops":[]}')
+    assert log.runs[0]["queries"][0]["response_bytes"] > 0
+    assert export_path.read_text().count("\n") == 5
+    assert supabase_client.query_log_to_jsonl(log).count('"session"') == 5
+
+
+def test_query_log_is_off_by_default(pooled_clients):
+    assert supabase_client.QUERY_LOG_ENABLED is False
+    assert supabase_client.get_supabase("token-1") is pooled_clients[0]
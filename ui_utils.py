@@ -7,10 +7,11 @@ import uuid
 from datetime import date, datetime
 from PIL import Image
 import numpy as np
-from config import CATALOG_PKL, CSV_LOG, VERSION_DIR, IMAGE_DIR
+from config import CATALOG_PKL, CSV_LOG, VERSION_DIR, IMAGE_DIR, CATALOG_STORE_DIR
+import catalog_store
 import base64
 import requests
-from project_manager import update_current_cart
+from project_manager import append_cart_item
 
 def render_product_card(row, i, room_options):
     col1, col2 = st.columns([4, 2])
@@ -55,9 +56,10 @@ def render_product_card(row, i, room_options):
                     "supplier": row.get("Supplier", ""),
                     "link": row.get("Link", ""),
                 }
-                st.session_state.cart.append(product_data)
-                update_current_cart(st.session_state.current_project, st.session_state.cart)  # <-- Add this line
-                st.success(f"✅ Added {quantity} × '{product_data['name']}' to {room}")
+                # Append only this item; the session copy of the cart may be stale.
+                if append_cart_item(st.session_state.current_project, product_data):
+                    st.session_state.cart.append(product_data)
+                    st.success(f"✅ Added {quantity} × '{product_data['name']}' to {room}")
 
         with colB:
             if st.button("✏️ Edit", key=f"edit_{i}"):
@@ -654,6 +656,45 @@ def inject_custom_css():
 
 
 
+def _save_edited_catalog(catalog_df, catalog_path, version_dir=None):
+    """
+    Write an edited catalog frame. Once the memory-mapped store exists the store writes
+    the pickle too, under its lock, keeping products other sessions added meanwhile.
+    Returns the frame that was saved, or None when the edit has to be redone.
+    """
+    if not catalog_store.read_manifest(CATALOG_STORE_DIR):
+        catalog_df.to_pickle(catalog_path)
+        return catalog_df
+    try:
+        return catalog_store.save_frame(
+            CATALOG_STORE_DIR, catalog_df, pickle_path=catalog_path, archive_dir=version_dir
+        )
+    except catalog_store.StaleFrameError:
+        st.warning("⚠️ The catalog changed while you were editing. Reload the page and save again.")
+        return None
+
+
+def _ensure_catalog_store(catalog_path, version_dir):
+    # First add (or the pickle was rewritten by another tool): rebase the store on
+    # the pickle, replaying any rows still in the log on top of it.
+    catalog_store.rebase_on_pickle(CATALOG_STORE_DIR, catalog_path, archive_dir=version_dir)
+
+
+def _append_csv_row(csv_path, row):
+    # Only the header is read; the row is appended in place. A row with columns the
+    # file doesn't have yet falls back to rewriting the file once with the wider header.
+    header = None
+    if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+        header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    if header is not None and not set(row).issubset(header):
+        df_csv = pd.concat([pd.read_csv(csv_path), pd.DataFrame([row])], ignore_index=True)
+        df_csv.to_csv(csv_path, index=False)
+        return
+    pd.DataFrame([row], columns=header or list(row)).to_csv(
+        csv_path, mode="a", header=header is None, index=False
+    )
+
+
 def render_add_product_form(model, image_dir, csv_path, catalog_path, version_dir):
     st.title("📦 Add a New Product to the Catalog")
 
@@ -730,32 +771,22 @@ def render_add_product_form(model, image_dir, csv_path, catalog_path, version_di
         }
 
         # Log to CSV
-        if os.path.exists(csv_path):
-            df_csv = pd.read_csv(csv_path)
-        else:
-            df_csv = pd.DataFrame()
-        df_csv = pd.concat([df_csv, pd.DataFrame([new_product])], ignore_index=True)
-        df_csv.to_csv(csv_path, index=False)
+        _append_csv_row(csv_path, new_product)
 
         # Generate embedding
         embedding_input = f"{name} {description}"
         embedding = model.encode(embedding_input, convert_to_numpy=True)
-        new_product["embedding"] = np.array(embedding)
-
-        # Load or create catalog
-        if os.path.exists(catalog_path):
-            main_df = pd.read_pickle(catalog_path)
-        else:
-            main_df = pd.DataFrame()
 
-        main_df = pd.concat([main_df, pd.DataFrame([new_product])], ignore_index=True)
-        main_df.drop_duplicates(subset=["product_name", "Supplier"], keep="last", inplace=True)
-
-        # Save catalog and backup version
-        main_df.to_pickle(catalog_path)
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        version_path = os.path.join(version_dir, f"product_catalog_{timestamp}.pkl")
-        main_df.to_pickle(version_path)
+        # Append to the catalog log; compaction refreshes the pickle and archives
+        # the folded rows in version_dir as a delta.
+        _ensure_catalog_store(catalog_path, version_dir)
+        catalog_store.add_product(
+            CATALOG_STORE_DIR,
+            new_product,
+            np.asarray(embedding),
+            pickle_path=catalog_path,
+            archive_dir=version_dir,
+        )
 
         st.cache_data.clear()
         st.success("✅ Product submitted successfully!")
@@ -869,7 +900,9 @@ def render_edit_product_form(df, model, catalog_path=CATALOG_PKL, csv_path=CSV_L
         for key in updated:
             df.at[index, key] = updated[key]
 
-        df.to_pickle(catalog_path)
+        df = _save_edited_catalog(df, catalog_path, version_dir)
+        if df is None:
+            return
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         df.to_pickle(os.path.join(version_dir, f"product_catalog_{timestamp}.pkl"))
 